@@ -0,0 +1,59 @@
+# Time and peak memory of the characterization of a unit of hub entities:
+# pairwise folding on pydantic Atoms vs. the compact (int tuple) atoms.
+#
+#   python -m benchmarks.atoms_bench [unit_size] [atoms_per_summary] [n_predicates]
+
+import random
+import sys
+import time
+import tracemalloc
+
+from neXSim.characterization import compute_characterization, compute_pairwise_characterization
+from neXSim.models import Atom, Summary, Variable
+
+
+def pydantic_characterization(summaries: list[Summary]) -> list[Atom]:
+    summaries = sorted(summaries)
+    x = Variable(is_free=True, origin=[s.entity for s in summaries])
+    operands = [[Atom(source_id=x if a.source_id == s.entity else a.source_id,
+                      target_id=x if a.target_id == s.entity else a.target_id,
+                      predicate=a.predicate) for a in s.summary] for s in summaries]
+    left = operands[0]
+    for right in operands[1:]:
+        left = compute_pairwise_characterization(left, right, x)
+    return left
+
+
+def random_unit(rnd: random.Random, unit_size: int, n_atoms: int, n_predicates: int) -> list[Summary]:
+    # hubs share a good part of their neighbourhood
+    targets = [f"bn:{i:08d}n" for i in range(1000, 1000 + 2 * n_atoms)]
+    predicates = [f"p{i}" for i in range(n_predicates)]
+    unit = []
+    for i in range(unit_size):
+        entity = f"bn:{i:08d}n"
+        atoms = {Atom(source_id=entity, target_id=rnd.choice(targets), predicate=rnd.choice(predicates))
+                 for _ in range(n_atoms)}
+        unit.append(Summary(entity=entity, summary=list(atoms), tops=[]))
+    return unit
+
+
+def measure(function, unit: list[Summary]) -> tuple[float, int, int]:
+    tracemalloc.start()
+    _start = time.perf_counter()
+    result = function(unit)
+    elapsed = time.perf_counter() - _start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(result)
+
+
+def main(unit_size: int = 4, n_atoms: int = 20000, n_predicates: int = 30):
+    unit = random_unit(random.Random(42), unit_size, n_atoms, n_predicates)
+    print(f"{unit_size} summaries of {n_atoms} atoms over {n_predicates} predicates")
+    for name, function in [("pydantic", pydantic_characterization), ("compact", compute_characterization)]:
+        elapsed, peak, size = measure(function, unit)
+        print(f"{name:9s} {elapsed:.4f} s, peak {peak / 2 ** 20:.1f} MiB, {size} atoms")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
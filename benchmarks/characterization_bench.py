@@ -0,0 +1,76 @@
+# Micro-benchmark of the maximal predicate-set operations of the characterization:
+# list-of-sets implementation (as it was before the bitmask engine) vs. the bitmask one.
+#
+#   python -m benchmarks.characterization_bench [n_sets] [n_predicates] [repetitions]
+
+import copy
+import random
+import sys
+import timeit
+
+from neXSim.characterization import PredicateInterner, maximal_masks, maximal_intersection_masks
+
+
+def legacy_clean_strict_subsets(to_clean: list[set[str]]) -> list[set[str]]:
+    to_return = copy.deepcopy(to_clean)
+    for subset in to_clean:
+        for other_subset in to_clean:
+            if len(other_subset) < len(subset) and other_subset.issubset(subset):
+                if other_subset in to_return:
+                    to_return.remove(other_subset)
+    return to_return
+
+
+def legacy_maximal_intersection(l: list[set[str]], r: list[set[str]]) -> list[set[str]]:
+    intersection: list[set[str]] = []
+    for left in l:
+        for right in r:
+            _int = left.intersection(right)
+            if _int not in intersection:
+                intersection.append(_int)
+    return list(intersection)
+
+
+def legacy_remove_if_covered_by_constants(source: list[set[str]], target: list[set[str]]) -> list[set[str]]:
+    return [s for s in source if s not in target]
+
+
+def legacy(left: list[set[str]], right: list[set[str]], common: list[set[str]]) -> list[set[str]]:
+    common_values = legacy_clean_strict_subsets(common)
+    maximal = legacy_clean_strict_subsets(legacy_maximal_intersection(left, right))
+    return legacy_remove_if_covered_by_constants(maximal, common_values)
+
+
+def bitmask(left: list[set[str]], right: list[set[str]], common: list[set[str]]) -> list[set[str]]:
+    interner = PredicateInterner()
+    common_values = set(maximal_masks([interner.to_mask(s) for s in common]))
+    maximal = maximal_masks(maximal_intersection_masks([interner.to_mask(s) for s in left],
+                                                       [interner.to_mask(s) for s in right]))
+    return [interner.to_set(m) for m in maximal if m not in common_values]
+
+
+def random_sets(rnd: random.Random, n_sets: int, predicates: list[str]) -> list[set[str]]:
+    # summaries group their targets by predicate sets: few predicates per target, many targets
+    return [set(rnd.sample(predicates, rnd.randint(1, 4))) for _ in range(n_sets)]
+
+
+def main(n_sets: int = 1000, n_predicates: int = 40, repetitions: int = 3):
+    rnd = random.Random(42)
+    predicates = [f"p{i}" for i in range(n_predicates)]
+    left = random_sets(rnd, n_sets, predicates)
+    right = random_sets(rnd, n_sets, predicates)
+    common = random_sets(rnd, n_sets // 10, predicates)
+
+    expected = sorted(sorted(s) for s in legacy(left, right, common))
+    assert expected == sorted(sorted(s) for s in bitmask(left, right, common))
+
+    legacy_time = min(timeit.repeat(lambda: legacy(left, right, common), number=1, repeat=repetitions))
+    bitmask_time = min(timeit.repeat(lambda: bitmask(left, right, common), number=1, repeat=repetitions))
+    print(f"{n_sets} sets over {n_predicates} predicates")
+    print(f"legacy:  {legacy_time:.5f} s")
+    print(f"bitmask: {bitmask_time:.5f} s")
+    print(f"speedup: {legacy_time / bitmask_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,37 @@
+# The text-program clingo engine, as it ran before the backend-fed sessions of neXSim.lca: the facts are formatted
+# into a program together with the closure and the LCA program, and grounded from scratch.
+# It is the reference of the tests and the baseline of the benchmark suite.
+
+import clingo
+
+from neXSim.deadline import check
+from neXSim.lca import last_model
+from neXSim.models import Atom, Variable
+from neXSim.utils import pred_identifier_to_clingo_relation as to_clingo
+
+
+def inject_facts(entities: list[str], relations: list[Atom]) -> str:
+    facts = ""
+    for entity in entities:
+        facts += f'seed("{entity}").\n'
+    for relation in relations:
+        tmp = to_clingo(relation.predicate)
+        facts += f'{tmp}("{relation.source_id}","{relation.target_id}").\n'
+
+    return facts
+
+
+def execute_clingo_lca(program: str, unit: list[str], out_name: str) -> list[Atom]:
+    return_value: list[Atom] = []
+    ctl = clingo.Control()
+    ctl.add("base", [], program)
+    ctl.ground([("base", [])])
+    check("clingo grounding")
+
+    for atom in last_model(ctl):
+        if atom.name.startswith('leastCommon'):
+            return_value.append(Atom(source_id=Variable(is_free=True, origin=unit),
+                                     target_id=str(atom.arguments[0]).replace('"', ''),
+                                     predicate=out_name
+                                     ))
+    return return_value
@@ -0,0 +1,177 @@
+# Benchmark suite of the algorithmic entry points on a synthetic taxonomy (see benchmarks/synthetic.py):
+# time (best and median of the repetitions) and peak memory (tracemalloc, on a separate run: the memory
+# allocated by clingo itself is not traced) of each of them.
+# With --save, the results are appended to a JSON-lines file together with the current commit, and compared
+# with the last saved results of the same entry point and parameters: slower or larger by more than
+# --threshold is reported as a regression (and the exit status is 1).
+#
+#   python -m benchmarks.suite [--depth 8] [--branching 3] [--multi 0.2] [--unit 4] [--atoms 200]
+#                              [--only characterization,report_all] [--save benchmarks/results.jsonl]
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict
+from datetime import datetime, timezone
+
+from benchmarks.clingo_text import execute_clingo_lca, inject_facts
+from benchmarks.synthetic import SyntheticGraph, TaxonomyParams
+from neXSim.characterization import compute_characterization, kernel_explanation, characterize
+from neXSim.lca import (execute_clingo_session, execute_native_lca, hypernym_successors, meronym_successors,
+                        to_adjacency, HYPERNYM_TRANSITIVE_CLOSURE, MERONYM_TRANSITIVE_CLOSURE, LCA_PROGRAM)
+from neXSim.models import NeXSimResponse
+from neXSim.report import report_all, involved_ids
+from neXSim.search import ENTITY_CACHE
+from neXSim.utils import dataset_version
+
+
+def native_lca(unit, hypernyms, meronyms):
+    return (execute_native_lca(unit, hypernym_successors(to_adjacency(hypernyms)), "is_a")
+            + execute_native_lca(unit, meronym_successors(to_adjacency(meronyms)), "part_of"))
+
+
+def clingo_lca(unit, hypernyms, meronyms):
+    # the text-program engine: facts, closure and LCA program grounded from scratch
+    return (execute_clingo_lca(inject_facts(unit, hypernyms) + HYPERNYM_TRANSITIVE_CLOSURE
+                               + LCA_PROGRAM.format(r="is_a"), unit, "is_a")
+            + execute_clingo_lca(inject_facts(unit, meronyms) + MERONYM_TRANSITIVE_CLOSURE
+                                 + LCA_PROGRAM.format(r="part_of"), unit, "part_of"))
+
+
+def clingo_session(unit, hypernyms, meronyms):
+    return (execute_clingo_session(unit, hypernyms, "is_a", "is_a")[0]
+            + execute_clingo_session(unit, meronyms, "part_of", "part_of")[0])
+
+
+def prepared_response(graph: SyntheticGraph, unit: list[str]) -> NeXSimResponse:
+    # a response with every stage computed, as the report receives it
+    _input = NeXSimResponse(unit=unit, summaries=graph.summaries(unit))
+    _input.lca = native_lca(unit, graph.hypernym_atoms(unit), graph.meronym_atoms(unit))
+    characterize(_input)
+    kernel_explanation(_input)
+    _input.computation_times.update({"summary": 0.0, "lca": 0.0})
+    return _input
+
+
+def entry_points(graph: SyntheticGraph, unit: list[str]) -> dict:
+    summaries = graph.summaries(unit)
+    hypernyms, meronyms = graph.hypernym_atoms(unit), graph.meronym_atoms(unit)
+    lca = native_lca(unit, hypernyms, meronyms)
+
+    report_input = prepared_response(graph, unit)
+    # the report reads the entity metadata from the entity cache: filled with synthetic entities
+    for _id in involved_ids(report_input):
+        ENTITY_CACHE.put(("graph", _id, dataset_version()), graph.entity(_id))
+
+    return {
+        "characterization": lambda: compute_characterization(summaries),
+        "kernel_explanation": lambda: kernel_explanation(NeXSimResponse(unit=unit, summaries=summaries, lca=lca)),
+        "native_lca": lambda: native_lca(unit, hypernyms, meronyms),
+        "clingo_lca": lambda: clingo_lca(unit, hypernyms, meronyms),
+        "clingo_session": lambda: clingo_session(unit, hypernyms, meronyms),
+        "report_all": lambda: report_all(report_input.model_copy()),
+    }
+
+
+def measure(function, repetitions: int) -> dict:
+    times = []
+    for _ in range(repetitions):
+        _start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - _start)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"best": round(min(times), 6), "median": round(statistics.median(times), 6),
+            "peak_mib": round(peak / 2 ** 20, 3)}
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def previous_results(path: str, params: dict) -> dict[str, dict]:
+    # the last saved result of each entry point, with the same parameters
+    last: dict[str, dict] = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                if record["params"] == params:
+                    last[record["name"]] = record
+    except FileNotFoundError:
+        pass
+    return last
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="neXSim benchmark suite on a synthetic taxonomy")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--branching", type=int, default=3)
+    parser.add_argument("--multi", type=float, default=0.2, help="multiple inheritance probability")
+    parser.add_argument("--part-of", type=float, default=0.3, help="part_of edge probability")
+    parser.add_argument("--predicates", type=int, default=30)
+    parser.add_argument("--atoms", type=int, default=200, help="non taxonomic atoms per summary")
+    parser.add_argument("--unit", type=int, default=4, help="unit size")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", default="", help="comma-separated entry points")
+    parser.add_argument("--save", default="", help="JSON-lines file of the results")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative regression threshold")
+    args = parser.parse_args(argv)
+
+    params = TaxonomyParams(seed=args.seed, depth=args.depth, branching=args.branching,
+                            multi_inheritance=args.multi, part_of=args.part_of, n_predicates=args.predicates,
+                            other_atoms=args.atoms, n_entities=max(500, args.unit))
+    graph = SyntheticGraph(params)
+    unit = graph.unit(args.unit, args.seed)
+    recorded_params = {**asdict(params), "unit": args.unit}
+
+    functions = entry_points(graph, unit)
+    selected = [name for name in args.only.split(",") if name] or list(functions.keys())
+    unknown = set(selected).difference(functions.keys())
+    if unknown:
+        parser.error(f"unknown entry points {sorted(unknown)}, valid ones are {list(functions.keys())}")
+
+    previous = previous_results(args.save, recorded_params) if args.save else {}
+    commit = current_commit()
+    date = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    regressions = 0
+
+    print(f"{len(graph.concepts)} concepts, unit of {args.unit}, "
+          f"{sum(len(s.summary) for s in graph.summaries(unit))} summary atoms, commit {commit}")
+    records = []
+    for name in selected:
+        result = measure(functions[name], args.repeat)
+        line = f"{name:20s} best {result['best'] * 1000:10.2f} ms  median {result['median'] * 1000:10.2f} ms  " \
+               f"peak {result['peak_mib']:8.2f} MiB"
+        if name in previous:
+            before = previous[name]
+            time_delta = result["best"] / before["best"] - 1 if before["best"] > 0 else 0.0
+            memory_delta = result["peak_mib"] / before["peak_mib"] - 1 if before["peak_mib"] > 0 else 0.0
+            line += f"  vs {before['commit']}: time {time_delta:+.1%}, memory {memory_delta:+.1%}"
+            if time_delta > args.threshold or memory_delta > args.threshold:
+                line += "  REGRESSION"
+                regressions += 1
+        print(line)
+        records.append({"name": name, "commit": commit, "date": date, "params": recorded_params, **result})
+
+    if args.save:
+        with open(args.save, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    return 1 if regressions > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
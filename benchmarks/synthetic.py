@@ -0,0 +1,163 @@
+# Seeded generator of synthetic BabelNet-like data, so that the algorithmic entry points can be measured
+# without a live graph: a layered subclass_of DAG (depth, branching, multiple inheritance), a part_of DAG over
+# the same concepts, and named entities (instance_of some deep concepts) whose summaries are built as the
+# summary query does: the closures of is_a and part_of, plus other relations towards a shared pool of targets.
+# The graph can also be dumped for the in-memory backend, to serve the whole API on it:
+#
+#   python -m benchmarks.synthetic <output.json> [depth] [branching] [n_entities]
+
+import json
+import random
+import sys
+from dataclasses import dataclass
+
+from neXSim.models import Atom, Entity, Summary, trusted_atom, trusted_entity
+
+
+@dataclass
+class TaxonomyParams:
+    seed: int = 0
+    depth: int = 8
+    branching: int = 3
+    # the number of concepts of a level is capped, so that deep taxonomies stay small
+    max_width: int = 2000
+    # probability of a second (third, ...) subclass_of parent
+    multi_inheritance: float = 0.2
+    # probability of a part_of edge towards a shallower concept
+    part_of: float = 0.3
+    n_entities: int = 500
+    n_predicates: int = 30
+    # the other (non taxonomic) atoms of each summary, and the targets they are drawn from
+    other_atoms: int = 200
+    n_targets: int = 2000
+
+
+def babelnet_id(i: int, pos: str = "n") -> str:
+    return f"bn:{i:08d}{pos}"
+
+
+def closure(graph: dict[str, list[str]], node: str) -> set[str]:
+    reached: set[str] = set()
+    stack = list(graph.get(node, ()))
+    while stack:
+        current = stack.pop()
+        if current not in reached:
+            reached.add(current)
+            stack.extend(graph.get(current, ()))
+    return reached
+
+
+class SyntheticGraph:
+
+    def __init__(self, params: TaxonomyParams) -> None:
+        self.params = params
+        rnd = random.Random(params.seed)
+        next_id = 1
+
+        self.levels: list[list[str]] = []
+        self.subclass_of: dict[str, list[str]] = {}
+        self.part_of: dict[str, list[str]] = {}
+        for level in range(params.depth + 1):
+            width = min(params.branching ** level, params.max_width)
+            concepts = [babelnet_id(next_id + i) for i in range(width)]
+            next_id += width
+            if level > 0:
+                parents = self.levels[-1]
+                for i, concept in enumerate(concepts):
+                    chosen = {parents[(i // params.branching) % len(parents)]}
+                    while rnd.random() < params.multi_inheritance and len(chosen) < len(parents):
+                        chosen.add(rnd.choice(parents))
+                    self.subclass_of[concept] = sorted(chosen)
+                    if rnd.random() < params.part_of:
+                        self.part_of[concept] = [rnd.choice(rnd.choice(self.levels))]
+            self.levels.append(concepts)
+        self.concepts = [c for level in self.levels for c in level]
+
+        leaves = self.levels[-1]
+        self.entities = [babelnet_id(next_id + i) for i in range(params.n_entities)]
+        next_id += params.n_entities
+        self.instance_of: dict[str, list[str]] = {}
+        for entity in self.entities:
+            self.instance_of[entity] = sorted({rnd.choice(leaves) for _ in range(rnd.randint(1, 2))})
+            if rnd.random() < params.part_of:
+                self.part_of[entity] = [rnd.choice(self.concepts)]
+
+        self.targets = [babelnet_id(next_id + i) for i in range(params.n_targets)]
+        self.predicates = [f"p{i}" for i in range(params.n_predicates)]
+        self.others: dict[str, list[tuple[str, str]]] = {
+            entity: [(rnd.choice(self.predicates), rnd.choice(self.targets)) for _ in range(params.other_atoms)]
+            for entity in self.entities}
+        self.rnd = rnd
+
+    def unit(self, size: int, seed: int | None = None) -> list[str]:
+        rnd = self.rnd if seed is None else random.Random(seed)
+        return sorted(rnd.sample(self.entities, size))
+
+    def hypernyms(self, entity: str) -> set[str]:
+        reached = set(self.instance_of.get(entity, ()))
+        for parent in list(reached):
+            reached.update(closure(self.subclass_of, parent))
+        return reached
+
+    def summary(self, entity: str) -> Summary:
+        atoms = {trusted_atom(entity, t, "is_a") for t in self.hypernyms(entity)}
+        atoms.update(trusted_atom(entity, t, "part_of") for t in closure(self.part_of, entity))
+        atoms.update(trusted_atom(entity, t, p) for p, t in self.others[entity])
+        atoms = sorted(atoms, key=lambda a: (a.predicate, a.target_id))
+        tops = {entity, *(a.target_id for a in atoms)}
+        return Summary(entity=entity, summary=atoms, tops=sorted(tops))
+
+    def summaries(self, unit: list[str]) -> list[Summary]:
+        return [self.summary(entity) for entity in unit]
+
+    def hypernym_atoms(self, unit: list[str]) -> list[Atom]:
+        # the direct instances of the unit and the subclass_of subgraph above them (as fetched by the lca)
+        atoms = [trusted_atom(e, c, "instance_of") for e in unit for c in self.instance_of.get(e, ())]
+        reached: set[str] = set()
+        stack = [c for e in unit for c in self.instance_of.get(e, ())]
+        while stack:
+            concept = stack.pop()
+            if concept in reached:
+                continue
+            reached.add(concept)
+            for parent in self.subclass_of.get(concept, ()):
+                atoms.append(trusted_atom(concept, parent, "subclass_of"))
+                stack.append(parent)
+        return atoms
+
+    def meronym_atoms(self, unit: list[str]) -> list[Atom]:
+        atoms: list[Atom] = []
+        reached: set[str] = set()
+        stack = list(unit)
+        while stack:
+            node = stack.pop()
+            if node in reached:
+                continue
+            reached.add(node)
+            for parent in self.part_of.get(node, ()):
+                atoms.append(trusted_atom(node, parent, "part_of"))
+                stack.append(parent)
+        return atoms
+
+    def entity(self, _id: str) -> Entity:
+        return trusted_entity(_id, f"sense_{_id[3:11].lstrip('0') or '0'}", "", [], "CONCEPT", "")
+
+    def dump(self) -> dict:
+        # the JSON dump of the in-memory graph backend (GRAPH_BACKEND=memory, see neXSim/memory_graph.py)
+        synsets = [{"id": _id, "mainSense": self.entity(_id).main_sense, "type": "CONCEPT"}
+                   for _id in self.concepts + self.entities + self.targets]
+        edges = [[s, "subclass_of", t] for s, parents in self.subclass_of.items() for t in parents]
+        edges += [[s, "instance_of", t] for s, classes in self.instance_of.items() for t in classes]
+        edges += [[s, "part_of", t] for s, wholes in self.part_of.items() for t in wholes]
+        edges += [[s, p, t] for s, others in self.others.items() for p, t in dict.fromkeys(others)]
+        return {"synsets": synsets, "edges": edges}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m benchmarks.synthetic <output.json> [depth] [branching] [n_entities]")
+        sys.exit(1)
+    sizes = [int(arg) for arg in sys.argv[2:5]]
+    graph = SyntheticGraph(TaxonomyParams(**dict(zip(["depth", "branching", "n_entities"], sizes))))
+    with open(sys.argv[1], "w") as f:
+        json.dump(graph.dump(), f)
@@ -0,0 +1,47 @@
+# Sequential fold vs. tree reduction (on a process pool) of the characterization of a large unit.
+#
+#   python -m benchmarks.tree_bench [unit_size] [atoms_per_summary] [processes]
+
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.atoms_bench import random_unit
+from neXSim.atoms import TermTable
+from neXSim.characterization import fold_characterization, tree_characterization
+from neXSim.models import Variable
+
+
+def renamed(atoms) -> set:
+    # bound variables are identified by their predicate sets
+    variables: dict[int, set[int]] = {}
+    for _, t, p in atoms:
+        if t < -1:
+            variables.setdefault(t, set()).add(p)
+    return {(s, frozenset(variables[t]) if t < -1 else t, p) for s, t, p in atoms}
+
+
+def main(unit_size: int = 40, n_atoms: int = 5000, processes: int = 4):
+    unit = sorted(random_unit(random.Random(42), unit_size, n_atoms, 30))
+    terms = TermTable(Variable(is_free=True))
+    operands = [terms.encode_summary(s) for s in unit]
+
+    _start = time.perf_counter()
+    folded = fold_characterization(operands)
+    fold_time = time.perf_counter() - _start
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pool.submit(int).result()
+        _start = time.perf_counter()
+        reduced = tree_characterization(operands, pool)
+        tree_time = time.perf_counter() - _start
+
+    assert renamed(folded) == renamed(reduced)
+    print(f"{unit_size} summaries of {n_atoms} atoms, {processes} processes")
+    print(f"fold: {fold_time:.4f} s")
+    print(f"tree: {tree_time:.4f} s")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,53 @@
+# Building and (de)serializing a 10k-atom summary: validated pydantic models vs. the trusted builders,
+# json.loads + model_validate vs. model_validate_json, json.dumps(model_dump) vs. model_dump_json.
+#
+#   python -m benchmarks.trusted_bench [n_atoms] [repetitions]
+
+import json
+import sys
+import timeit
+
+from neXSim.models import Atom, NeXSimResponse, Summary, trusted_atom
+
+ENTITY = "bn:00000001n"
+
+
+def neo4j_rows(n_atoms: int) -> list[dict]:
+    return [{"for": ENTITY, "source": ENTITY, "target": f"bn:{i:08d}n", "relation": f"p{i % 30}"}
+            for i in range(n_atoms)]
+
+
+def validated(rows: list[dict]) -> NeXSimResponse:
+    atoms = [Atom(source_id=r["source"], target_id=r["target"], predicate=r["relation"]) for r in rows]
+    return NeXSimResponse(unit=[ENTITY], summaries=[Summary(entity=ENTITY, summary=atoms, tops=[])])
+
+
+def trusted(rows: list[dict]) -> NeXSimResponse:
+    atoms = [trusted_atom(r["source"], r["target"], r["relation"]) for r in rows]
+    return NeXSimResponse(unit=[ENTITY], summaries=[Summary(entity=ENTITY, summary=atoms, tops=[])])
+
+
+def report(name: str, function, repetitions: int):
+    elapsed = min(timeit.repeat(function, number=1, repeat=repetitions))
+    print(f"{name:34s} {elapsed * 1000:8.2f} ms")
+
+
+def main(n_atoms: int = 10000, repetitions: int = 5):
+    rows = neo4j_rows(n_atoms)
+    assert validated(rows).model_dump_json() == trusted(rows).model_dump_json()
+
+    payload = trusted(rows).model_dump_json()
+    response = NeXSimResponse.model_validate_json(payload)
+
+    print(f"summary of {n_atoms} atoms ({len(payload) / 2 ** 20:.1f} MiB of JSON)")
+    report("build, validated", lambda: validated(rows), repetitions)
+    report("build, trusted", lambda: trusted(rows), repetitions)
+    report("parse, json.loads + model_validate", lambda: NeXSimResponse.model_validate(json.loads(payload)),
+           repetitions)
+    report("parse, model_validate_json", lambda: NeXSimResponse.model_validate_json(payload), repetitions)
+    report("dump, json.dumps(model_dump)", lambda: json.dumps(response.model_dump(mode="json")), repetitions)
+    report("dump, model_dump_json", lambda: response.model_dump_json(), repetitions)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -1,11 +1,28 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import os
+import tempfile
 import time
 
 bind = '0.0.0.0:8083'
-workers = 1
 loglevel = "info"
 
+# One worker per CPU by default: the computations are CPU-bound and hold the GIL, the threads of each worker
+# overlap the waits on Neo4j and Postgres. The process pools of the computations (LCA_SOLVE_PROCESSES,
+# CHARACTERIZATION_PROCESSES, MATRIX_PROCESSES) are per worker: keep them at 0 with many workers.
+CPU_COUNT = os.cpu_count() or 1
+workers = int(os.environ.get('GUNICORN_WORKERS', CPU_COUNT))
+threads = int(os.environ.get('GUNICORN_THREADS', 2 if CPU_COUNT > 1 else 4))
+
+# With preload_app, the application and its read-only state are loaded once in the master (see neXSim.preload)
+# and shared copy-on-write by the workers, which open their own connections after the fork.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+# The metrics are per process: with many workers, they are exchanged through METRICS_DIR (see neXSim.tracing),
+# so that /metrics reports the whole server whichever worker answers the scrape
+if workers > 1 and not os.environ.get('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix="neXSim-metrics-")
+
 
 # Function to be executed before each request
 
@@ -25,13 +42,65 @@ def worker_abort(worker):
     raise TimeoutError('Request timed out')
 
 
+# Load the read-only state in the master, before the first fork (and discard the metrics of a previous run)
+def when_ready(server):
+    from neXSim.tracing import clear_metrics_dir
+    clear_metrics_dir()
+    if preload_app:
+        from neXSim import preload
+        preload()
+        server.log.info("Shared state preloaded")
+
+
+# The connections opened while loading the application are closed in the master...
+def pre_fork(server, worker):
+    if preload_app:
+        from neXSim import close_connections
+        close_connections()
+
+
+# ...and opened again in each worker
+def post_fork(server, worker):
+    if preload_app:
+        from neXSim import open_connections
+        open_connections()
+
+
+# Start exporting the metrics of the worker, and preload the entity metadata cache with the ids listed in
+# ENTITY_CACHE_WARMUP
+def post_worker_init(worker):
+    from neXSim.tracing import start_metrics_export
+    start_metrics_export()
+    from neXSim.search import warm_up_entity_cache
+    try:
+        worker.log.info(f"Entity cache warmed up with {warm_up_entity_cache()} entities")
+    except Exception as e:
+        worker.log.warning(f"Entity cache warm-up failed: {e}")
+
+
+# Fold the metrics of the worker into the archive, and merge its request counts into the warm-up file of the
+# next ones
+def worker_exit(server, worker):
+    from neXSim.tracing import retire_metrics
+    retire_metrics()
+    path = os.environ.get('ENTITY_CACHE_WARMUP')
+    if path:
+        from neXSim.search import dump_frequent_ids
+        dump_frequent_ids(path)
+
+
 # Assign the pre_request and post_request functions
 pre_request = pre_request
 post_request = post_request
 worker_abort = worker_abort
+when_ready = when_ready
+pre_fork = pre_fork
+post_fork = post_fork
+post_worker_init = post_worker_init
+worker_exit = worker_exit
 
 # Additional configuration settings (if needed)
-timeout = 99999
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 99999))
 keepalive = 2
 
 max_requests = 20000
@@ -1,7 +1,10 @@
+import gc
+
 from dotenv import load_dotenv
 from flask import Flask
 from flask_cors import CORS
 
+from neXSim.graph_backend import DatasetUnavailable
 from neXSim.neo4j_manager import DatasetManager
 from neXSim.postgresQL_manager import PostgresQLConnector
 
@@ -13,5 +16,36 @@ app = Flask(__name__)
 CORS(app, supports_credentials=True, resources={r"/*": {"origins": ["http://localhost:3000"]}},)
 
 
-from neXSim import router
+def preload():
+    # loads the read-only state once, in the gunicorn master (preload_app), so that the workers share it
+    # copy-on-write: the graph backend (taxonomy snapshot or in-memory graph, loaded by DatasetManager),
+    # the autocomplete index and the taxonomic predicates (the same ints and bits in every worker)
+    from neXSim.atoms import PREDICATES
+    from neXSim.autocomplete import autocomplete_index
+    from neXSim.neo4j_manager import predicate_names
+    for _upper in [False, True]:
+        for name in predicate_names(_upper).values():
+            PREDICATES.intern(name)
+    try:
+        neo4j_instance.backend
+    except DatasetUnavailable as e:
+        print(f"Graph backend not preloaded: {e}")
+    autocomplete_index()
+    # the preloaded objects are moved out of the collected generations: the collections of the workers
+    # would otherwise write to their headers, and copy their pages
+    gc.collect()
+    gc.freeze()
+
+
+def close_connections():
+    # before the fork: the driver and the pool (and their threads and sockets) must not be inherited
+    neo4j_instance.close()
+    postgres_instance.close()
 
+
+def open_connections():
+    # after the fork, in each worker (the Postgres pool is opened at the first query)
+    neo4j_instance.open()
+
+
+from neXSim import router
@@ -0,0 +1,159 @@
+import contextlib
+import os
+from functools import partial
+
+from a2wsgi import WSGIMiddleware
+from pydantic import ValidationError
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route, Mount
+
+from neXSim import app as flask_app
+from neXSim.async_neo4j_manager import AsyncDatasetManager
+from neXSim.deadline import deadline, request_budget, stream_within_async
+from neXSim.graph_backend import DatasetUnavailable
+from neXSim.lca import lca_async, LCA_ENGINES
+from neXSim.models import NeXSimResponse, EntityList
+from neXSim.pipeline import run_pipeline_async, run_stage_async, nexsim_async_stages
+from neXSim.search import search_by_id_async, search_by_lemma_async
+from neXSim.summary import full_summary_async, stream_summary_async
+from neXSim.utils import is_valid_babelnet_id, NDJSON, primed_async, wants_ndjson
+
+# Async serving mode (e.g. gunicorn -k uvicorn.workers.UvicornWorker neXSim.asgi:app):
+# the dataset-bound endpoints are served by coroutines on the AsyncDatasetManager (GRAPH_BACKEND as the Flask app),
+# every other route falls back to the synchronous Flask app.
+
+
+async def parse_nexsim_request(request: Request) -> NeXSimResponse | Response:
+    try:
+        return NeXSimResponse.model_validate(await request.json())
+    except ValidationError as e:
+        return JSONResponse({"error": e.errors(include_url=False, include_context=False)}, status_code=400)
+
+
+def check_lca_engine(request: Request) -> str | Response | None:
+    engine = request.query_params.get('engine')
+    if engine is not None and engine not in LCA_ENGINES:
+        return PlainTextResponse(f"{engine} is not a valid LCA engine. Valid engines are {LCA_ENGINES}",
+                                 status_code=400)
+    return engine
+
+
+def check_budget(request: Request) -> float | Response | None:
+    try:
+        return request_budget(request.query_params.get('budget_ms'))
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+
+
+def upper_predicates() -> bool:
+    return os.environ.get('PREDICATES_UPPER') == 'True'
+
+
+def json_response(model) -> Response:
+    return Response(content=model.model_dump_json(), media_type='application/json')
+
+
+async def ndjson_stream(summaries):
+    async for s in summaries:
+        yield s.model_dump_json() + "\n"
+
+
+async def summary(request: Request) -> Response:
+    my_request = await parse_nexsim_request(request)
+    if isinstance(my_request, Response):
+        return my_request
+    budget = check_budget(request)
+    if isinstance(budget, Response):
+        return budget
+    if wants_ndjson(request.headers.get('accept')):
+        summaries = stream_within_async(budget, stream_summary_async(my_request))
+        return StreamingResponse(ndjson_stream(await primed_async(summaries)), media_type=NDJSON)
+    with deadline(budget):
+        await run_stage_async(my_request, "summary", full_summary_async)
+    return json_response(my_request)
+
+
+async def lowest_common_ancestors(request: Request) -> Response:
+    my_request = await parse_nexsim_request(request)
+    if isinstance(my_request, Response):
+        return my_request
+    engine = check_lca_engine(request)
+    if isinstance(engine, Response):
+        return engine
+    budget = check_budget(request)
+    if isinstance(budget, Response):
+        return budget
+    with deadline(budget):
+        await run_stage_async(my_request, "lca", partial(lca_async, _upper=upper_predicates(), _engine=engine))
+    return json_response(my_request)
+
+
+async def oneshot(request: Request) -> Response:
+    my_request = await parse_nexsim_request(request)
+    if isinstance(my_request, Response):
+        return my_request
+    engine = check_lca_engine(request)
+    if isinstance(engine, Response):
+        return engine
+    budget = check_budget(request)
+    if isinstance(budget, Response):
+        return budget
+    with deadline(budget):
+        await run_pipeline_async(my_request, nexsim_async_stages(upper_predicates(), engine))
+    return json_response(my_request)
+
+
+async def entities(request: Request) -> Response:
+    ids: list[str] = request.path_params['ids'].split(',')
+    for entity in ids:
+        if not is_valid_babelnet_id(entity):
+            return PlainTextResponse(f"{entity} is not a valid babelnet id", status_code=400)
+    return json_response(EntityList(entities=list(await search_by_id_async(ids))))
+
+
+async def search(request: Request) -> Response:
+    page: int = request.path_params['page']
+    found = await search_by_lemma_async(request.path_params['lemma'], page, 10 * page)
+    return json_response(EntityList(entities=found))
+
+
+def api_route(path: str, endpoint, method: str) -> Route:
+    # same CORS policy of the Flask app (which applies its own to the mounted routes)
+    return Route(path, endpoint, methods=[method, 'OPTIONS'],
+                 middleware=[Middleware(CORSMiddleware, allow_origins=["http://localhost:3000"],
+                                        allow_credentials=True, allow_methods=["*"], allow_headers=["*"])])
+
+
+async def dataset_unavailable(_request: Request, e: DatasetUnavailable) -> Response:
+    # as the Flask app
+    return JSONResponse({"error": str(e)}, status_code=503)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    # the async driver belongs to the event loop of the worker
+    dataset_manager = AsyncDatasetManager()
+    try:
+        await dataset_manager.open()
+    except DatasetUnavailable as e:
+        print(f"Graph backend not opened: {e}")
+    yield
+    await dataset_manager.close()
+
+
+app = Starlette(
+    routes=[
+        api_route('/api/summary', summary, 'POST'),
+        api_route('/api/lca', lowest_common_ancestors, 'POST'),
+        api_route('/api/oneshot', oneshot, 'POST'),
+        api_route('/api/entities/{ids:str}', entities, 'GET'),
+        api_route('/api/search/{lemma:str}/{page:int}', search, 'GET'),
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    exception_handlers={DatasetUnavailable: dataset_unavailable},
+    lifespan=lifespan
+)
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import threading
+
+from neo4j import AsyncGraphDatabase, READ_ACCESS
+from neo4j.exceptions import Neo4jError, ServiceUnavailable, AuthError, ConfigurationError
+
+from neXSim.deadline import DeadlineExceeded, timeout
+from neXSim.graph_backend import AsyncGraphBackend, DatasetUnavailable, GraphBackend, ThreadedGraphBackend
+from neXSim.models import Atom
+from neXSim.neo4j_manager import (DatasetManager, GRAPH_BACKENDS, SEARCH_BY_ID_QUERY, SUMMARY_QUERIES,
+                                  SUMMARY_STREAM_QUERIES, SUBGRAPH_QUERY, OTHERS_QUERIES, DIRECT_INSTANCES_QUERIES,
+                                  DIRECT_PART_OF_QUERIES, ranked_row, entity_row, summary_row, lemma_query,
+                                  subclass_roots, with_deadline, is_timeout, SummaryGroups)
+from neXSim.taxonomy import TaxonomySnapshot, load_snapshot
+from neXSim.tracing import span
+from neXSim.utils import SingletonMeta, chunked
+
+
+# Async counterpart of DatasetManager. With GRAPH_BACKEND=neo4j, it is built on the AsyncGraphDatabase driver:
+# it runs the same queries and returns the same rows, so that many in-flight units can share one event loop
+# while waiting on Neo4j. Other backends (memory) are the ones of DatasetManager, called in the default executor.
+
+async def fetch_rows(tx, _query: str, _row=None, _extra: dict | None = None, **params) -> list[dict]:
+    result = await tx.run(_query, **params)
+    rows = []
+    async for record in result:
+        row = _row(record) if _row is not None else record.data()
+        if _extra is not None:
+            row.update(_extra)
+        rows.append(row)
+    return rows
+
+
+class AsyncNeo4jBackend(AsyncGraphBackend):
+
+    def __init__(self, upper: bool) -> None:
+        self.DATABASE_ADDRESS = os.environ.get('NEO4J_DB_URI')
+        self.DATABASE_USERNAME = os.environ.get('NEO4J_DB_USER')
+        self.DATABASE_PASSWORD = os.environ.get('NEO4J_DB_PWD')
+
+        self.upper = upper
+        self.batch_size = int(os.environ.get('NEO4J_BATCH_SIZE', 500))
+
+        # the async driver is bound to the event loop it is used in: it is opened by open(), or at the first query
+        self.driver = None
+        self._driver_lock = asyncio.Lock()
+        self.taxonomy: TaxonomySnapshot | None = load_snapshot(os.environ.get('TAXONOMY_SNAPSHOT'))
+
+    async def connect(self):
+        try:
+            driver = AsyncGraphDatabase.driver(self.DATABASE_ADDRESS,
+                                               auth=(self.DATABASE_USERNAME, self.DATABASE_PASSWORD))
+        except (ConfigurationError, ValueError) as e:
+            # e.g. NEO4J_DB_URI is not set: the queries answer DatasetUnavailable
+            print(f"Neo4j async driver configuration failed: {e}")
+            self.driver = None
+            return
+        try:
+            await driver.verify_connectivity()
+        except (ServiceUnavailable, AuthError, Neo4jError):
+            print("Neo4j async driver connection failed")
+            await driver.close()
+            driver = None
+        self.driver = driver
+
+    async def session(self, **config):
+        # a failed connection is retried at the next request, as in Neo4jBackend.session
+        if self.driver is None:
+            async with self._driver_lock:
+                if self.driver is None:
+                    await self.connect()
+            if self.driver is None:
+                raise DatasetUnavailable("Neo4j is not available")
+        return self.driver.session(**config)
+
+    async def open(self):
+        async with self._driver_lock:
+            if self.driver is None:
+                await self.connect()
+
+    async def close(self):
+        async with self._driver_lock:
+            if self.driver is not None:
+                await self.driver.close()
+                self.driver = None
+
+    async def read(self, session, *args, **kwargs) -> list[dict]:
+        try:
+            return await session.execute_read(with_deadline(fetch_rows), *args, **kwargs)
+        except Neo4jError as e:
+            if is_timeout(e):
+                raise DeadlineExceeded("neo4j query ran out of time") from e
+            raise
+
+    async def read_in_batches(self, _name: str, _query: str, _ids: list[str], _distinct: bool = False,
+                              _extra: dict | None = None, **params) -> list[dict]:
+        # _name: the name of the span (the one of the synchronous transaction function)
+        _ids = list(dict.fromkeys(_ids))
+        merged = []
+        seen = set()
+        with span(_name, "neo4j") as s:
+            async with await self.session() as session:
+                for batch in chunked(_ids, self.batch_size):
+                    for row in await self.read(session, _query, _extra=_extra, ids=batch, **params):
+                        if _distinct:
+                            key = tuple(row.values())
+                            if key in seen:
+                                continue
+                            seen.add(key)
+                        merged.append(row)
+            s.rows = len(merged)
+        return merged
+
+    async def get_entities(self, _id):
+        with span("search_by_id", "neo4j") as s:
+            async with await self.session() as session:
+                rows = await self.read(session, SEARCH_BY_ID_QUERY, _row=entity_row, ids=_id)
+            s.rows = len(rows)
+        return rows
+
+    async def get_entities_by_lemma(self, lemma, page, skip, limit: int = 10,
+                                    after: tuple[float, str] | None = None):
+        query, params = lemma_query(lemma, page, limit, after)
+        if query is None:
+            return []
+        with span("search_by_lemma", "neo4j") as s:
+            async with await self.session() as session:
+                rows = await self.read(session, query, _row=ranked_row, parameters=params)
+            s.rows = len(rows)
+        return rows
+
+    async def get_direct_instances(self, _entities):
+        return await self.read_in_batches("compute_direct_instances", DIRECT_INSTANCES_QUERIES[self.upper],
+                                          _entities, _extra={"type": "HYPERNYM"})
+
+    async def get_direct_part_of(self, _entities):
+        return await self.read_in_batches("compute_direct_part_of", DIRECT_PART_OF_QUERIES[self.upper],
+                                          _entities, _extra={"type": "MERONYM"})
+
+    async def get_full_summary(self, _entities):
+        return await self.read_in_batches("compute_oneshot_summary", SUMMARY_QUERIES[self.upper], _entities)
+
+    async def stream_full_summary(self, _entities):
+        # one query for all the entities, as in DatasetManager.stream_full_summary
+        groups = SummaryGroups(_entities)
+        with span("compute_oneshot_summary", "neo4j") as s:
+            async with await self.session(default_access_mode=READ_ACCESS) as session:
+                try:
+                    async with await session.begin_transaction(timeout=timeout("neo4j query")) as tx:
+                        result = await tx.run(SUMMARY_STREAM_QUERIES[self.upper],
+                                              ids=list(dict.fromkeys(_entities)))
+                        async for record in result:
+                            for completed in groups.add(summary_row(record)):
+                                yield completed
+                except Neo4jError as e:
+                    if is_timeout(e):
+                        raise DeadlineExceeded("neo4j query ran out of time") from e
+                    raise
+            s.rows = groups.rows
+        for completed in groups.finish():
+            yield completed
+
+    async def get_raw_subclass(self, _entities: list[str], _direct_instances: list[Atom]):
+        _new = subclass_roots(_entities, _direct_instances, self.upper)
+        _relation = "SUBCLASS_OF" if self.upper else "subclass_of"
+        if self.taxonomy is not None:
+            return self.taxonomy.subgraph(_new, "subclass_of", _relation)
+        return await self.read_in_batches("compute_subgraph", SUBGRAPH_QUERY, _new, _distinct=True,
+                                          filter=f"{_relation}>", relation=_relation)
+
+    async def get_raw_part_of(self, _entities, _direct_instances):
+        if len(_direct_instances) == 0:
+            return []
+        _relation = "PART_OF" if self.upper else "part_of"
+        if self.taxonomy is not None:
+            return self.taxonomy.subgraph(_entities, "part_of", _relation)
+        return await self.read_in_batches("compute_subgraph", SUBGRAPH_QUERY, _entities, _distinct=True,
+                                          filter=f"{_relation}>", relation=_relation)
+
+    async def get_others(self, _entities):
+        return await self.read_in_batches("compute_others", OTHERS_QUERIES[self.upper], _entities)
+
+
+class AsyncDatasetManager(metaclass=SingletonMeta):
+    # the backend is built at the first query, as in DatasetManager; use() replaces it
+
+    def __init__(self) -> None:
+        self.upper = os.environ.get('PREDICATES_UPPER', 'False').lower() == 'true'
+        self.backend_name = os.environ.get('GRAPH_BACKEND', 'neo4j').lower()
+        self._backend: AsyncGraphBackend | None = None
+        self._backend_lock = threading.Lock()
+
+    def build_backend(self) -> AsyncGraphBackend:
+        if self.backend_name == "neo4j":
+            return AsyncNeo4jBackend(self.upper)
+        if self.backend_name in GRAPH_BACKENDS:
+            # the same (e.g. in-memory) graph of the synchronous routes
+            return ThreadedGraphBackend(DatasetManager().backend)
+        raise Exception(f"Graph backend {self.backend_name} is not supported. Valid backends are {GRAPH_BACKENDS}")
+
+    @property
+    def backend(self) -> AsyncGraphBackend:
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = self.build_backend()
+        return self._backend
+
+    def use(self, backend: AsyncGraphBackend | GraphBackend):
+        # replaces the backend (a synchronous one is called in the default executor); the previous one
+        # is not closed, since its connections belong to an event loop
+        if isinstance(backend, GraphBackend):
+            backend = ThreadedGraphBackend(backend)
+        with self._backend_lock:
+            self._backend = backend
+            self.upper = backend.upper
+
+    async def get_entities(self, _id):
+        return await self.backend.get_entities(_id)
+
+    async def get_entities_by_lemma(self, lemma, page, skip, limit: int = 10,
+                                    after: tuple[float, str] | None = None):
+        return await self.backend.get_entities_by_lemma(lemma, page, skip, limit, after)
+
+    async def get_direct_instances(self, _entities):
+        return await self.backend.get_direct_instances(_entities)
+
+    async def get_direct_part_of(self, _entities):
+        return await self.backend.get_direct_part_of(_entities)
+
+    async def get_full_summary(self, _entities):
+        return await self.backend.get_full_summary(_entities)
+
+    def stream_full_summary(self, _entities):
+        return self.backend.stream_full_summary(_entities)
+
+    async def get_raw_subclass(self, _entities: list[str], _direct_instances: list[Atom]):
+        return await self.backend.get_raw_subclass(_entities, _direct_instances)
+
+    async def get_raw_part_of(self, _entities, _direct_instances):
+        return await self.backend.get_raw_part_of(_entities, _direct_instances)
+
+    async def get_others(self, _entities):
+        return await self.backend.get_others(_entities)
+
+    async def open(self):
+        await self.backend.open()
+
+    async def close(self):
+        if self._backend is not None:
+            await self._backend.close()
@@ -0,0 +1,129 @@
+import threading
+from typing import Iterable, Union
+
+from neXSim.models import Atom, Variable, Summary, trusted_atom
+from neXSim.utils import is_valid_babelnet_id, pack_babelnet_id, unpack_babelnet_id
+
+# Compact representation of the atoms for the hot paths of the computations.
+# An atom is a plain (source, target, predicate) tuple of ints:
+#  - constants are packed BabelNet ids (>= 0),
+#  - the free variable X is FREE_VARIABLE, the bound variable Y_k is -(k + 2),
+#  - predicates are interned to small ints, so a predicate set is the bitmask of (1 << predicate).
+# pydantic Atoms are built back only at the API boundary (TermTable.decode_atoms).
+
+CompactAtom = tuple[int, int, int]
+
+FREE_VARIABLE = -1
+
+# terms that are neither BabelNet ids nor generated variables (ids out of the packed range)
+FOREIGN_OFFSET = 1 << 40
+
+
+def bound_variable(nominal: int) -> int:
+    return -(nominal + 2)
+
+
+class PredicateTable:
+    # process-wide: the same predicate is always the same int (and the same bit)
+
+    def __init__(self) -> None:
+        self.ids: dict[str, int] = {}
+        self.names: list[str] = []
+        self._lock = threading.Lock()
+
+    def intern(self, predicate: str) -> int:
+        _id = self.ids.get(predicate)
+        if _id is None:
+            with self._lock:
+                _id = self.ids.get(predicate)
+                if _id is None:
+                    _id = len(self.names)
+                    self.names.append(predicate)
+                    self.ids[predicate] = _id
+        return _id
+
+    def name(self, _id: int) -> str:
+        return self.names[_id]
+
+
+PREDICATES = PredicateTable()
+
+
+class TermTable:
+    # encoding/decoding of the terms of a single computation
+
+    def __init__(self, free_variable: Variable) -> None:
+        self.free_variable = free_variable
+        self.constants: dict[str, int] = {}
+        self.bound: dict[int, Variable] = {}
+        self.foreign_ids: dict[Union[str, Variable], int] = {}
+        self.foreign: list[Union[str, Variable]] = []
+
+    def encode(self, term: Union[str, Variable]) -> int:
+        _id = self.constants.get(term) if isinstance(term, str) else None
+        if _id is not None:
+            return _id
+        if isinstance(term, str) and is_valid_babelnet_id(term):
+            _id = self.constants[term] = pack_babelnet_id(term)
+            return _id
+        # anything else (e.g. a variable coming from the request) is kept as it is
+        _id = self.foreign_ids.get(term)
+        if _id is None:
+            _id = FOREIGN_OFFSET + len(self.foreign)
+            self.foreign_ids[term] = _id
+            self.foreign.append(term)
+        return _id
+
+    def decode(self, _id: int, free_variable: Variable | None = None) -> Union[str, Variable]:
+        if _id >= FOREIGN_OFFSET:
+            return self.foreign[_id - FOREIGN_OFFSET]
+        if _id >= 0:
+            return unpack_babelnet_id(_id)
+        if _id == FREE_VARIABLE:
+            return self.free_variable if free_variable is None else free_variable
+        if _id not in self.bound:
+            self.bound[_id] = Variable(is_free=False, origin=[], nominal=-_id - 2)
+        return self.bound[_id]
+
+    def encode_summary(self, summary: Summary) -> list[CompactAtom]:
+        # the summarized entity becomes the free variable
+        entity = summary.entity
+        intern = PREDICATES.intern
+        encoded: list[CompactAtom] = []
+        for atom in summary.summary:
+            source = FREE_VARIABLE if atom.source_id == entity else self.encode(atom.source_id)
+            target = FREE_VARIABLE if atom.target_id == entity else self.encode(atom.target_id)
+            encoded.append((source, target, intern(atom.predicate)))
+        return encoded
+
+    def decode_atoms(self, atoms: Iterable[CompactAtom], free_variable: Variable | None = None) -> list[Atom]:
+        # free_variable overrides the one of the table (e.g. when the same encoding serves many units)
+        name = PREDICATES.name
+        return [trusted_atom(self.decode(s, free_variable), self.decode(t, free_variable), name(p))
+                for s, t, p in atoms]
+
+
+def predicate_mask(atoms: Iterable[CompactAtom]) -> int:
+    mask = 0
+    for _, _, p in atoms:
+        mask |= 1 << p
+    return mask
+
+
+def target_masks(atoms: Iterable[CompactAtom], allowed: int) -> dict[int, int]:
+    # target -> bitmask of its predicates (restricted to the allowed ones)
+    masks: dict[int, int] = {}
+    for _, t, p in atoms:
+        bit = 1 << p
+        if allowed & bit:
+            masks[t] = masks.get(t, 0) | bit
+    return masks
+
+
+def mask_predicates(mask: int) -> list[int]:
+    out: list[int] = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return out
@@ -0,0 +1,161 @@
+import bisect
+import heapq
+import os
+import sys
+import threading
+import time
+from array import array
+from typing import Iterable, Iterator
+
+from neXSim.utils import is_valid_babelnet_id, pack_babelnet_id, unpack_babelnet_id
+
+# In-memory prefix index for autocomplete over main senses and synonyms.
+# The entities are stored by decreasing undirected_edges, so that the position of an entity is its rank:
+# the best matches of a prefix are the smallest positions among the keys starting with it.
+# Only the ids are kept: the entities are resolved through the entity cache (search_by_id), as the full-text
+# search does, so that both return the same metadata.
+# Keys (normalized terms) are sorted UTF-8 bytes in one blob; the top matches of the short prefixes
+# (up to PRECOMPUTED_PREFIX characters, the ones matching most of the keys) are precomputed.
+#
+# The index is built from a TSV snapshot (id, undirected_edges, main sense, synonyms separated by "|"),
+# written by: python -m neXSim.autocomplete <output path> [postgres|neo4j]
+
+PRECOMPUTED_PREFIX = 2
+PRECOMPUTED_TOP = 50
+
+LEXICON_QUERY = """SELECT s.id AS id, s.main_sense AS main_sense, s.synonyms AS synonyms,
+        s.undirected_edges AS undirected_edges from synset s"""
+
+
+def normalize_term(term: str) -> str:
+    return " ".join(term.replace("_", " ").lower().split())
+
+
+class KeyView:
+    # read-only sequence over the sorted keys, for bisect
+
+    def __init__(self, blob: bytes, offsets: array) -> None:
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]]
+
+
+class PrefixIndex:
+
+    def __init__(self, entries: Iterable[tuple[str, int, str, list[str]]]) -> None:
+        # entries: (id, undirected_edges, main sense, synonyms)
+        rows = sorted(((-(edges or 0), _id, main_sense or "", synonyms or [])
+                       for _id, edges, main_sense, synonyms in entries if is_valid_babelnet_id(_id)),
+                      key=lambda r: (r[0], r[1]))
+
+        self.ids = array('q')
+        keys: list[tuple[bytes, int]] = []
+        for position, (_, _id, main_sense, synonyms) in enumerate(rows):
+            self.ids.append(pack_babelnet_id(_id))
+            for term in dict.fromkeys(normalize_term(t) for t in [main_sense, *synonyms]):
+                if term != "":
+                    keys.append((term.encode(), position))
+        del rows
+
+        keys.sort()
+        offsets = array('q', [0])
+        blob = bytearray()
+        self.positions = array('i')
+        for key, position in keys:
+            blob += key
+            offsets.append(len(blob))
+            self.positions.append(position)
+        self.keys = KeyView(bytes(blob), offsets)
+
+        short = {key.decode()[:length].encode() for key, _ in keys for length in range(1, PRECOMPUTED_PREFIX + 1)}
+        del keys
+        self.top: dict[bytes, list[int]] = {}
+        for prefix in short:
+            self.top[prefix] = self.lookup(prefix, PRECOMPUTED_TOP)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def complete(self, prefix: str, limit: int = 10) -> list[int]:
+        # positions (i.e. ranks) of the best entities with a main sense or a synonym starting with prefix
+        key = normalize_term(prefix).encode()
+        if key == b"":
+            return []
+        if key in self.top and limit <= PRECOMPUTED_TOP:
+            return self.top[key][:limit]
+        return self.lookup(key, limit)
+
+    def lookup(self, key: bytes, limit: int) -> list[int]:
+        # the keys starting with key are a contiguous range (0xff never occurs in UTF-8)
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_left(self.keys, key + b"\xff", lo)
+        return heapq.nsmallest(limit, set(self.positions[lo:hi]))
+
+    def complete_ids(self, prefix: str, limit: int = 10) -> list[str]:
+        return [unpack_babelnet_id(self.ids[position]) for position in self.complete(prefix, limit)]
+
+
+def write_snapshot(path: str, entries: Iterable[tuple[str, int, str, list[str]]]) -> int:
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for _id, edges, main_sense, synonyms in entries:
+            clean = [(s or "").replace("\t", " ").replace("\n", " ") for s in [main_sense, *(synonyms or [])]]
+            f.write(f"{_id}\t{edges or 0}\t{clean[0]}\t{'|'.join(s.replace('|', ' ') for s in clean[1:])}\n")
+            written += 1
+    return written
+
+
+def read_snapshot(path: str) -> Iterator[tuple[str, int, str, list[str]]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            _id, edges, main_sense, synonyms = line.rstrip("\n").split("\t")
+            yield _id, int(edges), main_sense, synonyms.split("|") if synonyms else []
+
+
+def postgres_lexicon() -> Iterator[tuple[str, int, str, list[str]]]:
+    from neXSim import postgres_instance
+    for row in postgres_instance.iter_rows(LEXICON_QUERY):
+        yield row["id"], row["undirected_edges"], row["main_sense"], row["synonyms"]
+
+
+def neo4j_lexicon() -> Iterator[tuple[str, int, str, list[str]]]:
+    from neXSim import neo4j_instance
+    yield from neo4j_instance.get_lexicon()
+
+
+_index: PrefixIndex | None = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def autocomplete_index() -> PrefixIndex | None:
+    # AUTOCOMPLETE_INDEX: the path of a snapshot, or "postgres" to build it from the synset table;
+    # built at the first use, None when not configured (or not loadable)
+    global _index, _index_loaded
+    with _index_lock:
+        if not _index_loaded:
+            _index_loaded = True
+            source = os.environ.get('AUTOCOMPLETE_INDEX')
+            if source:
+                try:
+                    _index = PrefixIndex(postgres_lexicon() if source == "postgres" else read_snapshot(source))
+                except Exception as e:
+                    print(f"Autocomplete index {source} could not be loaded: {e}")
+    return _index
+
+
+if __name__ == "__main__":
+    # python -m neXSim.autocomplete <output path> [postgres|neo4j]
+    if len(sys.argv) < 2:
+        print("Usage: python -m neXSim.autocomplete <output path> [postgres|neo4j]")
+        sys.exit(1)
+
+    _start = time.perf_counter()
+    source = sys.argv[2] if len(sys.argv) > 2 else "postgres"
+    count = write_snapshot(sys.argv[1], neo4j_lexicon() if source == "neo4j" else postgres_lexicon())
+    print(f"Autocomplete snapshot with {count} entities written in {round(time.perf_counter() - _start, 2)} s")
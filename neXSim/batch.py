@@ -0,0 +1,93 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from neXSim import DatasetManager
+from neXSim.characterization import characterize, kernel_explanation
+from neXSim.lca import lca, parse_neo4j_result
+from neXSim.models import Atom, BatchResponse, NeXSimResponse, Summary
+from neXSim.pipeline import Stage, run_pipeline
+from neXSim.summary import SummaryBuilder
+from neXSim.tracing import span
+
+# Oneshot computation of many units: the units overlap in entities, so the summaries and the direct
+# instances/part_of of the distinct entities are fetched once, in bulk; then each unit runs the
+# characterization and the LCA pipeline on the prefetched rows.
+
+BATCH_THREADS = int(os.environ.get('BATCH_THREADS', 2))
+
+_batch_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def batch_pool() -> ThreadPoolExecutor:
+    # units run on their own pool: the stages of each unit are scheduled on the pipeline pool
+    global _batch_pool
+    with _pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ThreadPoolExecutor(max_workers=max(BATCH_THREADS, 1), thread_name_prefix="batch")
+    return _batch_pool
+
+
+class Prefetch:
+
+    def __init__(self, units: list[list[str]]) -> None:
+        self.entities: list[str] = list(dict.fromkeys(e for unit in units for e in unit))
+        self.summaries: dict[str, Summary] = {}
+        self.direct_instances: dict[str, list[Atom]] = {e: [] for e in self.entities}
+        self.direct_part_of: dict[str, list[Atom]] = {e: [] for e in self.entities}
+        self.computation_times: dict[str, float] = {"entities": len(self.entities)}
+
+    def fetch(self):
+        d: DatasetManager = DatasetManager()
+        ct = self.computation_times
+
+        with span("summary", "batch", ct):
+            builder = SummaryBuilder(self.entities, d.upper)
+            if len(builder.missing) > 0:
+                builder.add_rows(d.get_full_summary(builder.missing))
+            self.summaries = {e: builder.take(e) for e in self.entities}
+        ct["summary_cache_hits"] = builder.hits
+
+        with span("direct_instances", "batch", ct):
+            for atom in parse_neo4j_result(d.get_direct_instances(_entities=self.entities)):
+                self.direct_instances[atom.source_id].append(atom)
+
+        with span("direct_part_of", "batch", ct):
+            for atom in parse_neo4j_result(d.get_direct_part_of(_entities=self.entities)):
+                self.direct_part_of[atom.source_id].append(atom)
+
+    def unit_rows(self, rows: dict[str, list[Atom]], unit: list[str]) -> list[Atom]:
+        return [atom for e in dict.fromkeys(unit) for atom in rows[e]]
+
+    def stages(self, upper: bool = False, engine: str | None = None) -> list[Stage]:
+        # same stages of nexsim_stages, the summary and the direct rows come from the prefetch
+        def summary(_input: NeXSimResponse):
+            _input.summaries = [self.summaries[e] for e in _input.unit]
+            _input.computation_times["summary"] = 0.0
+
+        def lowest_common_ancestors(_input: NeXSimResponse):
+            lca(_input, upper, engine,
+                self.unit_rows(self.direct_instances, _input.unit),
+                self.unit_rows(self.direct_part_of, _input.unit))
+
+        return [
+            Stage("summary", summary),
+            Stage("characterization", characterize, ["summary"]),
+            Stage("lca", lowest_common_ancestors),
+            Stage("ker", kernel_explanation, ["summary", "lca"]),
+        ]
+
+
+def batch_oneshot(units: list[list[str]], upper: bool = False, engine: str | None = None) -> BatchResponse:
+    prefetch = Prefetch(units)
+    with span("batch", "request", prefetch.computation_times) as s:
+        prefetch.fetch()
+
+        stages = prefetch.stages(upper, engine)
+        responses = [NeXSimResponse(unit=unit) for unit in units]
+        for future in [batch_pool().submit(run_pipeline, response, stages) for response in responses]:
+            future.result()
+        s.rows = len(units)
+
+    return BatchResponse(results=dict(enumerate(responses)), computation_times=prefetch.computation_times)
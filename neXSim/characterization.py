@@ -1,37 +1,83 @@
-import copy
-import time
-
-from neXSim.models import Atom, BabelNetID, NeXSimResponse, Variable, Summary, Entity
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from neXSim.atoms import (CompactAtom, TermTable, FREE_VARIABLE, bound_variable,
+                          predicate_mask, target_masks, mask_predicates)
+from neXSim.deadline import check
+from neXSim.models import Atom, BabelNetID, NeXSimResponse, Variable, Summary, Entity, trusted_atom
+from neXSim.tracing import span, stage_times
+
+
+# Predicate sets are encoded as integer bitmasks: each predicate is interned to a bit,
+# so that intersections are "&" and subset checks are "a & b == a".
+
+class PredicateInterner:
+
+    def __init__(self) -> None:
+        self.bits: dict[str, int] = {}
+        self.predicates: list[str] = []
+
+    def bit(self, predicate: str) -> int:
+        if predicate not in self.bits:
+            self.bits[predicate] = 1 << len(self.predicates)
+            self.predicates.append(predicate)
+        return self.bits[predicate]
+
+    def to_mask(self, predicates: set[str]) -> int:
+        mask = 0
+        for p in predicates:
+            mask |= self.bit(p)
+        return mask
+
+    def to_set(self, mask: int) -> set[str]:
+        out: set[str] = set()
+        while mask:
+            low = mask & -mask
+            out.add(self.predicates[low.bit_length() - 1])
+            mask ^= low
+        return out
+
+
+def maximal_masks(masks) -> list[int]:
+    # antichain of the maximal masks (duplicates removed, order of first appearance preserved):
+    # candidates are visited by decreasing cardinality, so each one is only checked against the kept ones
+    unique = list(dict.fromkeys(masks))
+    maximal: list[int] = []
+    for m in sorted(unique, key=int.bit_count, reverse=True):
+        if not any(m & k == m for k in maximal):
+            maximal.append(m)
+    kept = set(maximal)
+    return [m for m in unique if m in kept]
+
+
+def maximal_intersection_masks(l: list[int], r: list[int]) -> list[int]:
+    # the intersections with a non-maximal operand are subsets of the ones with its superset,
+    # so only the maximal operands are intersected
+    intersection: dict[int, None] = {}
+    right = maximal_masks(r)
+    for left in maximal_masks(l):
+        for other in right:
+            intersection[left & other] = None
+    return list(intersection.keys())
 
 
 def clean_strict_subsets(to_clean: list[set[str]]) -> list[set[str]]:
-    to_return = copy.deepcopy(to_clean)
-    for subset in to_clean:
-        for other_subset in to_clean:
-            if len(other_subset) < len(subset) and other_subset.issubset(subset):
-                if other_subset in to_return:
-                    to_return.remove(other_subset)
-    return to_return
+    interner = PredicateInterner()
+    return [interner.to_set(m) for m in maximal_masks([interner.to_mask(s) for s in to_clean])]
 
 
 def maximal_intersection(l: list[set[str]],
                          r: list[set[str]]) -> list[set[str]]:
-    intersection: list[set[str]] = []
-    for left in l:
-        for right in r:
-            _int = left.intersection(right)
-            if _int not in intersection:
-                intersection.append(_int)
-    return list(intersection)
+    interner = PredicateInterner()
+    return [interner.to_set(m) for m in maximal_intersection_masks([interner.to_mask(s) for s in l],
+                                                                   [interner.to_mask(s) for s in r])]
 
 
 def remove_if_covered_by_constants(source: list[set[str]],
                                    target: list[set[str]]) -> list[set[str]]:
-    to_return: list[set[str]] = []
-    for _set in source:
-        if _set not in target:
-            to_return.append(_set)
-    return to_return
+    covered = set(frozenset(s) for s in target)
+    return [s for s in source if frozenset(s) not in covered]
 
 
 def to_relation_map(_to_parse: list[Atom], allowed_predicates: set[str]):
@@ -39,20 +85,30 @@ def to_relation_map(_to_parse: list[Atom], allowed_predicates: set[str]):
 
     for atom in _to_parse:
         if atom.predicate in allowed_predicates:
-            if atom.target_id not in parsed.keys():
-                if isinstance(atom.target_id, str):
-                    parsed[atom.target_id] = {atom.predicate}
-                elif isinstance(atom.target_id, Variable):
-                    parsed[str(atom.target_id)] = {atom.predicate}
+            # variables are keyed by their name (a Variable never equals its str key)
+            key = atom.target_id if isinstance(atom.target_id, str) else str(atom.target_id)
+            if key not in parsed.keys():
+                parsed[key] = {atom.predicate}
             else:
-                if isinstance(atom.target_id, str):
-                    parsed[atom.target_id].add(atom.predicate)
-                elif isinstance(atom.target_id, Variable):
-                    parsed[str(atom.target_id)].add(atom.predicate)
+                parsed[key].add(atom.predicate)
+
+    return parsed
+
+
+def to_relation_masks(_to_parse, allowed_predicates: set[str], interner: PredicateInterner) -> dict[str, int]:
+    # same grouping of to_relation_map, with the predicate sets as bitmasks
+    parsed: dict[str, int] = {}
+
+    for atom in _to_parse:
+        if atom.predicate in allowed_predicates:
+            key = atom.target_id if isinstance(atom.target_id, str) else str(atom.target_id)
+            parsed[key] = parsed.get(key, 0) | interner.bit(atom.predicate)
 
     return parsed
 
 
+# compute_pairwise_characterization, on pydantic Atoms, is the reference of the compact characterization
+# (benchmarks and tests)
 def compute_pairwise_characterization(_left_operand: list[Atom],
                                       _right_operand: list[Atom],
                                       _free_variable: Variable) -> list[Atom]:
@@ -67,32 +123,20 @@ def compute_pairwise_characterization(_left_operand: list[Atom],
     # I'll take the intersection of summaries
     common_summary = set(_left_operand).intersection(set(_right_operand))
 
-    left_constant_map: dict[BabelNetID, set[str]] = to_relation_map(_left_operand, common_predicates)
-    right_constant_map: dict[BabelNetID, set[str]] = to_relation_map(_right_operand, common_predicates)
+    interner = PredicateInterner()
+    left_constant_masks: dict[str, int] = to_relation_masks(_left_operand, common_predicates, interner)
+    right_constant_masks: dict[str, int] = to_relation_masks(_right_operand, common_predicates, interner)
 
-    common_map: dict[BabelNetID, set[str]] = to_relation_map(list(common_summary), common_predicates)
+    common_masks: dict[str, int] = to_relation_masks(common_summary, common_predicates, interner)
 
     # now, no matter of the keys, I need just to know whether any of these
     # generated sets is associated with the strict subset of another
     # in this case, I will remove it
 
-    left_candidate_variables: list[set[str]] = []
-    for k in left_constant_map.keys():
-        left_candidate_variables.append(left_constant_map[k])
-
-    right_candidate_variables: list[set[str]] = []
-    for k in right_constant_map.keys():
-        right_candidate_variables.append(right_constant_map[k])
-
-    common_values: list[set[str]] = []
-    for k in common_map.keys():
-        common_values.append(common_map[k])
-
-    common_values = clean_strict_subsets(common_values)
-    maximal_subsets: list[set[str]] = maximal_intersection(left_candidate_variables,
-                                                           right_candidate_variables)
-    maximal_subsets = clean_strict_subsets(maximal_subsets)
-    variables: list[set[str]] = remove_if_covered_by_constants(maximal_subsets, common_values)
+    common_values: set[int] = set(maximal_masks(common_masks.values()))
+    maximal_subsets: list[int] = maximal_masks(maximal_intersection_masks(list(left_constant_masks.values()),
+                                                                          list(right_constant_masks.values())))
+    variables: list[set[str]] = [interner.to_set(m) for m in maximal_subsets if m not in common_values]
 
     bound_variables: list[Variable] = []
 
@@ -111,80 +155,123 @@ def compute_pairwise_characterization(_left_operand: list[Atom],
     return to_return
 
 
-def one_entity_characterization(summary:list[Atom], entity:BabelNetID) -> list[Atom]:
+def compact_pairwise_characterization(_left_operand: list[CompactAtom],
+                                      _right_operand: list[CompactAtom]) -> list[CompactAtom]:
+    # compute_pairwise_characterization on the compact atoms: predicate ids are bit positions,
+    # so the predicate sets of the targets are built directly as bitmasks
+    common_predicates = predicate_mask(_left_operand) & predicate_mask(_right_operand)
 
-    free_variable = Variable(is_free=True, origin=[entity], nominal=1)
+    # bound variables of different operands are different terms (both operands have them in a tree reduction)
+    common_summary = {a for a in set(_left_operand).intersection(_right_operand) if a[1] >= FREE_VARIABLE}
 
-    for atom in summary:
-        if atom.source_id == entity:
-            atom.source_id = free_variable
-        if atom.target_id == entity:
-            atom.target_id = free_variable
+    left_constant_masks = target_masks(_left_operand, common_predicates)
+    right_constant_masks = target_masks(_right_operand, common_predicates)
+    common_masks = target_masks(common_summary, common_predicates)
 
-    return summary
+    common_values: set[int] = set(maximal_masks(common_masks.values()))
+    maximal_subsets: list[int] = maximal_masks(maximal_intersection_masks(list(left_constant_masks.values()),
+                                                                          list(right_constant_masks.values())))
 
+    to_return: list[CompactAtom] = list(common_summary)
 
-def compute_characterization(summaries):
-    summaries = sorted(summaries)
+    # each maximal set not covered by the constants becomes a bound variable
+    nominal = 0
+    for m in maximal_subsets:
+        if m in common_values:
+            continue
+        v = bound_variable(nominal)
+        nominal += 1
+        for p in mask_predicates(m):
+            to_return.append((FREE_VARIABLE, v, p))
 
-    x: Variable = Variable(is_free=True,
-                           origin=[tmp.entity for tmp in summaries if tmp is not None])
+    return to_return
 
-    # in each summary (in the copy), substitute the entity with the free variable
-    new_summaries = []
-    for s in summaries:
-        e = s.entity
-        tops = s.tops
-        atoms: list[Atom] = []
-        for atom in s.summary:
-            tmp: Atom = atom
-            if tmp.source_id == e:
-                tmp = Atom(source_id=x, target_id=atom.target_id, predicate=atom.predicate)
-            if tmp.target_id == e:
-                tmp = Atom(source_id=atom.source_id, target_id=x, predicate=atom.predicate)
-            atoms.append(tmp)
-        new_summaries.append(Summary(entity=e, tops=tops, summary=atoms))
-
-    if len(new_summaries) < 1:
-        raise Exception("You need at least one entity to characterize your unit")
-    elif len(new_summaries) == 1:
 
-        return one_entity_characterization(new_summaries[0].summary, new_summaries[0].entity)
+# Large units are reduced as a balanced tree of pairwise characterizations (the pairwise characterization
+# is associative up to variable renaming), each level running on a process pool.
+# CHARACTERIZATION_PROCESSES = 0 keeps the sequential left fold.
+
+CHARACTERIZATION_PROCESSES = int(os.environ.get('CHARACTERIZATION_PROCESSES', 0))
+CHARACTERIZATION_TREE_MIN = int(os.environ.get('CHARACTERIZATION_TREE_MIN', 8))
 
-    left_operand = new_summaries[0].summary
+_characterization_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
 
-    new_summaries.pop(0)
 
-    while len(new_summaries) > 0:
-        right_operand = new_summaries[0].summary
-        new_summaries.pop(0)
+def characterization_pool() -> ProcessPoolExecutor | None:
+    global _characterization_pool
+    if CHARACTERIZATION_PROCESSES <= 0:
+        return None
+    with _pool_lock:
+        if _characterization_pool is None:
+            _characterization_pool = ProcessPoolExecutor(max_workers=CHARACTERIZATION_PROCESSES)
+    return _characterization_pool
 
-        left_operand = compute_pairwise_characterization(left_operand, right_operand, x)
 
+def fold_characterization(operands: list[list[CompactAtom]]) -> list[CompactAtom]:
+    left_operand = operands[0]
+    for right_operand in operands[1:]:
+        check("characterization")
+        left_operand = compact_pairwise_characterization(left_operand, right_operand)
     return left_operand
 
 
+def tree_characterization(operands: list[list[CompactAtom]], pool: ProcessPoolExecutor) -> list[CompactAtom]:
+    # the operands are sorted by size: neighbours are merged, so that the small summaries meet first
+    while len(operands) > 1:
+        check("characterization")
+        futures = [pool.submit(compact_pairwise_characterization, operands[i], operands[i + 1])
+                   for i in range(0, len(operands) - 1, 2)]
+        merged = [f.result() for f in futures]
+        if len(operands) % 2 == 1:
+            merged.append(operands[-1])
+        operands = merged
+    return operands[0]
+
+
+def compute_characterization(summaries):
+    summaries = sorted(summaries)
+
+    if len(summaries) < 1:
+        raise Exception("You need at least one entity to characterize your unit")
+
+    x: Variable = Variable(is_free=True,
+                           origin=[tmp.entity for tmp in summaries if tmp is not None])
+
+    # the summaries are reduced on their compact form (the entity of each summary is the free variable),
+    # and only the result is converted back to Atoms
+    terms = TermTable(x)
+    operands = [terms.encode_summary(s) for s in summaries]
+
+    pool = characterization_pool()
+    if pool is not None and len(operands) >= CHARACTERIZATION_TREE_MIN:
+        return terms.decode_atoms(tree_characterization(operands, pool))
+    return terms.decode_atoms(fold_characterization(operands))
+
+
 def characterize(_input: NeXSimResponse):
-    _start = time.perf_counter()
-    summaries = copy.deepcopy(_input.summaries)
-    _input.characterization = compute_characterization(summaries)
-    tops = set()
-    for atom in _input.characterization:
-        tops.add(str(atom.target_id))
-        tops.add(str(atom.source_id))
-    _input.tops = list(tops)
-    if _input.computation_times is None:
-        _input.computation_times = {"characterization": round(time.perf_counter() - _start, 5)}
-    else:
-        ct = _input.computation_times
-        ct["characterization"] = round(time.perf_counter() - _start, 5)
+    with span("characterization", "stage", stage_times(_input)) as s:
+        # the summaries are only read, the characterization is built on their compact form
+        _input.characterization = compute_characterization(_input.summaries)
+        tops = set()
+        for atom in _input.characterization:
+            tops.add(str(atom.target_id))
+            tops.add(str(atom.source_id))
+        _input.tops = list(tops)
+        s.rows = len(_input.characterization)
 
 
 # kernel explanation is a characterization-like explanation
 # built on top of "summary tilde", which is essentially the summary minus the "hypernyms"/"meronyms"
 # which are substituted with the LCAs
 def kernel_explanation(_input: NeXSimResponse):
-    _start = time.perf_counter()
+    with span("ker", "stage", stage_times(_input)) as s:
+        _input.short_summaries = short_summaries(_input)
+        _input.kernel_explanation = compute_characterization(_input.short_summaries)
+        s.rows = len(_input.kernel_explanation)
+
+
+def short_summaries(_input: NeXSimResponse) -> list[Summary]:
     summary_tilde: list[Summary] = []
     for summary in _input.summaries:
         entity = summary.entity
@@ -201,33 +288,24 @@ def kernel_explanation(_input: NeXSimResponse):
                 tmp_tops.add(atom.target_id)
 
         for atom in _input.lca:
-            tmp_atoms.append(Atom(source_id=entity, target_id=atom.target_id, predicate=atom.predicate))
+            tmp_atoms.append(trusted_atom(entity, atom.target_id, atom.predicate))
             tmp_tops.add(atom.target_id)
 
         for constant in constants_to_names.keys():
             if (len(constants_to_names[constant]) > 1
                     and ('IS_A' in constants_to_names[constant] or 'is_a' in constants_to_names[constant])):
-                tmp_atoms.append(Atom(source_id=entity,
-                                      target_id=constant,
-                                      predicate='IS_A' if 'IS_A' in constants_to_names[constant] else 'is_a'))
+                tmp_atoms.append(trusted_atom(entity, constant,
+                                              'IS_A' if 'IS_A' in constants_to_names[constant] else 'is_a'))
                 tmp_tops.add(constant)
             if (len(constants_to_names[constant]) > 1
                     and ('PART_OF' in constants_to_names[constant] or 'part_of' in constants_to_names[constant])):
-                tmp_atoms.append(Atom(source_id=entity,
-                                      target_id=constant,
-                                      predicate='PART_OF' if 'PART_OF' in constants_to_names[constant] else 'part_of'))
+                tmp_atoms.append(trusted_atom(entity, constant,
+                                              'PART_OF' if 'PART_OF' in constants_to_names[constant] else 'part_of'))
                 tmp_tops.add(constant)
 
         summary_tilde.append(Summary(entity=summary.entity, tops=list(tmp_tops), summary=tmp_atoms))
 
-    _input.short_summaries = summary_tilde
-    _input.kernel_explanation = compute_characterization(summary_tilde)
-
-    if _input.computation_times is None:
-        _input.computation_times = {"ker": round(time.perf_counter() - _start, 5)}
-    else:
-        ct = _input.computation_times
-        ct["ker"] = round(time.perf_counter() - _start, 5)
+    return summary_tilde
 
 
 # the characterization obtained via "direct product" of summaries
@@ -0,0 +1,142 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator
+
+# Per-request time budgets: ?budget_ms= (between 1 and REQUEST_MAX_BUDGET_MS), by default REQUEST_BUDGET_MS
+# (60 s; 0 leaves the requests without a budget unbounded).
+# The deadline of the current computation is kept in a context variable: the pipeline narrows it for each stage,
+# the Neo4j reads run as transactions with the remaining time as timeout, the clingo solves are cancelled
+# when it expires, and the long CPU-bound loops (characterization) check it between steps.
+# A stage that runs out of time raises DeadlineExceeded: the response carries the stages that finished
+# and lists the others in NeXSimResponse.incomplete.
+# The context is not inherited by the threads of a pool: tasks are submitted with submit_in_context.
+
+REQUEST_BUDGET_MS = int(os.environ.get('REQUEST_BUDGET_MS', 60000))
+REQUEST_MAX_BUDGET_MS = int(os.environ.get('REQUEST_MAX_BUDGET_MS', 600000))
+
+# below this remaining time, a Neo4j transaction is not even started (a timeout of 0 means no timeout)
+MIN_TIMEOUT = 0.001
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+
+    def __init__(self, budget: float) -> None:
+        # budget in seconds
+        self.expires = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(self.expires - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+
+_deadline: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar("neXSim_deadline", default=None)
+
+
+def narrowed(budget: float | None) -> Deadline | None:
+    # budget in seconds; the deadline is never later than the enclosing one (None keeps the enclosing one)
+    current = _deadline.get()
+    if budget is None:
+        return current
+    new = Deadline(budget)
+    if current is not None and current.expires < new.expires:
+        return current
+    return new
+
+
+@contextmanager
+def deadline(budget: float | None) -> Iterator[Deadline | None]:
+    if budget is None:
+        yield _deadline.get()
+        return
+    new = narrowed(budget)
+    token = _deadline.set(new)
+    try:
+        yield new
+    finally:
+        _deadline.reset(token)
+
+
+# A streamed response is iterated after its handler has returned, out of the handler's context: the deadline is
+# fixed when the stream is created and set again around the computation of each item. A stream that runs out of
+# time ends after the last item computed in time.
+
+def stream_within(budget: float | None, items: Iterator) -> Iterator:
+    current = narrowed(budget)
+    items = iter(items)
+
+    def streamed():
+        while True:
+            token = _deadline.set(current)
+            try:
+                item = next(items)
+            except (StopIteration, DeadlineExceeded):
+                return
+            finally:
+                _deadline.reset(token)
+            yield item
+
+    return streamed()
+
+
+def stream_within_async(budget: float | None, items: AsyncIterator) -> AsyncIterator:
+    current = narrowed(budget)
+
+    async def streamed():
+        while True:
+            token = _deadline.set(current)
+            try:
+                item = await anext(items)
+            except (StopAsyncIteration, DeadlineExceeded):
+                return
+            finally:
+                _deadline.reset(token)
+            yield item
+
+    return streamed()
+
+
+def remaining() -> float | None:
+    # seconds left to the current deadline, None when unbounded
+    current = _deadline.get()
+    return None if current is None else current.remaining()
+
+
+def check(what: str = "computation"):
+    current = _deadline.get()
+    if current is not None and current.expired():
+        raise DeadlineExceeded(f"{what} ran out of time")
+
+
+def timeout(what: str = "query") -> float | None:
+    # the timeout of the next blocking call: None when unbounded, DeadlineExceeded when already expired
+    left = remaining()
+    if left is not None and left < MIN_TIMEOUT:
+        raise DeadlineExceeded(f"{what} ran out of time")
+    return left
+
+
+def submit_in_context(pool, fn, *args, **kwargs):
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def request_budget(budget_ms: str | None) -> float | None:
+    # the budget of a request in seconds (the budget_ms parameter, or REQUEST_BUDGET_MS), None when unbounded;
+    # ValueError on an invalid parameter
+    if budget_ms is None:
+        budget = REQUEST_BUDGET_MS
+    else:
+        try:
+            budget = int(budget_ms)
+        except ValueError:
+            budget = 0
+        if not 0 < budget <= REQUEST_MAX_BUDGET_MS:
+            raise ValueError(f"Invalid budget_ms. It should be an integer between 1 and {REQUEST_MAX_BUDGET_MS}.")
+    return budget / 1000 if budget > 0 else None
@@ -0,0 +1,175 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Iterator
+
+from neXSim.models import Atom
+
+# Interface of the graph backends behind DatasetManager (neo4j_manager.Neo4jBackend, memory_graph.MemoryGraph)
+# and AsyncDatasetManager (async_neo4j_manager.AsyncNeo4jBackend, ThreadedGraphBackend).
+# Every method returns the rows of the corresponding Neo4j query (same keys, same relation names),
+# so that the callers do not depend on the backend.
+
+
+class DatasetUnavailable(Exception):
+    # the backend cannot serve the request (e.g. Neo4j is not reachable)
+    pass
+
+
+class GraphBackend(ABC):
+    # the relations are upper case (see PREDICATES_UPPER)
+    upper: bool = False
+
+    @abstractmethod
+    def get_entities(self, _ids: list[str]) -> list[dict]:
+        # id, mainSense, description, synonyms, image_url, type
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_entities_by_lemma(self, lemma: str, page: int, skip: int, limit: int = 10,
+                              after: tuple[float, str] | None = None) -> list[dict]:
+        # the entity rows with their rank, by decreasing rank and increasing id (after: keyset cursor)
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_direct_instances(self, _entities: list[str]) -> list[dict]:
+        # source, relation, target, type = "HYPERNYM" (instance_of, is_a and subclass_of edges of the entities)
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_direct_part_of(self, _entities: list[str]) -> list[dict]:
+        # source, relation, target, type = "MERONYM"
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_full_summary(self, _entities: list[str]) -> list[dict]:
+        # for, source, relation, target
+        raise NotImplementedError
+
+    def stream_full_summary(self, _entities: list[str]) -> Iterator[tuple[str, list[dict]]]:
+        for entity in dict.fromkeys(_entities):
+            yield entity, self.get_full_summary([entity])
+
+    @abstractmethod
+    def get_raw_subclass(self, _entities: list[str], _direct_instances: list[Atom]) -> list[dict]:
+        # source, relation, target of the subclass_of edges reachable from the entities and their classes
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_raw_part_of(self, _entities: list[str], _direct_instances: list[Atom]) -> list[dict]:
+        # source, relation, target of the part_of edges reachable from the entities
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_others(self, _entities: list[str]) -> list[dict]:
+        # source, relation, target of the non taxonomic edges of the entities
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_edges(self, _relation: str) -> Iterator[tuple[str, str]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_lexicon(self) -> Iterator[tuple[str, int, str, list[str]]]:
+        # id, undirected_edges, main sense, synonyms
+        raise NotImplementedError
+
+    def clear_query_cache(self):
+        pass
+
+    def open(self):
+        # opens the connections (e.g. in each gunicorn worker, after the fork)
+        pass
+
+    def close(self):
+        pass
+
+
+class AsyncGraphBackend(ABC):
+    # the coroutines of GraphBackend, returning the same rows
+    upper: bool = False
+
+    @abstractmethod
+    async def get_entities(self, _ids: list[str]) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_entities_by_lemma(self, lemma: str, page: int, skip: int, limit: int = 10,
+                                    after: tuple[float, str] | None = None) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_direct_instances(self, _entities: list[str]) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_direct_part_of(self, _entities: list[str]) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_full_summary(self, _entities: list[str]) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stream_full_summary(self, _entities: list[str]) -> AsyncIterator[tuple[str, list[dict]]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_raw_subclass(self, _entities: list[str], _direct_instances: list[Atom]) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_raw_part_of(self, _entities: list[str], _direct_instances: list[Atom]) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_others(self, _entities: list[str]) -> list[dict]:
+        raise NotImplementedError
+
+    async def open(self):
+        # opens the connections, in the event loop of the worker
+        pass
+
+    async def close(self):
+        pass
+
+
+class ThreadedGraphBackend(AsyncGraphBackend):
+    # a synchronous backend (e.g. the MemoryGraph) behind the async interface: each call runs in the default
+    # executor, with the context of the caller (its deadline)
+
+    def __init__(self, backend: GraphBackend) -> None:
+        self.backend = backend
+        self.upper = backend.upper
+
+    async def get_entities(self, _ids):
+        return await asyncio.to_thread(self.backend.get_entities, _ids)
+
+    async def get_entities_by_lemma(self, lemma, page, skip, limit: int = 10, after=None):
+        return await asyncio.to_thread(self.backend.get_entities_by_lemma, lemma, page, skip, limit, after)
+
+    async def get_direct_instances(self, _entities):
+        return await asyncio.to_thread(self.backend.get_direct_instances, _entities)
+
+    async def get_direct_part_of(self, _entities):
+        return await asyncio.to_thread(self.backend.get_direct_part_of, _entities)
+
+    async def get_full_summary(self, _entities):
+        return await asyncio.to_thread(self.backend.get_full_summary, _entities)
+
+    async def stream_full_summary(self, _entities):
+        summaries = self.backend.stream_full_summary(_entities)
+        done = object()
+        try:
+            while (summary := await asyncio.to_thread(next, summaries, done)) is not done:
+                yield summary
+        finally:
+            summaries.close()
+
+    async def get_raw_subclass(self, _entities, _direct_instances):
+        return await asyncio.to_thread(self.backend.get_raw_subclass, _entities, _direct_instances)
+
+    async def get_raw_part_of(self, _entities, _direct_instances):
+        return await asyncio.to_thread(self.backend.get_raw_part_of, _entities, _direct_instances)
+
+    async def get_others(self, _entities):
+        return await asyncio.to_thread(self.backend.get_others, _entities)
@@ -1,7 +1,14 @@
-import time
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 from neXSim import DatasetManager
-from neXSim.models import Atom, NeXSimResponse, Variable
+from neXSim.async_neo4j_manager import AsyncDatasetManager
+from neXSim.deadline import DeadlineExceeded, check, deadline, remaining, submit_in_context
+from neXSim.models import Atom, NeXSimResponse, Variable, trusted_atom
+from neXSim.tracing import span, collect, replay, stage_times
 from neXSim.utils import (pred_identifier_to_clingo_relation as to_clingo)
 
 HYPERNYM_TRANSITIVE_CLOSURE = """
@@ -26,46 +33,225 @@ leastCommon(X) :- common(X), not noLeastCommon(X).
 """
 
 import clingo
+import clingo.ast
+
+CLINGO_ENGINE = "clingo"
+NATIVE_ENGINE = "native"
+LCA_ENGINES = [CLINGO_ENGINE, NATIVE_ENGINE]
+
+
+def default_lca_engine() -> str:
+    engine = os.environ.get('LCA_ENGINE', CLINGO_ENGINE).lower()
+    if engine not in LCA_ENGINES:
+        raise Exception(f"LCA engine {engine} is not supported. Valid engines are {LCA_ENGINES}")
+    return engine
+
+
+def last_model(ctl: clingo.Control) -> list[clingo.Symbol]:
+    # the symbols of the last model; under a deadline, the solve is asynchronous and cancelled when it expires
+    symbols = []
+    left = remaining()
+    if left is None:
+        with ctl.solve(yield_=True) as hnd:
+            for m in hnd:
+                symbols = m.symbols(atoms=True)
+        return symbols
+
+    with ctl.solve(yield_=True, async_=True) as hnd:
+        while True:
+            hnd.resume()
+            if not hnd.wait(remaining()):
+                hnd.cancel()
+                raise DeadlineExceeded("clingo solve ran out of time")
+            m = hnd.model()
+            if m is None:
+                break
+            symbols = m.symbols(atoms=True)
+    return symbols
+
+
+# Backend-fed clingo execution: only the parsing is cached. The closure and the LCA programs are parsed once
+# per relation, and added as ASTs to a new control for every unit; the facts are pushed as symbols through the
+# backend, then the closure and the LCA parts are grounded for them as two steps of that control.
+# A grounded control is not reused across units: the rules must be grounded again on the facts of each unit.
+
+CLOSURE_PROGRAMS = {
+    "is_a": HYPERNYM_TRANSITIVE_CLOSURE,
+    "part_of": MERONYM_TRANSITIVE_CLOSURE
+}
+
+_parsed_programs: dict[str, list] = {}
+
+
+def parsed_lca_program(relation: str) -> list:
+    if relation not in _parsed_programs:
+        statements = []
+        clingo.ast.parse_string("#program closure.\n" + CLOSURE_PROGRAMS[relation]
+                                + "#program lca.\n" + LCA_PROGRAM.format(r=relation),
+                                statements.append)
+        _parsed_programs[relation] = statements
+    return _parsed_programs[relation]
+
+
+def push_facts(ctl: clingo.Control, entities: list[str], relations: list[Atom]):
+    strings: dict[str, clingo.Symbol] = {}
+    names: dict[str, str] = {}
+
+    def to_symbol(_id) -> clingo.Symbol:
+        _id = str(_id)
+        if _id not in strings:
+            strings[_id] = clingo.String(_id)
+        return strings[_id]
+
+    with ctl.backend() as backend:
+        for entity in entities:
+            backend.add_rule([backend.add_atom(clingo.Function("seed", [to_symbol(entity)]))])
+        for relation in relations:
+            if relation.predicate not in names:
+                names[relation.predicate] = to_clingo(relation.predicate)
+            fact = clingo.Function(names[relation.predicate],
+                                   [to_symbol(relation.source_id), to_symbol(relation.target_id)])
+            backend.add_rule([backend.add_atom(fact)])
+
+
+def execute_clingo_session(unit: list[str], relations: list[Atom], relation: str, out_name: str) \
+        -> tuple[list[Atom], dict[str, float]]:
+    return_value: list[Atom] = []
+    stats: dict[str, float] = {}
+    ctl = clingo.Control()
 
+    with clingo.ast.ProgramBuilder(ctl) as builder:
+        for statement in parsed_lca_program(relation):
+            builder.add(statement)
 
-def inject_facts(entities: list[str], relations: list[Atom]) -> str:
-    facts = ""
-    for entity in entities:
-        facts += f'seed("{entity}").\n'
-    for relation in relations:
-        tmp = to_clingo(relation.predicate)
-        facts += f'{tmp}("{relation.source_id}","{relation.target_id}").\n'
+    with span(f"{relation}_facts", "clingo") as s:
+        push_facts(ctl, unit, relations)
+        s.rows = len(relations)
+    stats["facts"] = s.elapsed
 
-    return facts
+    with span(f"{relation}_ground", "clingo") as s:
+        ctl.ground([("closure", [])])
+        check("clingo grounding")
+        ctl.ground([("lca", [])])
+        check("clingo grounding")
+    stats["ground"] = s.elapsed
 
+    with span(f"{relation}_solve", "clingo") as s:
+        return_value = [Atom(source_id=Variable(is_free=True, origin=unit),
+                             target_id=atom.arguments[0].string,
+                             predicate=out_name)
+                        for atom in last_model(ctl) if atom.name == "leastCommon"]
+        s.rows = len(return_value)
+    stats["solve"] = s.elapsed
 
-def execute_clingo_lca(program: str, unit: list[str], out_name: str) -> list[Atom]:
-    return_value: list[Atom] = []
-    ctl = clingo.Control()
-    my_model = None
-    ctl.add("base", [], program)
-    ctl.ground([("base", [])])
+    lp_stats = ctl.statistics["problem"]["lp"]
+    stats["atoms"] = lp_stats["atoms"]
+    stats["rules"] = lp_stats["rules"]
 
-    with ctl.solve(yield_=True) as hnd:
-        for m in hnd:
-            my_model = m.symbols(atoms=True)
+    return return_value, stats
 
-    for atom in my_model:
-        if atom.name.startswith('leastCommon'):
-            return_value.append(Atom(source_id=Variable(is_free=True, origin=unit),
-                                     target_id=str(atom.arguments[0]).replace('"', ''),
-                                     predicate=out_name
-                                     ))
-    return return_value
+
+def add_clingo_stats(computation_times: dict[str, float] | None, prefix: str, stats: dict[str, float]):
+    if computation_times is None:
+        return
+    for k in stats.keys():
+        computation_times[f"{prefix}_{k}"] = stats[k]
+
+
+# Native engine: computes the same "leastCommon" atoms of LCA_PROGRAM directly on the fetched atoms,
+# without grounding the transitive closure and the quadratic "notAncestor" rule.
+# Successors are kept per relation as adjacency sets, closures are computed lazily (and memoized) only
+# for the seeds and for the common ancestors.
+
+def to_adjacency(relations: list[Atom]) -> dict[str, dict[str, set[str]]]:
+    adjacency: dict[str, dict[str, set[str]]] = {}
+    for relation in relations:
+        successors = adjacency.setdefault(to_clingo(relation.predicate), {})
+        successors.setdefault(str(relation.source_id), set()).add(str(relation.target_id))
+    return adjacency
+
+
+def transitive_successors(graph: dict[str, set[str]], node: str, memo: dict[str, set[str]]) -> set[str]:
+    # iterative DFS, so that deep taxonomies do not hit the recursion limit
+    if node in memo:
+        return memo[node]
+    reached: set[str] = set()
+    stack = list(graph.get(node, ()))
+    while stack:
+        current = stack.pop()
+        if current in reached:
+            continue
+        reached.add(current)
+        if current in memo:
+            reached.update(memo[current])
+            continue
+        stack.extend(graph.get(current, ()))
+    memo[node] = reached
+    return reached
+
+
+def hypernym_successors(adjacency: dict[str, dict[str, set[str]]], memo: dict[str, set[str]] | None = None):
+    # is_a(X,Y) as derived by HYPERNYM_TRANSITIVE_CLOSURE:
+    # the is_a facts, the closure of subclass_of and instance_of followed by any subclass_of chain
+    # (memo caches the subclass_of closures, and can be shared by the graphs with the same subclass_of)
+    is_a = adjacency.get("is_a", {})
+    instance_of = adjacency.get("instance_of", {})
+    subclass_of = adjacency.get("subclass_of", {})
+    if memo is None:
+        memo = {}
+
+    def successors(node: str) -> set[str]:
+        reached = set(is_a.get(node, ()))
+        reached.update(transitive_successors(subclass_of, node, memo))
+        for parent in instance_of.get(node, ()):
+            reached.add(parent)
+            reached.update(transitive_successors(subclass_of, parent, memo))
+        return reached
+
+    return successors
+
+
+def meronym_successors(adjacency: dict[str, dict[str, set[str]]], memo: dict[str, set[str]] | None = None):
+    # part_of(X,Y) as derived by MERONYM_TRANSITIVE_CLOSURE
+    part_of = adjacency.get("part_of", {})
+    if memo is None:
+        memo = {}
+
+    def successors(node: str) -> set[str]:
+        return transitive_successors(part_of, node, memo)
+
+    return successors
+
+
+def execute_native_lca(unit: list[str], successors, out_name: str) -> list[Atom]:
+    if len(unit) == 0:
+        return []
+
+    # common(E): every seed reaches E (and E is an entity, which holds since it is reached)
+    common: set[str] | None = None
+    for seed in unit:
+        reached = successors(seed)
+        common = set(reached) if common is None else common.intersection(reached)
+        if not common:
+            return []
+
+    # noLeastCommon(E): some other common C reaches E, and E does not reach C back
+    closures: dict[str, set[str]] = {c: successors(c) for c in common}
+    not_least: set[str] = set()
+    for c in common:
+        for e in closures[c].intersection(common):
+            if c not in closures[e]:
+                not_least.add(e)
+
+    return [Atom(source_id=Variable(is_free=True, origin=unit), target_id=target, predicate=out_name)
+            for target in sorted(common.difference(not_least))]
 
 
 def parse_neo4j_result(neo4j_result) -> list[Atom]:
     parsed: list[Atom] = []
 
     for raw_atom in neo4j_result:
-        temp_atom: Atom = Atom(source_id=raw_atom['source'],
-                               target_id=raw_atom['target'],
-                               predicate=raw_atom['relation'])
+        temp_atom: Atom = trusted_atom(raw_atom['source'], raw_atom['target'], raw_atom['relation'])
         parsed.append(temp_atom)
 
     return parsed
@@ -73,58 +259,178 @@ def parse_neo4j_result(neo4j_result) -> list[Atom]:
 
 def compute_direct_instances(unit: list[str]) -> tuple[list[Atom], float]:
     dataset_manager = DatasetManager()
-    _start = time.perf_counter()
-    direct_instances = parse_neo4j_result(dataset_manager.get_direct_instances(_entities=unit))
-    return direct_instances, round(time.perf_counter() - _start, 5)
+    with span("direct_instances", "lca") as s:
+        direct_instances = parse_neo4j_result(dataset_manager.get_direct_instances(_entities=unit))
+        s.rows = len(direct_instances)
+    return direct_instances, s.elapsed
 
 
 def compute_direct_part_of(unit: list[str]) -> tuple[list[Atom], float]:
     dataset_manager = DatasetManager()
-    _start = time.perf_counter()
-    direct_part_of = parse_neo4j_result(dataset_manager.get_direct_part_of(_entities=unit))
-    return direct_part_of, round(time.perf_counter() - _start, 5)
+    with span("direct_part_of", "lca") as s:
+        direct_part_of = parse_neo4j_result(dataset_manager.get_direct_part_of(_entities=unit))
+        s.rows = len(direct_part_of)
+    return direct_part_of, s.elapsed
 
 
 def compute_raw_subgraph_hypernyms_no_dummy_sg(unit: list[str], instances: list[Atom]) -> tuple[list[Atom], float]:
     dataset_manager = DatasetManager()
-    _start = time.perf_counter()
-    raw_hypernyms = parse_neo4j_result(dataset_manager.get_raw_subclass(_entities=unit,
-                                                                        _direct_instances=instances))
-    raw_hypernyms.extend(instances)
-    return raw_hypernyms, round(time.perf_counter() - _start, 5)
+    with span("subgraph_hypernyms", "lca") as s:
+        raw_hypernyms = parse_neo4j_result(dataset_manager.get_raw_subclass(_entities=unit,
+                                                                            _direct_instances=instances))
+        raw_hypernyms.extend(instances)
+        s.rows = len(raw_hypernyms)
+    return raw_hypernyms, s.elapsed
+
+
+
+def compute_hypernym_lca(unit: list[str], raw_hypernyms: list[Atom], upper:bool,
+                         engine: str = CLINGO_ENGINE,
+                         stats: dict[str, float] | None = None) -> tuple[list[Atom], float]:
+    with span("hypernym_lca", "lca") as s:
+        if engine == NATIVE_ENGINE:
+            hypernym_lca: list[Atom] = execute_native_lca(unit, hypernym_successors(to_adjacency(raw_hypernyms)),
+                                                          'is_a' if not upper else 'IS_A')
+        else:
+            hypernym_lca, clingo_stats = execute_clingo_session(unit, raw_hypernyms, "is_a",
+                                                                'is_a' if not upper else 'IS_A')
+            add_clingo_stats(stats, "hypernym_lca", clingo_stats)
+        s.rows = len(hypernym_lca)
+    return hypernym_lca, s.elapsed
 
 
+def compute_raw_subgraph_meronyms_no_dummy_sg(unit: list[str], direct_part_of: list[Atom]) -> tuple[list[Atom], float]:
+    dataset_manager = DatasetManager()
+    with span("subgraph_meronyms", "lca") as s:
+        raw_meronyms = []
+        if len(direct_part_of) > 0:
+            raw_meronyms = parse_neo4j_result(dataset_manager.get_raw_part_of(_entities=unit,
+                                                                              _direct_instances=direct_part_of))
+        s.rows = len(raw_meronyms)
+
+    return raw_meronyms, s.elapsed
+
+
+
+def compute_meronym_lca(unit: list[str], raw_meronyms: list[Atom], upper:bool,
+                        engine: str = CLINGO_ENGINE,
+                        stats: dict[str, float] | None = None) -> tuple[list[Atom], float]:
+    with span("meronym_lca", "lca") as s:
+        if engine == NATIVE_ENGINE:
+            meronym_lca: list[Atom] = execute_native_lca(unit, meronym_successors(to_adjacency(raw_meronyms)),
+                                                         'part_of' if not upper else 'PART_OF')
+        else:
+            meronym_lca, clingo_stats = execute_clingo_session(unit, raw_meronyms, "part_of",
+                                                               'part_of' if not upper else 'PART_OF')
+            add_clingo_stats(stats, "meronym_lca", clingo_stats)
+        s.rows = len(meronym_lca)
+    return meronym_lca, s.elapsed
+
+
+# The hypernym and meronym branches are independent: the hypernym one runs on a thread pool while the meronym one
+# runs on the thread of the request (overlapping the Neo4j I/O). The pool is shared by the concurrent requests,
+# each holding one of its threads: LCA_THREADS defaults to the threads of a gunicorn worker (0 = no overlap).
+# The solve steps can be moved to a process pool (LCA_SOLVE_PROCESSES > 0) since they are CPU-bound.
+# The pools are created lazily, so that they are never inherited by forked workers.
+
+LCA_THREADS = int(os.environ.get('LCA_THREADS', os.environ.get('GUNICORN_THREADS', 4)))
+LCA_SOLVE_PROCESSES = int(os.environ.get('LCA_SOLVE_PROCESSES', 0))
+
+_branch_pool: ThreadPoolExecutor | None = None
+_solve_pool: ProcessPoolExecutor | None = None
+_pools_lock = threading.Lock()
+
+
+def branch_pool() -> ThreadPoolExecutor | None:
+    global _branch_pool
+    if LCA_THREADS <= 0:
+        return None
+    with _pools_lock:
+        if _branch_pool is None:
+            _branch_pool = ThreadPoolExecutor(max_workers=LCA_THREADS, thread_name_prefix="lca")
+    return _branch_pool
+
+
+def solve_pool() -> ProcessPoolExecutor | None:
+    global _solve_pool
+    if LCA_SOLVE_PROCESSES <= 0:
+        return None
+    with _pools_lock:
+        if _solve_pool is None:
+            _solve_pool = ProcessPoolExecutor(max_workers=LCA_SOLVE_PROCESSES)
+    return _solve_pool
+
+
+def solve_step(solver, unit: list[str], raw_atoms: list[Atom], upper: bool, engine: str, budget: float | None) \
+        -> tuple[list[Atom], float, dict[str, float], list]:
+    # runs in a worker process: its spans are sent back with the result, the deadline is passed as a budget
+    stats: dict[str, float] = {}
+    with collect() as spans, deadline(budget):
+        result, elapsed = solver(unit, raw_atoms, upper, engine, stats)
+    return result, elapsed, stats, spans
+
+
+def run_solve_step(solver, unit: list[str], raw_atoms: list[Atom], upper: bool, engine: str,
+                   computation_times: dict[str, float]) -> tuple[list[Atom], float]:
+    pool = solve_pool()
+    if pool is None:
+        return solver(unit, raw_atoms, upper, engine, computation_times)
+    result, elapsed, stats, spans = pool.submit(solve_step, solver, unit, raw_atoms, upper, engine,
+                                                remaining()).result()
+    replay(spans)
+    computation_times.update(stats)
+    return result, elapsed
+
+
+def hypernym_branch(unit: list[str], upper: bool, engine: str,
+                    direct_instances: list[Atom] | None = None) -> tuple[list[Atom], dict[str, float]]:
+    computation_times: dict[str, float] = {}
+
+    # Step 0: Retrieve direct instances (unless already fetched, e.g. for a batch of units)
+    if direct_instances is None:
+        raw_hypernyms, computation_times["direct_instances"] = compute_direct_instances(unit=unit)
+    else:
+        raw_hypernyms, computation_times["direct_instances"] = list(direct_instances), 0.0
 
-def compute_hypernym_lca(unit: list[str], raw_hypernyms: list[Atom], upper:bool) -> tuple[list[Atom], float]:
-    _start = time.perf_counter()
-    hypernym_lca: list[Atom] = execute_clingo_lca(inject_facts(unit, raw_hypernyms)
-                                                  + LCA_PROGRAM.format(r="is_a") + HYPERNYM_TRANSITIVE_CLOSURE,
-                                                  unit, 'is_a' if not upper else 'IS_A')
-    return hypernym_lca, round(time.perf_counter() - _start, 5)
+    # Step 1: Retrieve "subclass_of" subgraph
+    hypernym_subgraph_result, computation_times["subgraph_hypernyms"] = compute_raw_subgraph_hypernyms_no_dummy_sg(
+        unit=unit,
+        instances=raw_hypernyms)
+    raw_hypernyms.extend(hypernym_subgraph_result)
 
+    # Step 2: Hypernym LCA with "Clingo" (or the native engine)
+    hypernym_lca, computation_times["hypernym_lca"] = run_solve_step(compute_hypernym_lca, unit, raw_hypernyms,
+                                                                     upper, engine, computation_times)
+    return hypernym_lca, computation_times
 
-def compute_raw_subgraph_meronyms_no_dummy_sg(unit: list[str], direct_part_of: list[Atom]) -> tuple[list[Atom], float]:
-    dataset_manager = DatasetManager()
-    _start = time.perf_counter()
-    raw_meronyms = []
-    if len(direct_part_of) > 0:
-        raw_meronyms = parse_neo4j_result(dataset_manager.get_raw_part_of(_entities=unit,
-                                                                          _direct_instances=direct_part_of))
 
-    return raw_meronyms, round(time.perf_counter() - _start, 5)
+def meronym_branch(unit: list[str], upper: bool, engine: str,
+                   direct_part_of: list[Atom] | None = None) -> tuple[list[Atom], dict[str, float]]:
+    computation_times: dict[str, float] = {}
 
+    # Step 0: Retrieve direct part_of (unless already fetched)
+    if direct_part_of is None:
+        direct_part_of, computation_times["direct_part_of"] = compute_direct_part_of(unit=unit)
+    else:
+        computation_times["direct_part_of"] = 0.0
 
+    # Step 1: Retrieve "part_of" subgraph
+    raw_meronyms, computation_times["subgraph_meronyms"] = compute_raw_subgraph_meronyms_no_dummy_sg(
+        unit=unit,
+        direct_part_of=direct_part_of)
 
-def compute_meronym_lca(unit: list[str], raw_meronyms: list[Atom], upper:bool) -> tuple[list[Atom], float]:
-    _start = time.perf_counter()
-    meronym_lca: list[Atom] = execute_clingo_lca(inject_facts(unit, raw_meronyms)
-                                                 + LCA_PROGRAM.format(r="part_of") + MERONYM_TRANSITIVE_CLOSURE,
-                                                 unit, 'part_of' if not upper else 'PART_OF')
-    return meronym_lca, round(time.perf_counter() - _start, 5)
+    # Step 2: Meronym LCA with "Clingo" (or the native engine)
+    meronym_lca, computation_times["meronym_lca"] = run_solve_step(compute_meronym_lca, unit, raw_meronyms,
+                                                                   upper, engine, computation_times)
+    return meronym_lca, computation_times
 
 
-def lca(_input: NeXSimResponse, _upper:bool=False):
-    _start = time.perf_counter()
+def lca(_input: NeXSimResponse, _upper:bool=False, _engine: str | None = None,
+        _direct_instances: list[Atom] | None = None, _direct_part_of: list[Atom] | None = None):
+    if _engine is None:
+        _engine = default_lca_engine()
+    elif _engine not in LCA_ENGINES:
+        raise Exception(f"LCA engine {_engine} is not supported. Valid engines are {LCA_ENGINES}")
     computation_times = {
         "direct_instances": 0.0,
         "direct_part_of": 0.0,
@@ -134,43 +440,98 @@ def lca(_input: NeXSimResponse, _upper:bool=False):
         "meronym_lca": 0.0
     }
 
-    # Step 0: Retrieve direct instances
-    raw_hypernyms, computation_times["direct_instances"] = compute_direct_instances(unit=_input.unit)
-    direct_part_of, computation_times["direct_part_of"] = compute_direct_part_of(unit=_input.unit)
+    with span("lca", "stage", computation_times) as s:
+        pool = branch_pool()
+        if pool is None:
+            hypernym_lca, hypernym_times = hypernym_branch(_input.unit, _upper, _engine, _direct_instances)
+            meronym_lca, meronym_times = meronym_branch(_input.unit, _upper, _engine, _direct_part_of)
+        else:
+            hypernym_future = submit_in_context(pool, hypernym_branch, _input.unit, _upper, _engine,
+                                                _direct_instances)
+            meronym_lca, meronym_times = meronym_branch(_input.unit, _upper, _engine, _direct_part_of)
+            hypernym_lca, hypernym_times = hypernym_future.result()
+        s.rows = len(hypernym_lca) + len(meronym_lca)
+
+    merge_branches(_input, computation_times, hypernym_lca, hypernym_times, meronym_lca, meronym_times)
+
+
+def merge_branches(_input: NeXSimResponse, computation_times: dict[str, float],
+                   hypernym_lca: list[Atom], hypernym_times: dict[str, float],
+                   meronym_lca: list[Atom], meronym_times: dict[str, float]):
+    computation_times.update(hypernym_times)
+    computation_times.update(meronym_times)
+
+    # wall-clock time of the whole lca vs. the sum of its steps (the difference is the overlap gain)
+    computation_times["lca_summed_steps"] = round(sum(computation_times[k] for k in ["direct_instances",
+                                                                                     "direct_part_of",
+                                                                                     "subgraph_hypernyms",
+                                                                                     "subgraph_meronyms",
+                                                                                     "hypernym_lca",
+                                                                                     "meronym_lca"]), 5)
 
-    # Step 1: Retrieve "subclass_of" subgraph
-    hypernym_subgraph_result, computation_times["subgraph_hypernyms"] = compute_raw_subgraph_hypernyms_no_dummy_sg(
-        unit=_input.unit,
-        instances=raw_hypernyms)
-    raw_hypernyms.extend(hypernym_subgraph_result)
+    # Total lca is the union of hypernyms and meronyms lca
+    _input.lca = hypernym_lca
+    _input.lca.extend(meronym_lca)
 
-    # Step 2: Hypernym LCA with "Clingo"
+    ct = stage_times(_input)
+    for k in computation_times.keys():
+        ct[k] = computation_times[k]
 
 
-    hypernym_lca, computation_times["hypernym_lca"] = compute_hypernym_lca(unit=_input.unit,
-                                                                           raw_hypernyms=raw_hypernyms,
-                                                                           upper=_upper)
+# Async counterparts of the branches: the Neo4j I/O is awaited on the event loop,
+# the solve step runs in the default executor (or in the solve process pool)
 
-    # Step 3: Retrieve "part_of" subgraph
+async def hypernym_branch_async(unit: list[str], upper: bool, engine: str) -> tuple[list[Atom], dict[str, float]]:
+    dataset_manager = AsyncDatasetManager()
+    computation_times: dict[str, float] = {}
 
-    raw_meronyms, computation_times["subgraph_meronyms"] = compute_raw_subgraph_meronyms_no_dummy_sg(unit=_input.unit,
-                                                                                         direct_part_of=direct_part_of)
+    with span("direct_instances", "lca", computation_times) as s:
+        raw_hypernyms = parse_neo4j_result(await dataset_manager.get_direct_instances(_entities=unit))
+        s.rows = len(raw_hypernyms)
 
-    # Step 4: Meronym LCA with "Clingo"
+    with span("subgraph_hypernyms", "lca", computation_times) as s:
+        raw_hypernyms.extend(parse_neo4j_result(await dataset_manager.get_raw_subclass(
+            _entities=unit, _direct_instances=raw_hypernyms)))
+        s.rows = len(raw_hypernyms)
 
-    meronym_lca, computation_times["meronym_lca"] = compute_meronym_lca(unit=_input.unit,
-                                                                        raw_meronyms=raw_meronyms,
-                                                                        upper=_upper)
+    hypernym_lca, computation_times["hypernym_lca"] = await asyncio.get_running_loop().run_in_executor(
+        None, contextvars.copy_context().run, run_solve_step, compute_hypernym_lca, unit, raw_hypernyms, upper,
+        engine, computation_times)
+    return hypernym_lca, computation_times
 
-    computation_times["lca"] = round(time.perf_counter() - _start, 5)
 
-    # Total lca is the union of hypernyms and meronyms lca
-    _input.lca = hypernym_lca
-    _input.lca.extend(meronym_lca)
+async def meronym_branch_async(unit: list[str], upper: bool, engine: str) -> tuple[list[Atom], dict[str, float]]:
+    dataset_manager = AsyncDatasetManager()
+    computation_times: dict[str, float] = {}
 
-    if _input.computation_times is None:
-        _input.computation_times = {}
+    with span("direct_part_of", "lca", computation_times) as s:
+        direct_part_of = parse_neo4j_result(await dataset_manager.get_direct_part_of(_entities=unit))
+        s.rows = len(direct_part_of)
 
-    ct = _input.computation_times
-    for k in computation_times.keys():
-        ct[k] = computation_times[k]
+    with span("subgraph_meronyms", "lca", computation_times) as s:
+        raw_meronyms = []
+        if len(direct_part_of) > 0:
+            raw_meronyms = parse_neo4j_result(await dataset_manager.get_raw_part_of(
+                _entities=unit, _direct_instances=direct_part_of))
+        s.rows = len(raw_meronyms)
+
+    meronym_lca, computation_times["meronym_lca"] = await asyncio.get_running_loop().run_in_executor(
+        None, contextvars.copy_context().run, run_solve_step, compute_meronym_lca, unit, raw_meronyms, upper,
+        engine, computation_times)
+    return meronym_lca, computation_times
+
+
+async def lca_async(_input: NeXSimResponse, _upper: bool = False, _engine: str | None = None):
+    if _engine is None:
+        _engine = default_lca_engine()
+    elif _engine not in LCA_ENGINES:
+        raise Exception(f"LCA engine {_engine} is not supported. Valid engines are {LCA_ENGINES}")
+    computation_times: dict[str, float] = {}
+
+    with span("lca", "stage", computation_times) as s:
+        (hypernym_lca, hypernym_times), (meronym_lca, meronym_times) = await asyncio.gather(
+            hypernym_branch_async(_input.unit, _upper, _engine),
+            meronym_branch_async(_input.unit, _upper, _engine))
+        s.rows = len(hypernym_lca) + len(meronym_lca)
+
+    merge_branches(_input, computation_times, hypernym_lca, hypernym_times, meronym_lca, meronym_times)
@@ -0,0 +1,128 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+from neXSim import DatasetManager
+from neXSim.atoms import CompactAtom, TermTable
+from neXSim.characterization import compact_pairwise_characterization
+from neXSim.lca import (parse_neo4j_result, to_adjacency, hypernym_successors, meronym_successors,
+                        execute_native_lca)
+from neXSim.models import Atom, MatrixResponse, PairResult, Variable
+from neXSim.summary import SummaryBuilder
+from neXSim.tracing import span
+
+# Pairwise similarity of N entities: the summaries and the taxonomic subgraphs of all the entities are fetched once,
+# then every pair is characterized on the compact summaries and gets its LCAs from the shared closures
+# (the native engine, whose subclass_of/part_of closures are memoized across the pairs).
+#
+# score = 2 * |characterization| / (|summary_left| + |summary_right|): the share of the two summaries
+# explained by their characterization (1 for two entities with the same summary).
+
+MATRIX_MAX_ENTITIES = int(os.environ.get('MATRIX_MAX_ENTITIES', 100))
+MATRIX_PROCESSES = min(int(os.environ.get('MATRIX_PROCESSES', 0)), os.cpu_count() or 1)
+
+# created lazily, so that it is never inherited by forked workers
+_matrix_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def matrix_pool() -> ProcessPoolExecutor | None:
+    global _matrix_pool
+    if MATRIX_PROCESSES <= 0:
+        return None
+    with _pool_lock:
+        if _matrix_pool is None:
+            _matrix_pool = ProcessPoolExecutor(max_workers=MATRIX_PROCESSES)
+    return _matrix_pool
+
+
+def characterize_pairs(summaries: dict[int, list[CompactAtom]],
+                       pairs: list[tuple[int, int]]) -> list[list[CompactAtom]]:
+    return [compact_pairwise_characterization(summaries[i], summaries[j]) for i, j in pairs]
+
+
+def pairwise_characterizations(summaries: list[list[CompactAtom]],
+                               pairs: list[tuple[int, int]]) -> list[list[CompactAtom]]:
+    pool = matrix_pool()
+    if pool is None or len(pairs) < 2:
+        return characterize_pairs(dict(enumerate(summaries)), pairs)
+    # one chunk per worker, each one with the summaries of its pairs only
+    processes = min(MATRIX_PROCESSES, len(pairs))
+    chunks = [pairs[k::processes] for k in range(processes)]
+    futures = [pool.submit(characterize_pairs, {i: summaries[i] for pair in chunk for i in pair}, chunk)
+               for chunk in chunks]
+    out: list[list[CompactAtom]] = [[] for _ in pairs]
+    for k, future in enumerate(futures):
+        for position, result in zip(range(k, len(pairs), processes), future.result()):
+            out[position] = result
+    return out
+
+
+def pair_adjacency(adjacency: dict[str, dict[str, set[str]]], pair: list[str]) -> dict[str, dict[str, set[str]]]:
+    # the direct is_a/instance_of edges of the other entities are not part of the graph of the pair
+    restricted = dict(adjacency)
+    for relation in ["is_a", "instance_of"]:
+        edges = adjacency.get(relation, {})
+        restricted[relation] = {e: edges[e] for e in pair if e in edges}
+    return restricted
+
+
+def similarity_matrix(entities: list[str], upper: bool = False) -> MatrixResponse:
+    entities = list(dict.fromkeys(entities))
+    if len(entities) > MATRIX_MAX_ENTITIES:
+        raise ValueError(f"At most {MATRIX_MAX_ENTITIES} entities are supported")
+    ct: dict[str, float] = {}
+    with span("matrix", "request", ct) as s:
+        results = matrix_pairs(entities, upper, ct)
+        s.rows = len(results)
+
+    return MatrixResponse(entities=entities, pairs=results, computation_times=ct)
+
+
+def matrix_pairs(entities: list[str], upper: bool, ct: dict[str, float]) -> list[PairResult]:
+    d: DatasetManager = DatasetManager()
+
+    with span("summary", "matrix", ct):
+        builder = SummaryBuilder(entities, d.upper)
+        if len(builder.missing) > 0:
+            builder.add_rows(d.get_full_summary(builder.missing))
+        summaries = [builder.take(e) for e in entities]
+
+    with span("subgraphs", "matrix", ct) as s:
+        direct_instances = parse_neo4j_result(d.get_direct_instances(_entities=entities))
+        raw_hypernyms = direct_instances + parse_neo4j_result(d.get_raw_subclass(_entities=entities,
+                                                                                  _direct_instances=direct_instances))
+        direct_part_of = parse_neo4j_result(d.get_direct_part_of(_entities=entities))
+        raw_meronyms: list[Atom] = []
+        if len(direct_part_of) > 0:
+            raw_meronyms = parse_neo4j_result(d.get_raw_part_of(_entities=entities,
+                                                                _direct_instances=direct_part_of))
+        s.rows = len(raw_hypernyms) + len(raw_meronyms)
+
+    with span("characterization", "matrix", ct):
+        terms = TermTable(Variable(is_free=True, origin=entities))
+        encoded = [terms.encode_summary(s) for s in summaries]
+        pairs = list(combinations(range(len(entities)), 2))
+        characterizations = pairwise_characterizations(encoded, pairs)
+
+    with span("lca", "matrix", ct):
+        hypernym_adjacency = to_adjacency(raw_hypernyms)
+        meronym_adjacency = to_adjacency(raw_meronyms)
+        hypernym_memo: dict[str, set[str]] = {}
+        meronym_memo: dict[str, set[str]] = {}
+        results: list[PairResult] = []
+        for (i, j), characterization in zip(pairs, characterizations):
+            pair = [entities[i], entities[j]]
+            lca = execute_native_lca(pair, hypernym_successors(pair_adjacency(hypernym_adjacency, pair),
+                                                               hypernym_memo),
+                                     'IS_A' if upper else 'is_a')
+            lca.extend(execute_native_lca(pair, meronym_successors(meronym_adjacency, meronym_memo),
+                                          'PART_OF' if upper else 'part_of'))
+            sizes = len(encoded[i]) + len(encoded[j])
+            results.append(PairResult(left=i, right=j,
+                                      score=round(2 * len(characterization) / sizes, 5) if sizes > 0 else 0.0,
+                                      characterization=terms.decode_atoms(characterization,
+                                                                          Variable(is_free=True, origin=pair)),
+                                      lca=lca))
+    return results
@@ -0,0 +1,178 @@
+import json
+from typing import Iterable, Iterator
+
+from neXSim.graph_backend import GraphBackend, DatasetUnavailable
+from neXSim.models import Atom, EntityType
+from neXSim.neo4j_manager import predicate_names, subclass_roots
+
+# In-memory graph backend (GRAPH_BACKEND=memory), for small datasets, tests and benchmarks: it answers the same
+# queries as Neo4j from adjacency lists, loaded from the GRAPH_DUMP file. The dump is either
+#  - a JSON document {"synsets": [{"id", "mainSense", "description", "synonyms", "type", "imageUrl",
+#    "undirected_edges"}, ...], "edges": [[source, relation, target], ...]}, or
+#  - an edge list (any other extension): one "source<TAB>relation<TAB>target" line per edge.
+# Relations are stored as they are in the dump (lower or upper case, as in the dataset: see PREDICATES_UPPER).
+# The lemma search matches the main sense words by prefix and the synonym words exactly (as the fulltext index),
+# all the tokens of the lemma being required; the rank is undirected_edges.
+
+
+def words(text: str) -> list[str]:
+    return text.replace("_", " ").lower().split()
+
+
+class MemoryGraph(GraphBackend):
+
+    def __init__(self, synsets: Iterable[dict], edges: Iterable[tuple[str, str, str]], upper: bool = False) -> None:
+        self.upper = upper
+        self.names = predicate_names(upper)
+        self.synsets: dict[str, dict] = {}
+        for synset in synsets:
+            self.synsets[synset["id"]] = synset
+
+        # source -> relation -> targets (insertion ordered, without duplicates)
+        self.out: dict[str, dict[str, dict[str, None]]] = {}
+        degree: dict[str, int] = {}
+        for source, relation, target in edges:
+            targets = self.out.setdefault(source, {}).setdefault(relation, {})
+            if target not in targets:
+                targets[target] = None
+                degree[source] = degree.get(source, 0) + 1
+                degree[target] = degree.get(target, 0) + 1
+        for _id in degree:
+            if _id not in self.synsets:
+                self.synsets[_id] = {"id": _id}
+        for _id, synset in self.synsets.items():
+            if synset.get("undirected_edges") is None:
+                synset["undirected_edges"] = degree.get(_id, 0)
+
+    @classmethod
+    def load(cls, path: str | None, upper: bool = False) -> "MemoryGraph":
+        if not path:
+            raise DatasetUnavailable("GRAPH_DUMP is not set")
+        if path.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                dump = json.load(f)
+            return cls(dump.get("synsets", []), (tuple(edge) for edge in dump.get("edges", [])), upper)
+
+        def edge_list() -> Iterator[tuple[str, str, str]]:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip() != "":
+                        source, relation, target = line.rstrip("\n").split("\t")
+                        yield source, relation, target
+
+        return cls([], edge_list(), upper)
+
+    def successors(self, node: str, relation: str) -> Iterable[str]:
+        return self.out.get(node, {}).get(relation, {}).keys()
+
+    def reachable(self, roots: Iterable[str], relation: str) -> list[str]:
+        # the nodes reachable from the roots with one or more steps, in BFS order
+        reached: dict[str, None] = {}
+        frontier = list(dict.fromkeys(roots))
+        while frontier:
+            following = []
+            for node in frontier:
+                for target in self.successors(node, relation):
+                    if target not in reached:
+                        reached[target] = None
+                        following.append(target)
+            frontier = following
+        return list(reached.keys())
+
+    def entity_row(self, _id: str) -> dict:
+        synset = self.synsets[_id]
+        return {"id": _id,
+                "mainSense": synset.get("mainSense") or "",
+                "description": synset.get("description") or "",
+                "synonyms": synset.get("synonyms") or [],
+                "image_url": synset.get("imageUrl") or "",
+                "type": synset.get("type") or EntityType.NAMED_ENTITY}
+
+    def get_entities(self, _ids: list[str]) -> list[dict]:
+        return [self.entity_row(_id) for _id in dict.fromkeys(_ids) if _id in self.synsets]
+
+    def matches(self, synset: dict, tokens: list[str]) -> bool:
+        main_sense = words(synset.get("mainSense") or "")
+        if all(any(word.startswith(token) for word in main_sense) for token in tokens):
+            return True
+        synonyms = {word for synonym in synset.get("synonyms") or [] for word in words(synonym)}
+        return all(token in synonyms for token in tokens)
+
+    def get_entities_by_lemma(self, lemma: str, page: int, skip: int, limit: int = 10,
+                              after: tuple[float, str] | None = None) -> list[dict]:
+        tokens = words(lemma)
+        if len(tokens) == 0:
+            return []
+        hits = sorted(((float(s["undirected_edges"]), _id) for _id, s in self.synsets.items()
+                       if self.matches(s, tokens)), key=lambda hit: (-hit[0], hit[1]))
+        if after is not None:
+            hits = [(rank, _id) for rank, _id in hits if rank < after[0] or (rank == after[0] and _id > after[1])]
+        start = max(page, 0) * limit
+        rows = []
+        for rank, _id in hits[start:start + limit]:
+            row = self.entity_row(_id)
+            row["rank"] = rank
+            rows.append(row)
+        return rows
+
+    def direct_rows(self, _entities: list[str], relations: list[str], _type: str) -> list[dict]:
+        return [{"source": e, "relation": r, "target": t, "type": _type}
+                for e in dict.fromkeys(_entities) for r in relations for t in self.successors(e, r)]
+
+    def get_direct_instances(self, _entities: list[str]) -> list[dict]:
+        n = self.names
+        return self.direct_rows(_entities, [n["instance_of"], n["is_a"], n["subclass_of"]], "HYPERNYM")
+
+    def get_direct_part_of(self, _entities: list[str]) -> list[dict]:
+        return self.direct_rows(_entities, [self.names["part_of"]], "MERONYM")
+
+    def summary_rows(self, entity: str) -> list[dict]:
+        # the rows of SUMMARY_QUERY: is_a and part_of closures, then the other relations
+        n = self.names
+        hypernyms = dict.fromkeys(self.successors(entity, n["is_a"]))
+        hypernyms.update(dict.fromkeys(self.successors(entity, n["instance_of"])))
+        hypernyms.update(dict.fromkeys(self.reachable([entity], n["subclass_of"])))
+        hypernyms.update(dict.fromkeys(self.reachable(self.successors(entity, n["instance_of"]), n["subclass_of"])))
+        rows = [{"for": entity, "source": entity, "relation": n["is_a"], "target": t} for t in hypernyms]
+        rows.extend({"for": entity, "source": entity, "relation": n["part_of"], "target": t}
+                    for t in self.reachable([entity], n["part_of"]))
+        taxonomic = set(n.values())
+        for relation, targets in self.out.get(entity, {}).items():
+            if relation not in taxonomic:
+                rows.extend({"for": entity, "source": entity, "relation": relation, "target": t} for t in targets)
+        return rows
+
+    def get_full_summary(self, _entities: list[str]) -> list[dict]:
+        return [row for entity in dict.fromkeys(_entities) if entity in self.synsets
+                for row in self.summary_rows(entity)]
+
+    def subgraph(self, roots: list[str], relation: str) -> list[dict]:
+        # the edges of the relation reachable from the roots (apoc.path.subgraphAll)
+        nodes = dict.fromkeys(roots)
+        nodes.update(dict.fromkeys(self.reachable(roots, relation)))
+        return [{"source": node, "relation": relation, "target": t}
+                for node in nodes for t in self.successors(node, relation)]
+
+    def get_raw_subclass(self, _entities: list[str], _direct_instances: list[Atom]) -> list[dict]:
+        return self.subgraph(subclass_roots(_entities, _direct_instances, self.upper), self.names["subclass_of"])
+
+    def get_raw_part_of(self, _entities: list[str], _direct_instances: list[Atom]) -> list[dict]:
+        if len(_direct_instances) == 0:
+            return []
+        return self.subgraph(_entities, self.names["part_of"])
+
+    def get_others(self, _entities: list[str]) -> list[dict]:
+        taxonomic = set(self.names.values())
+        return [{"source": e, "relation": r, "target": t}
+                for e in dict.fromkeys(_entities) for r, targets in self.out.get(e, {}).items()
+                if r not in taxonomic for t in targets]
+
+    def get_edges(self, _relation: str) -> Iterator[tuple[str, str]]:
+        relation = _relation.upper() if self.upper else _relation
+        for source, relations in self.out.items():
+            for target in relations.get(relation, {}):
+                yield source, target
+
+    def get_lexicon(self) -> Iterator[tuple[str, int, str, list[str]]]:
+        for _id, synset in self.synsets.items():
+            yield _id, synset["undirected_edges"], synset.get("mainSense") or "", synset.get("synonyms") or []
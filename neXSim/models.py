@@ -1,7 +1,7 @@
 from enum import Enum
 from typing import List, Union, Optional, Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, conlist
 from typing_extensions import Annotated
 from neXSim.utils import is_valid_babelnet_id
 
@@ -43,6 +43,12 @@ class EntityList(BaseModel):
     entities: List[Entity]
 
 
+class SearchPage(BaseModel):
+    entities: List[Entity]
+    # opaque cursor of the next page (None on the last one)
+    next: Optional[str] = None
+
+
 class Variable(BaseModel):
     origin: List[BabelNetID] = Field(default_factory=list)
     is_free: bool = False
@@ -118,6 +124,19 @@ class Atom(BaseModel):
         return hash((self.source_id, self.target_id, self.predicate))
 
 
+# Builders for the models coming from our own databases: the rows are trusted, so the models are
+# built without validation (model_construct). Every field must be given.
+
+def trusted_atom(source_id: Union[str, Variable], target_id: Union[str, Variable], predicate: str) -> Atom:
+    return Atom.model_construct(source_id=source_id, target_id=target_id, predicate=predicate)
+
+
+def trusted_entity(_id: str, main_sense: str, description: str, synonyms: list[str],
+                   entity_type: str, image_url: str) -> Entity:
+    return Entity.model_construct(id=_id, main_sense=main_sense, description=description, synonyms=synonyms,
+                                  entity_type=EntityType(entity_type), image_url=image_url)
+
+
 class SearchByIdResponse(BaseModel):
     entities: list[Entity]
 
@@ -133,6 +152,12 @@ class Summary(BaseModel):
         return len(self.summary) < len(other.summary)
 
 
+class StageTiming(BaseModel):
+    stage: str
+    start: float
+    end: float
+
+
 class NeXSimResponse(BaseModel):
     unit: list[BabelNetID]
     summaries: Optional[list[Summary]] = None
@@ -142,3 +167,36 @@ class NeXSimResponse(BaseModel):
     tops: Optional[list[Union[BabelNetID, Variable]]] = None
     kernel_explanation: Optional[list[Atom]] = None
     computation_times: Optional[dict[str, float]] = None
+    timeline: Optional[list[StageTiming]] = None
+    # the stages that ran out of time (see deadline.py): their fields are missing or partial
+    incomplete: Optional[list[str]] = None
+
+
+class BatchRequest(BaseModel):
+    # every unit needs at least one entity to be characterized
+    units: list[conlist(BabelNetID, min_length=1)]
+
+
+class BatchResponse(BaseModel):
+    # keyed by the index of the unit in the request
+    results: dict[int, NeXSimResponse]
+    computation_times: Optional[dict[str, float]] = None
+
+
+class MatrixRequest(BaseModel):
+    entities: list[BabelNetID]
+
+
+class PairResult(BaseModel):
+    # left and right are indexes in MatrixResponse.entities
+    left: int
+    right: int
+    score: float
+    characterization: list[Atom]
+    lca: list[Atom]
+
+
+class MatrixResponse(BaseModel):
+    entities: list[BabelNetID]
+    pairs: list[PairResult]
+    computation_times: Optional[dict[str, float]] = None
@@ -1,19 +1,33 @@
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, READ_ACCESS, unit_of_work
 import os
+import re
+import threading
 
-from neo4j.exceptions import Neo4jError, ServiceUnavailable, AuthError
+from neo4j.exceptions import Neo4jError, ServiceUnavailable, AuthError, ConfigurationError
 
+from neXSim.deadline import DeadlineExceeded, check, timeout
+from neXSim.graph_backend import GraphBackend, DatasetUnavailable
 from neXSim.models import Atom, EntityType
+from neXSim.taxonomy import TaxonomySnapshot, load_snapshot
+from neXSim.tracing import span
 
 DATABASE_ADDRESS = ""
 DATABASE_NAME = ""
 DATABASE_PASSWORD = ""
 
-from neXSim.utils import SingletonMeta
+from neXSim.utils import SingletonMeta, chunked
 
 
-def search_by_id(tx, _identifiers: list[str]):
-    query = """
+def entity_row(record) -> dict:
+    return {"id": record["id"],
+            "mainSense": record["mainSense"] if record["mainSense"] else "",
+            "description": record["description"],
+            "synonyms": record["synonyms"],
+            "image_url": record["image_url"],
+            "type": record["type"] if record['type'] else EntityType.NAMED_ENTITY}
+
+
+SEARCH_BY_ID_QUERY = """
     MATCH (x:Synset)
     WHERE x.id IN $ids
     RETURN x.id as id,
@@ -23,88 +37,77 @@ def search_by_id(tx, _identifiers: list[str]):
     x.imageUrl as image_url,
     x.type as type
     """
-    result = tx.run(query, ids=_identifiers)
-    return [{"id": record["id"],
-             "mainSense": record["mainSense"] if record["mainSense"] else "",
-             "description": record["description"],
-             "synonyms": record["synonyms"],
-             "image_url" : record["image_url"],
-             "type": record["type"] if record['type'] else EntityType.NAMED_ENTITY}
-            for record in result]
-
-
-def search_by_lemma(tx, _lemma: str, _page: int = 0, _skip: int = 0):
-    # lemma = remove_lucene_special_characters(_lemma)
-
-    tokens = _lemma.split(" ")
 
-    if len(tokens) == 0:
-        return []
 
-    params = {}
-    count_lemma = 0
-    main_sense_str = ""
-    synonyms_str = ""
-    params_str = ""
+def search_by_id(tx, _identifiers: list[str]):
+    result = tx.run(SEARCH_BY_ID_QUERY, ids=_identifiers)
+    return [entity_row(record) for record in result]
 
-    for token in tokens:
-        if token == "":
-            continue
 
-        params[f"l{count_lemma}"] = token
-        params_str += f"$l{count_lemma},"
-        count_lemma += 1
+LUCENE_SPECIAL_CHARACTERS = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
 
-        main_sense_str += "main_sense:%s* AND "
-        synonyms_str += "synonyms:%s AND "
 
-    main_sense_str = f"({main_sense_str[:-5]})"
-    synonyms_str = f"({synonyms_str[:-5]})"
-    params_str = f"[{(params_str + params_str)[:-1]}]"
+def lucene_query(_lemma: str) -> str | None:
+    # each token is escaped: the lemma is user input, and the query string is sent as a parameter
+    tokens = [LUCENE_SPECIAL_CHARACTERS.sub(r"\\\1", token) for token in _lemma.split(" ") if token != ""]
+    if len(tokens) == 0:
+        return None
+    main_sense_str = " AND ".join(f"main_sense:{token}*" for token in tokens)
+    synonyms_str = " AND ".join(f"synonyms:{token}" for token in tokens)
+    return f"({main_sense_str}) OR ({synonyms_str})"
+
+
+# hits are ranked by score * undirected_edges, ties broken by id, so that (rank, id) is a keyset cursor:
+# with $after_rank/$after_id, only the hits ranked after that pair are returned
+LEMMA_QUERY = """CALL db.index.fulltext.queryNodes("mainSensesAndSynonyms", $lucene)
+                YIELD node, score
+                WITH node, coalesce(score * node.undirected_edges, 0.0) AS rank
+                WHERE $after_rank IS NULL OR rank < $after_rank OR (rank = $after_rank AND node.id > $after_id)
+                RETURN node.id as id,
+                node.mainSense as mainSense,
+                node.description as description,
+                node.synonyms as synonyms,
+                node.type as type,
+                node.imageUrl as image_url,
+                rank
+                ORDER BY rank DESC, id ASC
+                SKIP $skip LIMIT $limit"""
+
+
+def lemma_query(_lemma: str, _page: int = 0, _limit: int = 10,
+                _after: tuple[float, str] | None = None) -> tuple[str | None, dict]:
+    lucene = lucene_query(_lemma)
+    if lucene is None:
+        return None, {}
 
     if _page < 0:
         _page = 0
 
-    skip = _page * 10
-
-
-
-    query = """CALL db.index.fulltext.queryNodes("mainSensesAndSynonyms",
-    apoc.text.format("{main_sense_str} OR {synonyms_str}", {params_str})) 
-                    YIELD node, score WITH node, score 
-                    ORDER BY score * node.undirected_edges DESC
-                    RETURN node.id as id, 
-                    node.mainSense as mainSense,
-                    node.description as description,
-                    node.synonyms as synonyms,
-                    node.type as type,
-                    node.imageUrl as image_url
-                    SKIP {skip} LIMIT 10""".format(main_sense_str=main_sense_str,
-                                                    synonyms_str=synonyms_str,
-                                                    params_str=params_str,
-                                                    lemma=_lemma,
-                                                   skip=skip)
-    result = tx.run(query, parameters=params)
+    return LEMMA_QUERY, {"lucene": lucene,
+                         "skip": _page * _limit,
+                         "limit": _limit,
+                         "after_rank": None if _after is None else _after[0],
+                         "after_id": None if _after is None else _after[1]}
 
-    to_send = []
 
-    for record in result:
-        to_send.append({"id": record["id"],
-             "mainSense": record["mainSense"] if record["mainSense"] else "",
-             "description": record["description"],
-             "synonyms": record["synonyms"],
-             "image_url": record["image_url"],
-             "type": record["type"] if record['type'] else EntityType.NAMED_ENTITY}
-                   )
+def ranked_row(record) -> dict:
+    row = entity_row(record)
+    row["rank"] = record["rank"]
+    return row
 
 
-    return to_send
+def search_by_lemma(tx, _lemma: str, _page: int = 0, _skip: int = 0, _limit: int = 10,
+                    _after: tuple[float, str] | None = None):
+    query, params = lemma_query(_lemma, _page, _limit, _after)
+    if query is None:
+        return []
 
-SUMMARY_QUERY = (
+    result = tx.run(query, parameters=params)
 
-    """
-    UNWIND $ids as _id 
-    MATCH (a:Synset {{id:_id}})
+    return [ranked_row(record) for record in result]
+
+# the summary of the entity a (the rows of SUMMARY_QUERY and SUMMARY_STREAM_QUERY)
+SUMMARY_SUBQUERY = """
     CALL {{
       WITH a
       MATCH (a)-[:{is_a}|{instance_of}]->(b:Synset)
@@ -130,49 +133,111 @@ SUMMARY_QUERY = (
        "{is_a}",
        "{part_of}" ]
       RETURN DISTINCT a.id as for, a.id AS source, type(r) AS relation, b.id AS target   
-    }}
+    }}"""
+
+SUMMARY_QUERY = (
+
+    """
+    UNWIND $ids as _id 
+    MATCH (a:Synset {{id:_id}})""" + SUMMARY_SUBQUERY + """
     RETURN DISTINCT for, source, relation, target;
     """
 )
 
+# the streamed summaries: Cypher does not keep the order of the unwound ids, the rows are sorted by the position
+# of their entity in $ids (see SummaryGroups)
+SUMMARY_STREAM_QUERY = (
+
+    """
+    UNWIND range(0, size($ids) - 1) AS position
+    WITH position, $ids[position] AS _id
+    MATCH (a:Synset {{id:_id}})""" + SUMMARY_SUBQUERY + """
+    RETURN DISTINCT position, for, source, relation, target
+    ORDER BY position;
+    """
+)
+
+
+def predicate_names(_upper: bool) -> dict[str, str]:
+    return {"is_a": 'IS_A' if _upper else 'is_a',
+            "subclass_of": 'SUBCLASS_OF' if _upper else 'subclass_of',
+            "instance_of": 'INSTANCE_OF' if _upper else 'instance_of',
+            "part_of": 'PART_OF' if _upper else 'part_of'}
+
+
+# relationship types cannot be parameters: the query texts are formatted once per predicate mode,
+# so that Neo4j sees the same (plan-cached) query for every unit
+SUMMARY_QUERIES = {_upper: SUMMARY_QUERY.format(**predicate_names(_upper)) for _upper in [False, True]}
+SUMMARY_STREAM_QUERIES = {_upper: SUMMARY_STREAM_QUERY.format(**predicate_names(_upper))
+                          for _upper in [False, True]}
+
+
+def summary_row(record) -> dict:
+    return {"source": record["source"],
+            "relation": record["relation"],
+            "target": record["target"],
+            "for": record["for"]}
+
 
 def compute_oneshot_summary(tx, _entities: list[str], _upper: bool = False):
-    result = tx.run(SUMMARY_QUERY.format(is_a='IS_A' if _upper else 'is_a',
-                                         subclass_of='SUBCLASS_OF' if _upper else 'subclass_of',
-                                         instance_of='INSTANCE_OF' if _upper else 'instance_of',
-                                         part_of='PART_OF' if _upper else 'part_of'), ids=_entities)
-    return [{"source": record["source"],
-             "relation": record["relation"],
-             "target": record["target"],
-             "for": record["for"]}
-            for record in result]
+    result = tx.run(SUMMARY_QUERIES[_upper], ids=_entities)
+    return [summary_row(record) for record in result]
+
+
+class SummaryGroups:
+    # splits the rows of SUMMARY_STREAM_QUERY into the summaries of its entities: the rows are sorted by the
+    # position of their entity, so a summary is complete as soon as the rows of a later entity arrive (the entities
+    # without rows are complete when they are passed). Rows out of this order raise ValueError.
+
+    def __init__(self, _entities: list[str]) -> None:
+        self.pending = iter(dict.fromkeys(_entities))
+        self.current: str | None = None
+        self.group: list[dict] = []
+        self.rows = 0
+
+    def add(self, row: dict) -> list[tuple[str, list[dict]]]:
+        # the summaries completed by this row
+        self.rows += 1
+        completed = []
+        if row["for"] != self.current:
+            if self.current is not None:
+                completed.append((self.current, self.group))
+            for entity in self.pending:
+                if entity == row["for"]:
+                    break
+                completed.append((entity, []))
+            else:
+                raise ValueError(f"The summary rows of {row['for']} are not grouped in the order of the entities")
+            self.current, self.group = row["for"], []
+        self.group.append(row)
+        return completed
+
+    def finish(self) -> list[tuple[str, list[dict]]]:
+        completed = [(self.current, self.group)] if self.current is not None else []
+        completed.extend((entity, []) for entity in self.pending)
+        return completed
 
 
 SUBGRAPH_QUERY = """
-WITH [{ids}] AS ids
-UNWIND ids AS id
-MATCH (s:Synset {{id:id}})
-CALL apoc.path.subgraphAll(s, {{
-  relationshipFilter: '{relation}>',
+UNWIND $ids AS id
+MATCH (s:Synset {id:id})
+CALL apoc.path.subgraphAll(s, {
+  relationshipFilter: $filter,
   uniqueness: 'RELATIONSHIP_GLOBAL',
   bfs: true
-}}) YIELD relationships
+}) YIELD relationships
 UNWIND relationships AS r
 WITH DISTINCT r
-where type(r) = '{relation}'
+where type(r) = $relation
 RETURN DISTINCT startNode(r).id AS source, type(r) AS relation, endNode(r).id AS target;
 
 """
 
 
 def compute_subgraph(tx, _to_attach: list[str], _relation: str, _upper: bool = False):
-    ids = "'"
-    ids += "','".join(_to_attach)
-    ids += "'"
     if (((_upper and _relation == 'SUBCLASS_OF') or (_upper and _relation == 'PART_OF')) or
             ((not _upper and _relation == 'subclass_of') or (not _upper and _relation == 'part_of'))):
-        inst_query = SUBGRAPH_QUERY.format(ids=ids, relation=_relation)
-        result = tx.run(inst_query)
+        result = tx.run(SUBGRAPH_QUERY, ids=_to_attach, filter=f"{_relation}>", relation=_relation)
         return [{"source": record["source"],
                  "relation": record["relation"],
                  "target": record["target"]}
@@ -189,17 +254,16 @@ OTHERS_QUERY = (
        "{instance_of}",
        "{subclass_of}",
        "{is_a}",
-       "{part_of}" ]]
+       "{part_of}" ]
     RETURN DISTINCT a.id AS source, type(r) AS relation, b.id AS target
     """
 )
 
+OTHERS_QUERIES = {_upper: OTHERS_QUERY.format(**predicate_names(_upper)) for _upper in [False, True]}
+
 
-def compute_others(tx, _entities: str, _upper: bool = False):
-    result = tx.run(OTHERS_QUERY.format(is_a='IS_A' if _upper else 'is_a',
-                                        subclass_of='SUBCLASS_OF' if _upper else 'subclass_of',
-                                        instance_of='INSTANCE_OF' if _upper else 'instance_of',
-                                        part_of='PART_OF' if _upper else 'part_of'), ids=_entities)
+def compute_others(tx, _entities: list[str], _upper: bool = False):
+    result = tx.run(OTHERS_QUERIES[_upper], ids=_entities)
     return [{"source": record["source"],
              "relation": record["relation"],
              "target": record["target"]}
@@ -220,12 +284,22 @@ DIRECT_INSTANCES_QUERY = (
 )
 
 
-def compute_direct_instances(tx, _entities: list[str], names: list[str] = None, _upper: bool = False):
-    if names is None:
-        names = ['instance_of', 'is_a', 'subclass_of']
+def direct_instances_query(names: list[str], _upper: bool) -> str:
     if _upper:
         names = [x.upper() for x in names]
-    _query = DIRECT_INSTANCES_QUERY.format(names="|".join(names))
+    return DIRECT_INSTANCES_QUERY.format(names="|".join(names))
+
+
+DIRECT_INSTANCES_QUERIES = {_upper: direct_instances_query(['instance_of', 'is_a', 'subclass_of'], _upper)
+                            for _upper in [False, True]}
+DIRECT_PART_OF_QUERIES = {_upper: direct_instances_query(['part_of'], _upper) for _upper in [False, True]}
+
+
+def compute_direct_instances(tx, _entities: list[str], names: list[str] = None, _upper: bool = False):
+    if names is None:
+        _query = DIRECT_INSTANCES_QUERIES[_upper]
+    else:
+        _query = direct_instances_query(names, _upper)
     result = tx.run(_query, ids=_entities)
     return [{"source": record["source"],
              "relation": record["relation"],
@@ -236,10 +310,9 @@ def compute_direct_instances(tx, _entities: list[str], names: list[str] = None,
 
 def compute_direct_part_of(tx, _entities: list[str], names: list[str] = None, _upper: bool = False):
     if names is None:
-        names = ['part_of']
-    if _upper:
-        names = [x.upper() for x in names]
-    _query = DIRECT_INSTANCES_QUERY.format(names="|".join(names))
+        _query = DIRECT_PART_OF_QUERIES[_upper]
+    else:
+        _query = direct_instances_query(names, _upper)
     result = tx.run(_query, ids=_entities)
     return [{"source": record["source"],
              "relation": record["relation"],
@@ -248,73 +321,282 @@ def compute_direct_part_of(tx, _entities: list[str], names: list[str] = None, _u
             for record in result]
 
 
-class DatasetManager(metaclass=SingletonMeta):
-    DATABASE_ADDRESS = ""
-    DATABASE_USERNAME = ""
-    DATABASE_PASSWORD = ""
+def subclass_roots(_entities: list[str], _direct_instances: list[Atom], _upper: bool) -> list[str]:
+    # the "subclass_of" subgraph starts from the entities and from the classes they are instances of
+    _new = list(_entities)
+    for i in _direct_instances:
+        if (_upper and i.predicate == "INSTANCE_OF") or (not _upper and i.predicate == "instance_of"):
+            _new.append(i.target_id)
+    return _new
 
-    def __init__(self) -> None:
 
+LEXICON_QUERY = """
+MATCH (n:Synset)
+RETURN n.id AS id, n.undirected_edges AS undirected_edges, n.mainSense AS mainSense, n.synonyms AS synonyms
+"""
+
+
+EDGES_QUERY = """
+MATCH (a:Synset)-[:{relation}]->(b:Synset)
+RETURN a.id AS source, b.id AS target
+"""
+
+
+def with_deadline(_work):
+    # under a deadline, the transaction function runs with the remaining time as transaction timeout
+    # (and is not retried once the deadline has expired)
+    left = timeout("neo4j query")
+    if left is None:
+        return _work
+
+    @unit_of_work(timeout=left)
+    def bounded(tx, *args, **kwargs):
+        check("neo4j query")
+        return _work(tx, *args, **kwargs)
+
+    return bounded
+
+
+def is_timeout(e: Neo4jError) -> bool:
+    return "TransactionTimedOut" in (e.code or "")
+
+
+class Neo4jBackend(GraphBackend):
+
+    def __init__(self, upper: bool) -> None:
         self.DATABASE_ADDRESS = os.environ.get('NEO4J_DB_URI')
         self.DATABASE_USERNAME = os.environ.get('NEO4J_DB_USER')
         self.DATABASE_PASSWORD = os.environ.get('NEO4J_DB_PWD')
 
-        self.upper = os.environ.get('PREDICATES_UPPER', 'False').lower() == 'true'
-        assert (self.DATABASE_ADDRESS != "" and self.DATABASE_USERNAME != "" and self.DATABASE_PASSWORD != "")
+        self.upper = upper
+        self.batch_size = int(os.environ.get('NEO4J_BATCH_SIZE', 500))
+
+        self.driver = None
+        self._driver_lock = threading.Lock()
+        self.connect()
 
-        self.driver = GraphDatabase.driver(self.DATABASE_ADDRESS, auth=(self.DATABASE_USERNAME, self.DATABASE_PASSWORD))
+        # optional offline snapshot of the taxonomy, used for the subgraph extraction (neo4j is the fallback)
+        self.taxonomy: TaxonomySnapshot | None = load_snapshot(os.environ.get('TAXONOMY_SNAPSHOT'))
+
+    def connect(self):
         try:
-            self.driver.verify_connectivity()
+            driver = GraphDatabase.driver(self.DATABASE_ADDRESS,
+                                          auth=(self.DATABASE_USERNAME, self.DATABASE_PASSWORD))
+        except (ConfigurationError, ValueError) as e:
+            # e.g. NEO4J_DB_URI is not set: the queries answer DatasetUnavailable
+            print(f"Neo4j driver configuration failed: {e}")
+            self.driver = None
+            return
+        try:
+            driver.verify_connectivity()
         except (ServiceUnavailable, AuthError, Neo4jError):
             print("Neo4j driver connection failed")
-            self.driver.close()
-            self.driver = None
+            driver.close()
+            driver = None
+        self.driver = driver
+
+    def session(self, **config):
+        # a failed connection is retried at the next request, instead of failing on a None driver
+        if self.driver is None:
+            with self._driver_lock:
+                if self.driver is None:
+                    self.connect()
+            if self.driver is None:
+                raise DatasetUnavailable("Neo4j is not available")
+        return self.driver.session(**config)
+
+    def read(self, session, _work, **kwargs):
+        try:
+            return session.execute_read(with_deadline(_work), **kwargs)
+        except Neo4jError as e:
+            if is_timeout(e):
+                raise DeadlineExceeded("neo4j query ran out of time") from e
+            raise
 
     def get_entities(self, _id):
-        with self.driver.session() as session:
-            return session.execute_read(search_by_id, _identifiers=_id)
-
-    def get_entities_by_lemma(self, lemma, page, skip):
-        pass
-        with self.driver.session() as session:
-            return session.execute_read(search_by_lemma, _lemma=lemma, _page=page, _skip=skip)
+        with span("search_by_id", "neo4j") as s, self.session() as session:
+            rows = self.read(session, search_by_id, _identifiers=_id)
+            s.rows = len(rows)
+        return rows
+
+    def get_entities_by_lemma(self, lemma, page, skip, limit: int = 10, after: tuple[float, str] | None = None):
+        with span("search_by_lemma", "neo4j") as s, self.session() as session:
+            rows = self.read(session, search_by_lemma, _lemma=lemma, _page=page, _skip=skip,
+                             _limit=limit, _after=after)
+            s.rows = len(rows)
+        return rows
+
+    def read_in_batches(self, _work, _ids: list[str], _key: str = "_entities", _distinct: bool = False, **kwargs):
+        # the ids are deduplicated and sent in bounded batches, each one in its own read transaction;
+        # with _distinct, rows returned by more than one batch are merged
+        _ids = list(dict.fromkeys(_ids))
+        merged = []
+        seen = set()
+        with span(_work.__name__, "neo4j") as s, self.session() as session:
+            for batch in chunked(_ids, self.batch_size):
+                for row in self.read(session, _work, **{_key: batch}, **kwargs):
+                    if _distinct:
+                        key = tuple(row.values())
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    merged.append(row)
+            s.rows = len(merged)
+        return merged
 
     def get_direct_instances(self, _entities):
-        with self.driver.session() as session:
-            return session.execute_read(compute_direct_instances, _entities=_entities, _upper=self.upper)
+        return self.read_in_batches(compute_direct_instances, _entities, _upper=self.upper)
 
     def get_direct_part_of(self, _entities):
-        with self.driver.session() as session:
-            return session.execute_read(compute_direct_part_of, _entities=_entities)
+        return self.read_in_batches(compute_direct_part_of, _entities, _upper=self.upper)
 
     def get_full_summary(self, _entities):
-        with self.driver.session() as session:
-            return session.execute_read(compute_oneshot_summary, _entities=_entities, _upper=self.upper)
+        return self.read_in_batches(compute_oneshot_summary, _entities, _upper=self.upper)
+
+    def stream_full_summary(self, _entities):
+        # one query for all the entities, read as it arrives: yields (entity, rows) as soon as each summary
+        # is complete (see SummaryGroups). The transaction is not retried, since its rows are already handed over.
+        groups = SummaryGroups(_entities)
+        with span("compute_oneshot_summary", "neo4j") as s:
+            with self.session(default_access_mode=READ_ACCESS) as session:
+                try:
+                    with session.begin_transaction(timeout=timeout("neo4j query")) as tx:
+                        for record in tx.run(SUMMARY_STREAM_QUERIES[self.upper],
+                                                ids=list(dict.fromkeys(_entities))):
+                            yield from groups.add(summary_row(record))
+                except Neo4jError as e:
+                    if is_timeout(e):
+                        raise DeadlineExceeded("neo4j query ran out of time") from e
+                    raise
+            s.rows = groups.rows
+        yield from groups.finish()
 
     def get_raw_subclass(self, _entities: list[str], _direct_instances: list[Atom]):
-        import copy
-        _new = copy.deepcopy(_entities)
-        for i in _direct_instances:
-            if (self.upper and i.predicate == "INSTANCE_OF") or (not self.upper and i.predicate == "instance_of"):
-                _new.append(i.target_id)
-        with self.driver.session() as session:
-            return session.write_transaction(compute_subgraph, _to_attach=_new,
-                                             _relation="SUBCLASS_OF" if self.upper else "subclass_of",
-                                             _upper=self.upper)
+        _new = subclass_roots(_entities, _direct_instances, self.upper)
+        if self.taxonomy is not None:
+            return self.taxonomy.subgraph(_new, "subclass_of", "SUBCLASS_OF" if self.upper else "subclass_of")
+        return self.read_in_batches(compute_subgraph, _new, _key="_to_attach", _distinct=True,
+                                    _relation="SUBCLASS_OF" if self.upper else "subclass_of", _upper=self.upper)
 
     def get_raw_part_of(self, _entities, _direct_instances):
         if len(_direct_instances) == 0:
             return []
-        with self.driver.session() as session:
-            return session.write_transaction(compute_subgraph, _to_attach=_entities,
-                                             _relation="PART_OF" if self.upper else "part_of", _upper=self.upper)
+        if self.taxonomy is not None:
+            return self.taxonomy.subgraph(_entities, "part_of", "PART_OF" if self.upper else "part_of")
+        return self.read_in_batches(compute_subgraph, _entities, _key="_to_attach", _distinct=True,
+                                    _relation="PART_OF" if self.upper else "part_of", _upper=self.upper)
 
     def get_others(self, _entities):
-        with self.driver.session() as session:
-            return session.execute_read(compute_others, _entities=_entities, _upper=self.upper)
+        return self.read_in_batches(compute_others, _entities, _upper=self.upper)
+
+    def get_edges(self, _relation: str):
+        # streams all the edges of a relation, used to build the taxonomy snapshot
+        with self.session() as session:
+            result = session.run(EDGES_QUERY.format(relation=_relation.upper() if self.upper else _relation))
+            for record in result:
+                yield record["source"], record["target"]
+
+    def get_lexicon(self):
+        # streams (id, undirected_edges, main sense, synonyms) of every synset, used to build the autocomplete index
+        with self.session() as session:
+            for record in session.run(LEXICON_QUERY):
+                yield record["id"], record["undirected_edges"] or 0, record["mainSense"] or "", record["synonyms"] or []
 
     def clear_query_cache(self):
-        with self.driver.session() as session:
+        with self.session() as session:
             result = session.run("CALL db.clearQueryCaches()")
             return result
 
+    def open(self):
+        with self._driver_lock:
+            if self.driver is None:
+                self.connect()
+
+    def close(self):
+        with self._driver_lock:
+            if self.driver is not None:
+                self.driver.close()
+                self.driver = None
+
+
+GRAPH_BACKENDS = ["neo4j", "memory"]
+
+
+class DatasetManager(metaclass=SingletonMeta):
+    # entry point of the graph queries: GRAPH_BACKEND selects the backend,
+    # "neo4j" (default) or "memory" (an in-memory graph loaded from the GRAPH_DUMP file, see memory_graph.py).
+    # The backend is built at the first query, so that importing neXSim needs no dataset;
+    # use() replaces it (e.g. with a MemoryGraph, in tests and benchmarks).
+
+    def __init__(self) -> None:
+        self.upper = os.environ.get('PREDICATES_UPPER', 'False').lower() == 'true'
+        self.backend_name = os.environ.get('GRAPH_BACKEND', 'neo4j').lower()
+        self._backend: GraphBackend | None = None
+        self._backend_lock = threading.Lock()
+
+    def build_backend(self) -> GraphBackend:
+        if self.backend_name == "neo4j":
+            return Neo4jBackend(self.upper)
+        if self.backend_name == "memory":
+            from neXSim.memory_graph import MemoryGraph
+            return MemoryGraph.load(os.environ.get('GRAPH_DUMP'), self.upper)
+        raise Exception(f"Graph backend {self.backend_name} is not supported. Valid backends are {GRAPH_BACKENDS}")
+
+    @property
+    def backend(self) -> GraphBackend:
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = self.build_backend()
+        return self._backend
+
+    def use(self, backend: GraphBackend):
+        # replaces the backend (the previous one is closed)
+        with self._backend_lock:
+            previous, self._backend = self._backend, backend
+            self.upper = backend.upper
+        if previous is not None and previous is not backend:
+            previous.close()
+
+    def get_entities(self, _id):
+        return self.backend.get_entities(_id)
+
+    def get_entities_by_lemma(self, lemma, page, skip, limit: int = 10, after: tuple[float, str] | None = None):
+        return self.backend.get_entities_by_lemma(lemma, page, skip, limit, after)
+
+    def get_direct_instances(self, _entities):
+        return self.backend.get_direct_instances(_entities)
+
+    def get_direct_part_of(self, _entities):
+        return self.backend.get_direct_part_of(_entities)
+
+    def get_full_summary(self, _entities):
+        return self.backend.get_full_summary(_entities)
+
+    def stream_full_summary(self, _entities):
+        return self.backend.stream_full_summary(_entities)
+
+    def get_raw_subclass(self, _entities: list[str], _direct_instances: list[Atom]):
+        return self.backend.get_raw_subclass(_entities, _direct_instances)
+
+    def get_raw_part_of(self, _entities, _direct_instances):
+        return self.backend.get_raw_part_of(_entities, _direct_instances)
+
+    def get_others(self, _entities):
+        return self.backend.get_others(_entities)
+
+    def get_edges(self, _relation: str):
+        return self.backend.get_edges(_relation)
+
+    def get_lexicon(self):
+        return self.backend.get_lexicon()
+
+    def clear_query_cache(self):
+        return self.backend.clear_query_cache()
+
+    def open(self):
+        self.backend.open()
+
+    def close(self):
+        if self._backend is not None:
+            self._backend.close()
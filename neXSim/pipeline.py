@@ -0,0 +1,190 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable
+
+from neXSim.characterization import characterize, kernel_explanation
+from neXSim.deadline import DeadlineExceeded, deadline, remaining, submit_in_context
+from neXSim.lca import lca, lca_async
+from neXSim.models import NeXSimResponse, StageTiming
+from neXSim.summary import full_summary, full_summary_async
+
+# Stage scheduler for the neXSim computations: each stage declares the stages it depends on,
+# and the stages whose dependencies are satisfied run in parallel on a thread pool.
+# Dependencies on stages that are not scheduled are considered satisfied (e.g. a summary already in the input).
+# Under a deadline (see deadline.py), each stage may use a share of the time remaining when it starts, so that
+# the stages that follow keep some of it; a stage that runs out of time is listed in NeXSimResponse.incomplete,
+# with the stages depending on it, and the others still run.
+
+PIPELINE_THREADS = int(os.environ.get('PIPELINE_THREADS', 4))
+
+_pipeline_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[NeXSimResponse], None]
+    depends_on: list[str] = field(default_factory=list)
+    # fraction of the remaining budget the stage may use
+    share: float = 1.0
+
+
+def pipeline_pool() -> ThreadPoolExecutor:
+    global _pipeline_pool
+    with _pool_lock:
+        if _pipeline_pool is None:
+            _pipeline_pool = ThreadPoolExecutor(max_workers=max(PIPELINE_THREADS, 1), thread_name_prefix="pipeline")
+    return _pipeline_pool
+
+
+def nexsim_stages(upper: bool = False, engine: str | None = None) -> list[Stage]:
+    return [
+        Stage("summary", full_summary, share=0.6),
+        Stage("characterization", characterize, ["summary"]),
+        Stage("lca", lambda _input: lca(_input, upper, engine), share=0.6),
+        Stage("ker", kernel_explanation, ["summary", "lca"]),
+    ]
+
+
+def nexsim_async_stages(upper: bool = False, engine: str | None = None) -> list[Stage]:
+    # summary and lca await Neo4j on the event loop, the CPU-bound stages run in worker threads
+    return [
+        Stage("summary", full_summary_async, share=0.6),
+        Stage("characterization", characterize, ["summary"]),
+        Stage("lca", partial(lca_async, _upper=upper, _engine=engine), share=0.6),
+        Stage("ker", kernel_explanation, ["summary", "lca"]),
+    ]
+
+
+def stage_budget(stage: Stage) -> float | None:
+    left = remaining()
+    return None if left is None else left * stage.share
+
+
+def mark_incomplete(_input: NeXSimResponse, name: str):
+    if _input.incomplete is None:
+        _input.incomplete = []
+    _input.incomplete.append(name)
+
+
+def run_stage(_input: NeXSimResponse, name: str, run: Callable[[NeXSimResponse], None]) -> bool:
+    # a single stage (outside of a pipeline): False when it ran out of time
+    try:
+        run(_input)
+    except DeadlineExceeded:
+        mark_incomplete(_input, name)
+        return False
+    return True
+
+
+async def run_stage_async(_input: NeXSimResponse, name: str, run) -> bool:
+    try:
+        await run(_input)
+    except DeadlineExceeded:
+        mark_incomplete(_input, name)
+        return False
+    return True
+
+
+def run_pipeline(_input: NeXSimResponse, stages: list[Stage]) -> list[StageTiming]:
+    _start = time.perf_counter()
+    # the stages update computation_times concurrently: it must exist before they start
+    if _input.computation_times is None:
+        _input.computation_times = {}
+
+    scheduled = {stage.name: stage for stage in stages}
+    pending: dict[str, Stage] = dict(scheduled)
+    done: set[str] = set()
+    incomplete: set[str] = set()
+    timeline: list[StageTiming] = []
+    running = {}
+
+    def execute(stage: Stage) -> StageTiming:
+        stage_start = time.perf_counter()
+        with deadline(stage_budget(stage)):
+            stage.run(_input)
+        return StageTiming(stage=stage.name,
+                           start=round(stage_start - _start, 5),
+                           end=round(time.perf_counter() - _start, 5))
+
+    pool = pipeline_pool()
+    while pending or running:
+        for name in list(pending.keys()):
+            stage = pending[name]
+            if any(dep in incomplete for dep in stage.depends_on):
+                incomplete.add(name)
+                mark_incomplete(_input, name)
+                del pending[name]
+            elif all(dep in done or dep not in scheduled for dep in stage.depends_on):
+                running[submit_in_context(pool, execute, stage)] = name
+                del pending[name]
+
+        if not running:
+            if pending:
+                raise Exception(f"Stages {list(pending.keys())} have unsatisfiable dependencies")
+            break
+
+        completed, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+        for future in completed:
+            name = running.pop(future)
+            try:
+                timeline.append(future.result())
+            except DeadlineExceeded:
+                incomplete.add(name)
+                mark_incomplete(_input, name)
+                continue
+            except Exception:
+                for other in running.keys():
+                    other.cancel()
+                raise
+            done.add(name)
+
+    timeline.sort(key=lambda t: t.start)
+    if _input.timeline is None:
+        _input.timeline = []
+    _input.timeline.extend(timeline)
+    return timeline
+
+
+async def run_pipeline_async(_input: NeXSimResponse, stages: list[Stage]) -> list[StageTiming]:
+    _start = time.perf_counter()
+    if _input.computation_times is None:
+        _input.computation_times = {}
+
+    tasks: dict[str, asyncio.Task] = {}
+
+    async def execute(stage: Stage) -> StageTiming | None:
+        finished = await asyncio.gather(*[tasks[dep] for dep in stage.depends_on if dep in tasks])
+        if any(timing is None for timing in finished):
+            mark_incomplete(_input, stage.name)
+            return None
+        stage_start = time.perf_counter()
+        try:
+            with deadline(stage_budget(stage)):
+                if asyncio.iscoroutinefunction(stage.run):
+                    await stage.run(_input)
+                else:
+                    await asyncio.to_thread(stage.run, _input)
+        except DeadlineExceeded:
+            mark_incomplete(_input, stage.name)
+            return None
+        return StageTiming(stage=stage.name,
+                           start=round(stage_start - _start, 5),
+                           end=round(time.perf_counter() - _start, 5))
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.ensure_future(execute(stage))
+
+    timeline: list[StageTiming] = [t for t in await asyncio.gather(*tasks.values()) if t is not None]
+
+    timeline.sort(key=lambda t: t.start)
+    if _input.timeline is None:
+        _input.timeline = []
+    _input.timeline.extend(timeline)
+    return timeline
@@ -1,8 +1,27 @@
 import os
-import psycopg
+import threading
+import time
+
 from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+
+from neXSim.tracing import span
+from neXSim.utils import SingletonMeta, chunked
+
+PREDICATE_INFO_QUERY = """
+        SELECT p.name as name, p.short_name as short_name, p.symbol as symbol, p.type as type
+        from SYMBOL_TO_INTERNAL_IDENTIFIER i, PREDICATE_INFO p
+        where p.symbol = i.symbol
+        and i.internal_identifier = %s
+        LIMIT 1"""
+
+ENTITIES_QUERY = """ SELECT s.* from synset s where s.id = ANY(%s)"""
+
+# the metrics of get_metrics that are exported as counters (the pool ones are psycopg_pool's get_stats)
+CUMULATIVE_METRICS = {"queries", "pool_wait", "query_time", "pool_requests_num", "pool_requests_queued",
+                      "pool_requests_wait_ms", "pool_requests_errors", "pool_returns_bad", "pool_connections_num",
+                      "pool_connections_ms", "pool_connections_errors", "pool_connections_lost", "pool_usage_ms"}
 
-from neXSim.utils import SingletonMeta
 
 class PostgresQLConnector(metaclass=SingletonMeta):
 
@@ -21,29 +40,83 @@ class PostgresQLConnector(metaclass=SingletonMeta):
 
             self.PG_DSN = f"postgresql://{user}:{pwd}@{host}:{port}/{db}"
 
+        self.min_size = int(os.environ.get('POSTGRES_POOL_MIN_SIZE', 1))
+        self.max_size = int(os.environ.get('POSTGRES_POOL_MAX_SIZE', 10))
+        self.batch_size = int(os.environ.get('POSTGRES_BATCH_SIZE', 1000))
 
-    def get_predicate_info(self, _identifier):
-        sql = f"""
-        SELECT p.name as name, p.short_name as short_name, p.symbol as symbol, p.type as type 
-        from SYMBOL_TO_INTERNAL_IDENTIFIER i, PREDICATE_INFO p 
-        where p.symbol = i.symbol 
-        and i.internal_identifier = '{_identifier}'
-        LIMIT 1"""
+        # the pool is opened at the first query, so that it is never inherited by forked workers
+        self.pool: ConnectionPool | None = None
+        self._pool_lock = threading.Lock()
 
-        with psycopg.connect(self.PG_DSN) as conn:
-            conn.row_factory = dict_row
-            with conn.cursor() as cur:
-                cur.execute(sql, ())
-                return cur.fetchall()
+        self._metrics_lock = threading.Lock()
+        self.metrics: dict[str, float] = {
+            "queries": 0,
+            "pool_wait": 0.0,
+            "query_time": 0.0,
+            "max_pool_wait": 0.0,
+            "max_query_time": 0.0
+        }
+
+    def get_pool(self) -> ConnectionPool:
+        with self._pool_lock:
+            if self.pool is None:
+                # prepare_threshold=0: every statement is prepared server-side at its first execution
+                self.pool = ConnectionPool(self.PG_DSN,
+                                           min_size=self.min_size,
+                                           max_size=self.max_size,
+                                           kwargs={"row_factory": dict_row, "prepare_threshold": 0},
+                                           check=ConnectionPool.check_connection,
+                                           name="neXSim",
+                                           open=True)
+        return self.pool
+
+    def _record(self, waited: float, elapsed: float):
+        with self._metrics_lock:
+            m = self.metrics
+            m["queries"] += 1
+            m["pool_wait"] += waited
+            m["query_time"] += elapsed
+            m["max_pool_wait"] = max(m["max_pool_wait"], waited)
+            m["max_query_time"] = max(m["max_query_time"], elapsed)
+
+    def fetch_all(self, sql: str, params: tuple, _name: str = "query") -> list[dict]:
+        _start = time.perf_counter()
+        with self.get_pool().connection() as conn:
+            waited = time.perf_counter() - _start
+            with span(_name, "postgres") as s:
+                with conn.cursor() as cur:
+                    cur.execute(sql, params)
+                    rows = cur.fetchall()
+                s.rows = len(rows)
+            self._record(waited, s.duration)
+        return rows
+
+    def iter_rows(self, sql: str, params: tuple = (), itersize: int = 10000):
+        # server-side (named) cursor: the rows of a full-table scan are streamed, never all in memory
+        with self.get_pool().connection() as conn:
+            with conn.cursor(name="neXSim_stream") as cur:
+                cur.itersize = itersize
+                cur.execute(sql, params)
+                yield from cur
+
+    def get_metrics(self) -> dict[str, float]:
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        if self.pool is not None:
+            metrics.update({f"pool_{k}": v for k, v in self.pool.get_stats().items()})
+        return metrics
+
+    def get_predicate_info(self, _identifier):
+        return self.fetch_all(PREDICATE_INFO_QUERY, (_identifier,), "predicate_info")
 
     def get_entities(self, _identifiers: list[str]):
-        parameter = ""
-        for _id in _identifiers:
-            parameter += f"'{_id}',"
-        parameter = parameter[:-1]
-        sql =f""" SELECT s.* from synset s where s.id in ({parameter})"""
-        with psycopg.connect(self.PG_DSN) as conn:
-            conn.row_factory = dict_row
-            with conn.cursor() as cur:
-                cur.execute(sql, ())
-                return cur.fetchall()
\ No newline at end of file
+        result = []
+        for batch in chunked(list(dict.fromkeys(_identifiers)), self.batch_size):
+            result.extend(self.fetch_all(ENTITIES_QUERY, (batch,), "entities"))
+        return result
+
+    def close(self):
+        with self._pool_lock:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
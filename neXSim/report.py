@@ -1,21 +1,14 @@
+import os
 import time
+from typing import Iterator
 
+from neXSim import DatasetManager
 from neXSim.models import NeXSimResponse, Entity, Atom, Variable
 from neXSim.search import search_by_id
-from neXSim.lca import lca
-from neXSim.summary import full_summary
-from neXSim.characterization import characterize, kernel_explanation
+from neXSim.pipeline import run_pipeline, nexsim_stages
 
-
-def find_entity_from_list(to_find: str, collection: set[Entity]) -> Entity | str:
-    for entity in collection:
-        if entity.id == to_find:
-            return entity
-    # tmp: set[Entity] = search_by_id([to_find])
-    # if len(tmp) > 0:
-    #    for entity in tmp:
-    #        return entity
-    return to_find
+# the lines of a streamed report are sent in chunks of about this many characters, not one write per line
+REPORT_CHUNK_SIZE = int(os.environ.get('REPORT_CHUNK_SIZE', 32768))
 
 
 def entity_to_outfile(e: Entity | str) -> str:
@@ -24,81 +17,97 @@ def entity_to_outfile(e: Entity | str) -> str:
     return e
 
 
-def atom_to_outfile(atom: Atom, involved: set[Entity]) -> str:
-    p = atom.predicate
-    s = ""
-    t = ""
-    if type(atom.source_id) == str:
-        s = entity_to_outfile(find_entity_from_list(atom.source_id, involved))
-    elif type(atom.source_id) == Variable:
-        s = str(atom.source_id)
+def term_to_outfile(term: str | Variable, involved: dict[str, Entity]) -> str:
+    if type(term) == str:
+        return entity_to_outfile(involved.get(term, term))
+    elif type(term) == Variable:
+        return str(term)
+    return ""
 
-    if type(atom.target_id) == str:
-        t = entity_to_outfile(find_entity_from_list(atom.target_id, involved))
-    elif type(atom.target_id) == Variable:
-        t = str(atom.target_id)
 
-    return f"{p}({s},{t})"
+def atom_to_outfile(atom: Atom, involved: dict[str, Entity]) -> str:
+    return f"{atom.predicate}({term_to_outfile(atom.source_id, involved)},{term_to_outfile(atom.target_id, involved)})"
 
 
-def report_all(_input: NeXSimResponse) -> str:
-    _start = time.perf_counter()
-    if _input.unit is None or len(_input.unit) == 0:
-        return "Empty unit!"
-    _output = "Unit: "
-    _entities: set[Entity] = search_by_id(_input.unit)
-    for _entity in _entities:
-        _output += entity_to_outfile(_entity) + ", "
-    _output = _output[:-2] + "\n \n"
-    if _input.summaries is None or len(_input.summaries) == 0:
-        full_summary(_input)
-    _ids_in_summaries: set[str] = set()
+def involved_ids(_input: NeXSimResponse) -> list[str]:
+    # every constant shown in the report: the unit, the tops of the summaries and the constants of the atoms
+    ids: dict[str, None] = dict.fromkeys(_input.unit)
     for summary in _input.summaries:
-        for top in summary.tops:
-            if top not in _input.unit:
-                _ids_in_summaries.add(top)
+        ids.update(dict.fromkeys(summary.tops))
+    for atoms in [_input.lca, _input.characterization, _input.kernel_explanation]:
+        for atom in atoms:
+            for term in [atom.source_id, atom.target_id]:
+                if type(term) == str:
+                    ids[term] = None
+    return list(ids.keys())
 
-    _involved_entities: set[Entity] = set(_entities)
-    _involved_entities = _involved_entities.union(search_by_id(list(_ids_in_summaries)))
 
-    for summary in _input.summaries:
-        _output += f"Summary for {entity_to_outfile(find_entity_from_list(summary.entity, _entities))}: \n"
-        for atom in summary.summary:
-            _output += f"{atom_to_outfile(atom, _involved_entities)}\n"
-        _output += "\n"
+def prepare_report(_input: NeXSimResponse) -> dict[str, Entity]:
+    # only the missing stages are computed, independent ones in parallel
+    _missing = {
+        "summary": _input.summaries is None or len(_input.summaries) == 0,
+        "characterization": _input.characterization is None or len(_input.characterization) == 0,
+        "lca": _input.lca is None or len(_input.lca) == 0,
+        "ker": _input.kernel_explanation is None or len(_input.kernel_explanation) == 0
+    }
+    run_pipeline(_input, [stage for stage in nexsim_stages(DatasetManager().upper) if _missing[stage.name]])
 
-    if _input.lca is None or len(_input.lca) == 0:
-        lca(_input)
+    # one lookup for the metadata of all the entities of the report
+    return {entity.id: entity for entity in search_by_id(involved_ids(_input))}
 
-    _output += "LCA: \n"
-    for atom in _input.lca:
-        _output += f"{atom_to_outfile(atom, _involved_entities)}\n"
-    _output += "\n"
 
-    if _input.characterization is None or len(_input.characterization) == 0:
-        characterize(_input)
+def render_report(_input: NeXSimResponse, involved: dict[str, Entity], _start: float) -> Iterator[str]:
+    yield "Unit: " + ", ".join(entity_to_outfile(involved[e]) for e in dict.fromkeys(_input.unit)
+                               if e in involved) + "\n \n"
 
-    _output += "Characterization: \n"
-    for atom in _input.characterization:
-        _output += f"{atom_to_outfile(atom, _involved_entities)}\n"
-    _output += "\n"
+    for summary in _input.summaries:
+        yield f"Summary for {term_to_outfile(summary.entity, involved)}: \n"
+        for atom in summary.summary:
+            yield f"{atom_to_outfile(atom, involved)}\n"
+        yield "\n"
 
-    if _input.kernel_explanation is None or len(_input.kernel_explanation) == 0:
-        kernel_explanation(_input)
+    for title, atoms in [("LCA", _input.lca),
+                         ("Characterization", _input.characterization),
+                         ("Kernel Explanation", _input.kernel_explanation)]:
+        yield f"{title}: \n"
+        for atom in atoms:
+            yield f"{atom_to_outfile(atom, involved)}\n"
+        yield "\n"
 
-    _output += "Kernel Explanation: \n"
-    for atom in _input.kernel_explanation:
-        _output += f"{atom_to_outfile(atom, _involved_entities)}\n"
-    _output += "\n"
     _total = round(time.perf_counter() - _start, 5)
     if _input.computation_times is not None:
         ct = _input.computation_times
-        _output += "###############################\n"
-        _output += "Computation Times: \n"
+        yield "###############################\n"
+        yield "Computation Times: \n"
         for entry in ct.keys():
-            _output += f"{entry}: {ct[entry]} s\n"
-        _output += f"Total Clock Time: {_total} s\n"
-        _output += f"Total Core Time: {round(ct['summary'] + ct['characterization'], 5)} s\n"
-        _output += f"Total Ker Time: {round(ct['summary'] + ct['lca'] + ct['ker'],5)} s\n"
-        _output += "###############################"
-    return _output
+            yield f"{entry}: {ct[entry]} s\n"
+        yield f"Total Clock Time: {_total} s\n"
+        # as the JSON report: a stage not computed in this request (precomputed input) has no time
+        yield f"Total Core Time: {round(sum(ct.get(k, 0.0) for k in ['summary', 'characterization']), 5)} s\n"
+        yield f"Total Ker Time: {round(sum(ct.get(k, 0.0) for k in ['summary', 'lca', 'ker']), 5)} s\n"
+        yield "###############################"
+
+
+def buffered(parts: Iterator[str], size: int = REPORT_CHUNK_SIZE) -> Iterator[str]:
+    buffer: list[str] = []
+    length = 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_report(_input: NeXSimResponse) -> Iterator[str]:
+    # the computations and the lookup happen here, the text is produced while it is sent
+    _start = time.perf_counter()
+    if _input.unit is None or len(_input.unit) == 0:
+        return iter(["Empty unit!"])
+    return buffered(render_report(_input, prepare_report(_input), _start))
+
+
+def report_all(_input: NeXSimResponse) -> str:
+    return "".join(stream_report(_input))
@@ -1,17 +1,24 @@
 import os
 import time
 
-from flask import request
+from flask import g, request, stream_with_context
 from flask_restx import Resource, Api
 from pydantic import ValidationError
 from neXSim import app
 from neXSim.characterization import characterize, kernel_explanation
 from neXSim.models import *
 from neXSim.search import *
-from neXSim.summary import full_summary
-from neXSim.lca import lca
-from neXSim.report import report_all
-from neXSim.utils import is_valid_babelnet_id
+from neXSim.summary import full_summary, stream_summary
+from neXSim.lca import lca, LCA_ENGINES
+from neXSim.report import stream_report
+from neXSim.pipeline import run_pipeline, run_stage, nexsim_stages
+from neXSim.batch import batch_oneshot
+from neXSim.matrix import similarity_matrix
+from neXSim.autocomplete import autocomplete_index
+from neXSim.graph_backend import DatasetUnavailable
+from neXSim.deadline import deadline, request_budget, stream_within
+from neXSim.tracing import METRICS, LATENCY_BUCKETS, BYTES_BUCKETS, render_metrics
+from neXSim.utils import is_valid_babelnet_id, NDJSON, ndjson_lines, primed, wants_ndjson
 
 api = Api(app, doc='/api/docs', title='neXSim API', version='0.1', description='neXSim API')
 
@@ -49,6 +56,61 @@ def check_lca(req: NeXSimResponse):
     return req.lca is not None
 
 
+def check_lca_engine():
+    engine = request.args.get('engine')
+    if engine is not None and engine not in LCA_ENGINES:
+        return app.response_class(
+            response=f"{engine} is not a valid LCA engine. Valid engines are {LCA_ENGINES}",
+            status=400,
+            mimetype='text/plain'
+        )
+    return engine
+
+
+def check_budget():
+    # the budget of the request in seconds (None when unbounded), or the error response
+    try:
+        return request_budget(request.args.get('budget_ms'))
+    except ValueError as e:
+        return app.response_class(
+            response=str(e),
+            status=400,
+            mimetype='text/plain'
+        )
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def observe_request(response):
+    # labelled by route (not by path), so that the number of series stays bounded
+    labels = {"endpoint": request.url_rule.rule if request.url_rule is not None else "unmatched",
+              "method": request.method, "status": str(response.status_code)}
+    METRICS.observe("nexsim_request_seconds", "Duration of the requests (until the first byte when streamed)",
+                    LATENCY_BUCKETS, labels, time.perf_counter() - g.get("request_start", time.perf_counter()))
+    if response.content_length is not None:
+        METRICS.observe("nexsim_response_bytes", "Size of the responses (not streamed)", BYTES_BUCKETS,
+                        labels, response.content_length)
+    return response
+
+
+@api.errorhandler(DatasetUnavailable)
+def dataset_unavailable(e):
+    return {"error": str(e)}, 503
+
+
+@app.route('/metrics')
+def metrics():
+    return app.response_class(
+        response=render_metrics(),
+        status=200,
+        mimetype='text/plain; version=0.0.4'
+    )
+
+
 @api.route('/index/')
 @api.doc()
 class Index(Resource):
@@ -86,6 +148,64 @@ class SearchByLemma(Resource):
         )
 
 
+@api.route('/api/search/<string:lemma>')
+@api.doc(params={'lemma': 'a word or phrase to search for',
+                 'cursor': 'the "next" cursor of the previous page (omit it for the first page)'})
+class SearchByLemmaCursor(Resource):
+
+    @api.response(200, 'Success')
+    def get(self, lemma):
+        try:
+            entities, next_cursor = search_page(lemma, request.args.get('cursor'))
+        except ValueError as e:
+            return app.response_class(
+                response=str(e),
+                status=400,
+                mimetype='text/plain'
+            )
+
+        return app.response_class(
+            response=SearchPage(entities=entities, next=next_cursor).model_dump_json(),
+            status=200,
+            mimetype='application/json'
+        )
+
+
+@api.route('/api/autocomplete/<string:prefix>')
+@api.doc(params={'prefix': 'the beginning of a main sense or synonym',
+                 'limit': 'the number of suggestions (default 10, at most 50)'})
+class Autocomplete(Resource):
+
+    @api.response(200, 'Success')
+    def get(self, prefix):
+        try:
+            limit = int(request.args.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= 50:
+            return app.response_class(
+                response="Invalid limit. It should be an integer between 1 and 50.",
+                status=400,
+                mimetype='text/plain'
+            )
+
+        index = autocomplete_index()
+        if index is not None:
+            # in rank order; the ids missing from the dataset (a stale snapshot) are skipped
+            ids = index.complete_ids(prefix, limit)
+            found = {entity.id: entity for entity in search_by_id(ids)}
+            entities = [found[_id] for _id in ids if _id in found]
+        else:
+            # no index configured: full-text search
+            entities, _ = search_page(prefix, None, limit)
+
+        return app.response_class(
+            response=EntityList(entities=list(entities)).model_dump_json(),
+            status=200,
+            mimetype='application/json'
+        )
+
+
 def search_by_ids(entities):
     print(entities[0])
     for entity in entities:
@@ -162,7 +282,10 @@ class Summary(Resource):
 
     @api.param("humanReadable", "Return results in human-readable format (true/false)",
                type=bool, required=False, default=False)
+    @api.param("budget_ms", "time budget of the request in milliseconds (defaults to REQUEST_BUDGET_MS)",
+               type=int, required=False)
     @api.response(200, 'Success')
+    @api.doc(description=f"With 'Accept: {NDJSON}', the summaries are streamed one per line")
     def post(self):
 
         parsed_request = validate_and_parse_nexsim_response(request.json)
@@ -172,10 +295,23 @@ class Summary(Resource):
 
         my_request: NeXSimResponse = parsed_request
 
+        budget = check_budget()
+        if budget is not None and type(budget) != float:
+            return budget
+
+        if wants_ndjson(request.headers.get('Accept')):
+            summaries = stream_within(budget, stream_summary(my_request))
+            return app.response_class(
+                response=stream_with_context(ndjson_lines(primed(summaries))),
+                status=200,
+                mimetype=NDJSON
+            )
+
         if my_request.summaries is None:
             my_request.summaries = []
 
-        full_summary(my_request)
+        with deadline(budget):
+            run_stage(my_request, "summary", full_summary)
 
         return app.response_class(
             response=my_request.model_dump_json(),
@@ -187,6 +323,10 @@ class Summary(Resource):
 @api.route('/api/lca')
 class LCA(Resource):
 
+    @api.param("engine", f"LCA engine, one of {LCA_ENGINES} (defaults to the LCA_ENGINE env variable)",
+               type=str, required=False)
+    @api.param("budget_ms", "time budget of the request in milliseconds (defaults to REQUEST_BUDGET_MS)",
+               type=int, required=False)
     @api.response(200, 'Success')
     def post(self):
         parsed_request = validate_and_parse_nexsim_response(request.json)
@@ -196,8 +336,17 @@ class LCA(Resource):
 
         my_request: NeXSimResponse = parsed_request
 
+        engine = check_lca_engine()
+        if engine is not None and type(engine) != str:
+            return engine
+
+        budget = check_budget()
+        if budget is not None and type(budget) != float:
+            return budget
+
         upper: bool = os.environ.get('PREDICATES_UPPER') == 'True'
-        lca(my_request, upper)
+        with deadline(budget):
+            run_stage(my_request, "lca", lambda _input: lca(_input, upper, engine))
 
         return app.response_class(
             response=my_request.model_dump_json(),
@@ -209,6 +358,8 @@ class LCA(Resource):
 @api.route('/api/characterize')
 class Characterization(Resource):
 
+    @api.param("budget_ms", "time budget of the request in milliseconds (defaults to REQUEST_BUDGET_MS)",
+               type=int, required=False)
     @api.response(200, 'Success')
     def post(self):
         parsed_request = validate_and_parse_nexsim_response(request.json)
@@ -225,8 +376,13 @@ class Characterization(Resource):
                 mimetype='text/plain'
             )
 
+        budget = check_budget()
+        if budget is not None and type(budget) != float:
+            return budget
+
         # Here the computation
-        characterize(my_request)
+        with deadline(budget):
+            run_stage(my_request, "characterization", characterize)
 
         return app.response_class(
             response=my_request.model_dump_json(),
@@ -238,6 +394,8 @@ class Characterization(Resource):
 @api.route('/api/kernel')
 class Kernel(Resource):
 
+    @api.param("budget_ms", "time budget of the request in milliseconds (defaults to REQUEST_BUDGET_MS)",
+               type=int, required=False)
     @api.response(200, 'Success')
     def post(self):
         parsed_request = validate_and_parse_nexsim_response(request.json)
@@ -261,7 +419,12 @@ class Kernel(Resource):
                 mimetype='text/plain'
             )
 
-        kernel_explanation(my_request)
+        budget = check_budget()
+        if budget is not None and type(budget) != float:
+            return budget
+
+        with deadline(budget):
+            run_stage(my_request, "ker", kernel_explanation)
 
         return app.response_class(
             response=my_request.model_dump_json(),
@@ -272,6 +435,10 @@ class Kernel(Resource):
 
 @api.route('/api/oneshot')
 class OneshotComputation(Resource):
+    @api.param("engine", f"LCA engine, one of {LCA_ENGINES} (defaults to the LCA_ENGINE env variable)",
+               type=str, required=False)
+    @api.param("budget_ms", "time budget of the request in milliseconds (defaults to REQUEST_BUDGET_MS)",
+               type=int, required=False)
     @api.response(200, 'Success')
     def post(self):
         upper: bool = os.environ.get('PREDICATES_UPPER') == 'True'
@@ -282,10 +449,16 @@ class OneshotComputation(Resource):
 
         my_request: NeXSimResponse = parsed_request
 
-        full_summary(my_request)
-        characterize(my_request)
-        lca(my_request, upper)
-        kernel_explanation(my_request)
+        engine = check_lca_engine()
+        if engine is not None and type(engine) != str:
+            return engine
+
+        budget = check_budget()
+        if budget is not None and type(budget) != float:
+            return budget
+
+        with deadline(budget):
+            run_pipeline(my_request, nexsim_stages(upper, engine))
 
         return app.response_class(
             response=my_request.model_dump_json(),
@@ -293,8 +466,61 @@ class OneshotComputation(Resource):
             mimetype='application/json'
         )
 
+@api.route('/api/batch/oneshot')
+class BatchOneshotComputation(Resource):
+    @api.param("engine", f"LCA engine, one of {LCA_ENGINES} (defaults to the LCA_ENGINE env variable)",
+               type=str, required=False)
+    @api.response(200, 'Success')
+    def post(self):
+        upper: bool = os.environ.get('PREDICATES_UPPER') == 'True'
+        try:
+            batch_request = BatchRequest.model_validate(request.json)
+        except ValidationError as e:
+            return {"error": e.errors()}, 400
+
+        engine = check_lca_engine()
+        if engine is not None and type(engine) != str:
+            return engine
+
+        resp: BatchResponse = batch_oneshot(batch_request.units, upper, engine)
+
+        return app.response_class(
+            response=resp.model_dump_json(),
+            status=200,
+            mimetype='application/json'
+        )
+
+
+@api.route('/api/matrix')
+class SimilarityMatrix(Resource):
+    @api.response(200, 'Success')
+    def post(self):
+        upper: bool = os.environ.get('PREDICATES_UPPER') == 'True'
+        try:
+            matrix_request = MatrixRequest.model_validate(request.json)
+        except ValidationError as e:
+            return {"error": e.errors()}, 400
+
+        try:
+            resp: MatrixResponse = similarity_matrix(matrix_request.entities, upper)
+        except ValueError as e:
+            return app.response_class(
+                response=str(e),
+                status=400,
+                mimetype='text/plain'
+            )
+
+        return app.response_class(
+            response=resp.model_dump_json(),
+            status=200,
+            mimetype='application/json'
+        )
+
+
 @api.route('/api/unit/report/<string:mode>')
 class Report(Resource):
+    @api.param("budget_ms", "time budget of the request in milliseconds (defaults to REQUEST_BUDGET_MS)",
+               type=int, required=False)
     @api.response(200, 'Success')
     def post(self, mode):
         if mode not in ['text', 'json']:
@@ -304,28 +530,29 @@ class Report(Resource):
         except ValidationError as e:
             return {"error": e.errors()}, 400
         if mode == 'text':
-            raw_data = report_all(_input)
             return app.response_class(
-                response=raw_data,
+                response=stream_with_context(stream_report(_input)),
                 status=200,
                 mimetype='text/plain',
                 headers={'Content-Disposition': 'attachment; filename=report.txt'}
             )
         else:
+            budget = check_budget()
+            if budget is not None and type(budget) != float:
+                return budget
+
             _start = time.perf_counter()
             _unit: NeXSimResponse = NeXSimResponse(unit=_input.unit)
-            full_summary(_unit)
-            characterize(_unit)
-            lca(_unit)
-            kernel_explanation(_unit)
-            if _unit.computation_times is None:
-                _unit.computation_times = {}
+            upper: bool = os.environ.get('PREDICATES_UPPER') == 'True'
+            with deadline(budget):
+                run_pipeline(_unit, nexsim_stages(upper))
 
             ct = _unit.computation_times
 
+            # the stages skipped for lack of time have no computation time
             ct["total_clock_time"] = round(time.perf_counter() - _start, 5)
-            ct["total_core_time"] = round(ct["summary"]+ ct["characterization"], 5)
-            ct["total_ker_time"] = round(ct["summary"]+ ct["lca"]+ ct["ker"], 5)
+            ct["total_core_time"] = round(sum(ct.get(k, 0.0) for k in ["summary", "characterization"]), 5)
+            ct["total_ker_time"] = round(sum(ct.get(k, 0.0) for k in ["summary", "lca", "ker"]), 5)
 
             return app.response_class(
                 response=_unit.model_dump_json(),
@@ -1,5 +1,16 @@
-from neXSim.models import Entity
+import base64
+import bisect
+import fcntl
+import json
+import os
+import tempfile
+import threading
+from collections import Counter
+
+from neXSim.models import Entity, trusted_entity
 from neXSim import neo4j_instance, postgres_instance
+from neXSim.async_neo4j_manager import AsyncDatasetManager
+from neXSim.utils import TTLCache, dataset_version
 
 
 def parse_entity(e):
@@ -24,8 +35,8 @@ def parse_entity(e):
 
     _image_url = e["image_url"] if e["image_url"] is not None else ""
 
-    tmp: Entity = Entity(id=_id, main_sense=_main_sense, entity_type=_type,
-                         description=_description, synonyms=_synonyms, image_url=_image_url)
+    # the rows come from our own databases: no validation
+    tmp: Entity = trusted_entity(_id, _main_sense, _description, _synonyms, _type, _image_url)
 
     return tmp
 
@@ -47,11 +58,221 @@ def result_to_entity_set(result) -> set[Entity]:
     return result_set
 
 
+# Entity metadata cache in front of neo4j_instance/postgres_instance.get_entities,
+# keyed by (source, id, dataset version) and bounded both in entries and in estimated bytes.
+# With ENTITY_NEGATIVE_CACHE=True, the ids that are not found are cached as well.
+
+def entity_weight(value) -> int:
+    # rough size in bytes of a cached entity (object overheads included)
+    if not isinstance(value, Entity):
+        return 64
+    return (400 + len(value.id) + len(value.main_sense) + len(value.description) + len(value.image_url)
+            + sum(60 + len(synonym) for synonym in value.synonyms))
+
+
+ENTITY_CACHE = TTLCache(max_size=int(os.environ.get('ENTITY_CACHE_SIZE', 100000)),
+                        ttl=float(os.environ.get('ENTITY_CACHE_TTL', 86400)),
+                        max_weight=int(os.environ.get('ENTITY_CACHE_MAX_BYTES', 64 * 2 ** 20)),
+                        weigher=entity_weight)
+ENTITY_NEGATIVE_CACHE = os.environ.get('ENTITY_NEGATIVE_CACHE', 'False') == 'True'
+NOT_FOUND = "NOT_FOUND"
+
+# how many times each id was requested, for the warm-up of the next workers (trimmed to the most frequent ones)
+_requested: Counter = Counter()
+_requested_lock = threading.Lock()
+
+
+def count_requests(identifiers: list[str]):
+    with _requested_lock:
+        _requested.update(identifiers)
+        if len(_requested) > 2 * max(ENTITY_CACHE.max_size, 1):
+            kept = _requested.most_common(ENTITY_CACHE.max_size)
+            _requested.clear()
+            _requested.update(dict(kept))
+
+
+def frequent_ids(n: int) -> list[str]:
+    with _requested_lock:
+        return [_id for _id, _ in _requested.most_common(n)]
+
+
+def cache_lookup(identifiers: list[str], source: str) -> tuple[set[Entity], list[str]]:
+    # the cached entities, and the ids to fetch
+    version = dataset_version()
+    identifiers = list(dict.fromkeys(identifiers))
+    count_requests(identifiers)
+
+    found: set[Entity] = set()
+    missing: list[str] = []
+    for _id in identifiers:
+        cached = ENTITY_CACHE.get((source, _id, version))
+        if cached is None:
+            missing.append(_id)
+        elif cached is not NOT_FOUND:
+            found.add(cached)
+    return found, missing
+
+
+def cache_store(missing: list[str], source: str, rows) -> set[Entity]:
+    # caches the entities fetched for the missing ids (and, with ENTITY_NEGATIVE_CACHE, the ids not found)
+    version = dataset_version()
+    fetched = result_to_entity_set(rows)
+    for entity in fetched:
+        ENTITY_CACHE.put((source, entity.id, version), entity)
+    if ENTITY_NEGATIVE_CACHE:
+        for _id in set(missing).difference(entity.id for entity in fetched):
+            ENTITY_CACHE.put((source, _id, version), NOT_FOUND)
+    return fetched
+
+
+def cached_search(identifiers: list[str], source: str, fetch) -> set[Entity]:
+    found, missing = cache_lookup(identifiers, source)
+    # only the misses are fetched, in one bulk lookup
+    if len(missing) > 0:
+        found.update(cache_store(missing, source, fetch(missing)))
+    return found
+
+
 def search_by_id(identifiers: list[str], on_graph: bool = True) -> set[Entity]:
     if on_graph:
-        return result_to_entity_set(neo4j_instance.get_entities(identifiers))
-    return result_to_entity_set(postgres_instance.get_entities(identifiers))
+        return cached_search(identifiers, "graph", neo4j_instance.get_entities)
+    return cached_search(identifiers, "postgres", postgres_instance.get_entities)
+
+
+async def search_by_id_async(identifiers: list[str]) -> set[Entity]:
+    # search_by_id on the graph, for the async serving mode: same cache, the misses fetched on the event loop
+    found, missing = cache_lookup(identifiers, "graph")
+    if len(missing) > 0:
+        found.update(cache_store(missing, "graph", await AsyncDatasetManager().get_entities(missing)))
+    return found
+
+
+def read_frequent_ids(path: str) -> Counter:
+    # the ENTITY_CACHE_WARMUP file: one "id<TAB>count" line per id (a line without count counts 1)
+    counts: Counter = Counter()
+    if not os.path.exists(path):
+        return counts
+    with open(path) as f:
+        for line in f:
+            _id, _, count = line.strip().partition("\t")
+            if _id:
+                counts[_id] += int(count) if count else 1
+    return counts
+
+
+def warm_up_entity_cache(identifiers: list[str] | None = None, on_graph: bool = True) -> int:
+    # preloads the given ids, by default the ones listed in the ENTITY_CACHE_WARMUP file
+    if identifiers is None:
+        path = os.environ.get('ENTITY_CACHE_WARMUP')
+        if path is None:
+            return 0
+        identifiers = list(read_frequent_ids(path).keys())
+        if len(identifiers) == 0:
+            return 0
+    return len(search_by_id(identifiers, on_graph))
+
+
+def dump_frequent_ids(path: str, n: int = 10000):
+    # merges the request counts of this worker into the file (the workers exit concurrently: under a lock),
+    # and replaces it atomically, so that a starting worker never reads a partial file
+    with _requested_lock:
+        own = Counter(dict(_requested))
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        counts = read_frequent_ids(path)
+        counts.update(own)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".warmup")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.writelines(f"{_id}\t{count}\n" for _id, count in counts.most_common(n))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+# Lemma search: the first SEARCH_CACHE_DEPTH ranked hits of each (normalized) lemma are cached for a short time,
+# the pages are sliced from them; past them, the hits are fetched with a keyset query on the (rank, id) cursor.
+
+SEARCH_PAGE_SIZE = 10
+SEARCH_CACHE_DEPTH = int(os.environ.get('SEARCH_CACHE_DEPTH', 100))
+SEARCH_CACHE = TTLCache(max_size=int(os.environ.get('SEARCH_CACHE_SIZE', 2048)),
+                        ttl=float(os.environ.get('SEARCH_CACHE_TTL', 60)))
+
+
+def normalize_lemma(lemma: str) -> str:
+    return " ".join(lemma.split())
+
+
+def ranked_hits(lemma: str) -> list[dict]:
+    key = (normalize_lemma(lemma), dataset_version())
+    hits = SEARCH_CACHE.get(key)
+    if hits is None:
+        hits = neo4j_instance.get_entities_by_lemma(key[0], 0, 0, SEARCH_CACHE_DEPTH)
+        SEARCH_CACHE.put(key, hits)
+    return hits
+
+
+async def ranked_hits_async(lemma: str) -> list[dict]:
+    key = (normalize_lemma(lemma), dataset_version())
+    hits = SEARCH_CACHE.get(key)
+    if hits is None:
+        hits = await AsyncDatasetManager().get_entities_by_lemma(key[0], 0, 0, SEARCH_CACHE_DEPTH)
+        SEARCH_CACHE.put(key, hits)
+    return hits
+
+
+def encode_cursor(hit: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps([hit["rank"], hit["id"]]).encode()).decode()
+
+
+def decode_cursor(token: str) -> tuple[float, str]:
+    try:
+        rank, _id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return float(rank), str(_id)
+    except (ValueError, TypeError):
+        raise ValueError(f"{token} is not a valid cursor")
+
+
+def search_page(lemma: str, cursor: str | None = None, size: int = SEARCH_PAGE_SIZE) -> tuple[list[Entity], str | None]:
+    # returns the page of hits after the cursor, and the cursor of the next page (None on the last one)
+    after = decode_cursor(cursor) if cursor else None
+    hits = ranked_hits(lemma)
+
+    start = 0
+    if after is not None:
+        # the hits are sorted by (-rank, id)
+        start = bisect.bisect_right([(-h["rank"], h["id"]) for h in hits], (-after[0], after[1]))
+    page = hits[start:start + size]
+
+    if len(page) < size and len(hits) >= SEARCH_CACHE_DEPTH:
+        last = (page[-1]["rank"], page[-1]["id"]) if len(page) > 0 else after
+        page = page + neo4j_instance.get_entities_by_lemma(normalize_lemma(lemma), 0, 0, size - len(page), last)
+
+    return result_to_entity_list(page), encode_cursor(page[-1]) if len(page) == size else None
+
+
+def cached_page(hits: list[dict], page: int) -> list[dict] | None:
+    # the page sliced from the cached hits, None if it goes past them
+    start = page * SEARCH_PAGE_SIZE
+    if start + SEARCH_PAGE_SIZE <= len(hits) or len(hits) < SEARCH_CACHE_DEPTH:
+        return hits[start:start + SEARCH_PAGE_SIZE]
+    return None
 
 
 def search_by_lemma(lemma: str, page: int = 0, skip: int = 0) -> list[Entity]:
-    return result_to_entity_list(neo4j_instance.get_entities_by_lemma(lemma, page, skip))
+    if page < 0:
+        page = 0
+    found = cached_page(ranked_hits(lemma), page)
+    if found is None:
+        found = neo4j_instance.get_entities_by_lemma(normalize_lemma(lemma), page, skip)
+    return result_to_entity_list(found)
+
+
+async def search_by_lemma_async(lemma: str, page: int = 0, skip: int = 0) -> list[Entity]:
+    if page < 0:
+        page = 0
+    found = cached_page(await ranked_hits_async(lemma), page)
+    if found is None:
+        found = await AsyncDatasetManager().get_entities_by_lemma(normalize_lemma(lemma), page, skip)
+    return result_to_entity_list(found)
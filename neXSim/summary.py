@@ -1,33 +1,124 @@
-import time
+import os
+from typing import AsyncIterator, Iterator
 
-from neXSim.models import NeXSimResponse, Atom, Summary
+from neXSim.models import NeXSimResponse, Atom, Summary, trusted_atom
 from neXSim import DatasetManager
+from neXSim.async_neo4j_manager import AsyncDatasetManager
+from neXSim.tracing import span, stage_times
+from neXSim.utils import TTLCache, dataset_version
+
+# per-entity summaries, keyed by (entity, upper predicates, dataset version)
+SUMMARY_CACHE = TTLCache(max_size=int(os.environ.get('SUMMARY_CACHE_SIZE', 1024)),
+                         ttl=float(os.environ.get('SUMMARY_CACHE_TTL', 3600)))
+
+
+class SummaryBuilder:
+    # collects the summaries of a unit: the cached ones first, then the rows fetched for the missing entities
+
+    def __init__(self, entities: list[str], upper: bool) -> None:
+        self.entities = entities
+        self.upper = upper
+        self.version = dataset_version()
+        self.entries: dict[str, list[Atom]] = {}
+        self.tops: dict[str, set[str]] = {}
+        self.hits = 0
+        self.missing: list[str] = []
+        # the summaries to cache once a stream is read to the end (see commit)
+        self.streamed: list[tuple[str, tuple]] = []
+        for entity in entities:
+            if entity in self.entries:
+                continue
+            cached = SUMMARY_CACHE.get((entity, upper, self.version))
+            if cached is not None:
+                self.hits += 1
+                self.entries[entity] = list(cached[0])
+                self.tops[entity] = set(cached[1])
+            else:
+                self.missing.append(entity)
+                self.entries[entity] = []
+                self.tops[entity] = set()
+
+    def add_rows(self, neo4j_result, _entities: list[str] | None = None, _streamed: bool = False):
+        # _entities: the entities whose summaries are complete with these rows (default: all the missing ones);
+        # _streamed: they are cached by commit, at the end of the stream
+        for r in neo4j_result:
+            self.tops[r["for"]].add(r["target"])
+            self.tops[r["for"]].add(r["source"])
+            self.entries[r["for"]].append(trusted_atom(r["source"], r["target"], r["relation"]))
+        for entity in (self.missing if _entities is None else _entities):
+            entry = (tuple(self.entries[entity]), frozenset(self.tops[entity]))
+            if _streamed:
+                self.streamed.append((entity, entry))
+            else:
+                SUMMARY_CACHE.put((entity, self.upper, self.version), entry)
+
+    def commit(self):
+        # a stream broken midway (e.g. by rows out of order, see SummaryGroups) caches none of its summaries
+        for entity, entry in self.streamed:
+            SUMMARY_CACHE.put((entity, self.upper, self.version), entry)
+        self.streamed = []
+
+    def cached(self) -> list[str]:
+        missing = set(self.missing)
+        return [entity for entity in self.entries if entity not in missing]
+
+    def take(self, entity: str) -> Summary:
+        # hands over the summary of an entity and drops it from the builder
+        return Summary(entity=entity, summary=self.entries.pop(entity), tops=list(self.tops.pop(entity)))
+
+    def build(self, _input: NeXSimResponse):
+        for entity in self.entities:
+            _input.summaries.append(Summary(entity=entity,
+                                            summary=list(self.entries[entity]),
+                                            tops=list(self.tops[entity])))
+
+        ct = stage_times(_input)
+        ct["summary_cache_hits"] = self.hits
+        ct["summary_cache_misses"] = len(self.missing)
 
 
 def full_summary(_input: NeXSimResponse):
-    _start = time.perf_counter()
-    entities = _input.unit
-    _input.summaries = []
+    with span("summary", "stage", stage_times(_input)) as s:
+        _input.summaries = []
+        d: DatasetManager = DatasetManager()
+        builder = SummaryBuilder(_input.unit, d.upper)
+        if len(builder.missing) > 0:
+            builder.add_rows(d.get_full_summary(builder.missing))
+        builder.build(_input)
+        s.rows = sum(len(summary.summary) for summary in _input.summaries)
+
+
+async def full_summary_async(_input: NeXSimResponse):
+    with span("summary", "stage", stage_times(_input)) as s:
+        _input.summaries = []
+        d: AsyncDatasetManager = AsyncDatasetManager()
+        builder = SummaryBuilder(_input.unit, d.upper)
+        if len(builder.missing) > 0:
+            builder.add_rows(await d.get_full_summary(builder.missing))
+        builder.build(_input)
+        s.rows = sum(len(summary.summary) for summary in _input.summaries)
+
+
+# Streaming counterparts: one summary at a time, the cached ones first,
+# then each missing one as soon as it is fetched; they are cached once the whole stream has been read
+
+def stream_summary(_input: NeXSimResponse) -> Iterator[Summary]:
     d: DatasetManager = DatasetManager()
-    _summary_entries: dict[str, list[Atom]] = {}
-    _tops: dict[str, set[str]] = {}
-    neo4j_result = d.get_full_summary(entities)
-    for entity in entities:
-        _summary_entries[entity] = []
-        _tops[entity] = set()
-    for r in neo4j_result:
-        _tops[r["for"]].add(r["target"])
-        _tops[r["for"]].add(r["source"])
-        _summary_entries[r["for"]].append(Atom(source_id=r["source"],
-                                                  target_id=r["target"],
-                                                  predicate=r["relation"]))
-    for entity in entities:
-        _input.summaries.append(Summary(entity=entity,
-                                        summary=_summary_entries[entity],
-                                        tops=list(_tops[entity])))
-
-    if _input.computation_times is None:
-        _input.computation_times = {"summary": round(time.perf_counter() - _start, 5)}
-    else:
-        ct = _input.computation_times
-        ct["summary"] = round(time.perf_counter() - _start, 5)
+    builder = SummaryBuilder(_input.unit, d.upper)
+    for entity in builder.cached():
+        yield builder.take(entity)
+    for entity, rows in d.stream_full_summary(builder.missing):
+        builder.add_rows(rows, [entity], _streamed=True)
+        yield builder.take(entity)
+    builder.commit()
+
+
+async def stream_summary_async(_input: NeXSimResponse) -> AsyncIterator[Summary]:
+    d: AsyncDatasetManager = AsyncDatasetManager()
+    builder = SummaryBuilder(_input.unit, d.upper)
+    for entity in builder.cached():
+        yield builder.take(entity)
+    async for entity, rows in d.stream_full_summary(builder.missing):
+        builder.add_rows(rows, [entity], _streamed=True)
+        yield builder.take(entity)
+    builder.commit()
@@ -0,0 +1,204 @@
+import bisect
+import json
+import mmap
+import os
+import sys
+import time
+from array import array
+from typing import Iterable
+
+from neXSim.utils import is_valid_babelnet_id, pack_babelnet_id, unpack_babelnet_id
+
+# On-disk snapshot of the taxonomic edges ("subclass_of", "instance_of", "part_of") of the graph.
+# BabelNet ids are packed into integers, and each relation is stored in CSR form:
+# for the node of index i, its successors are targets[offsets[i]:offsets[i+1]] (node indexes).
+#
+# File layout: MAGIC, header length (8 bytes), JSON header, then 8-byte aligned int64 arrays.
+# The file is memory-mapped read-only, so every gunicorn worker shares the same pages through the page cache.
+
+MAGIC = b"NXSTAX01"
+SNAPSHOT_RELATIONS = ["subclass_of", "instance_of", "part_of"]
+
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % 8)
+
+
+def build_snapshot(path: str, edges: dict[str, Iterable[tuple[str, str]]], version: str = "") -> dict:
+    """
+    Writes the snapshot of the given edges (relation -> iterable of (source, target) ids) to path.
+    Edges involving non-BabelNet ids are skipped. Returns the header of the written snapshot.
+    """
+    sources: dict[str, array] = {}
+    targets: dict[str, array] = {}
+    nodes: set[int] = set()
+    skipped = 0
+
+    for relation in SNAPSHOT_RELATIONS:
+        sources[relation] = array('q')
+        targets[relation] = array('q')
+        for source, target in edges.get(relation, []):
+            if not is_valid_babelnet_id(source) or not is_valid_babelnet_id(target):
+                skipped += 1
+                continue
+            s, t = pack_babelnet_id(source), pack_babelnet_id(target)
+            sources[relation].append(s)
+            targets[relation].append(t)
+            nodes.add(s)
+            nodes.add(t)
+
+    ids = array('q', sorted(nodes))
+    index: dict[int, int] = {packed: i for i, packed in enumerate(ids)}
+    del nodes
+
+    arrays: dict[str, array] = {"ids": ids}
+    edge_counts: dict[str, int] = {}
+    for relation in SNAPSHOT_RELATIONS:
+        # counting sort of the edges by source index
+        offsets = array('q', [0]) * (len(ids) + 1)
+        for s in sources[relation]:
+            offsets[index[s] + 1] += 1
+        for i in range(len(ids)):
+            offsets[i + 1] += offsets[i]
+        fill = array('q', offsets)
+        csr_targets = array('q', [0]) * len(targets[relation])
+        for s, t in zip(sources[relation], targets[relation]):
+            i = index[s]
+            csr_targets[fill[i]] = index[t]
+            fill[i] += 1
+        # sorted, duplicate-free adjacency lists
+        deduplicated = array('q')
+        new_offsets = array('q', [0]) * (len(ids) + 1)
+        for i in range(len(ids)):
+            successors = sorted(set(csr_targets[offsets[i]:offsets[i + 1]]))
+            deduplicated.extend(successors)
+            new_offsets[i + 1] = len(deduplicated)
+        arrays[f"{relation}.offsets"] = new_offsets
+        arrays[f"{relation}.targets"] = deduplicated
+        edge_counts[relation] = len(deduplicated)
+        sources[relation] = targets[relation] = None
+
+    sections: dict[str, list[int]] = {}
+    position = 0
+    for name, values in arrays.items():
+        sections[name] = [position, len(values)]
+        position += len(values) * values.itemsize
+
+    header = {
+        "version": version,
+        "created": time.time(),
+        "byteorder": sys.byteorder,
+        "nodes": len(ids),
+        "edges": edge_counts,
+        "skipped": skipped,
+        "sections": sections
+    }
+    raw_header = json.dumps(header).encode("utf-8")
+    raw_header += _padding(len(raw_header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(raw_header).to_bytes(8, "little"))
+        f.write(raw_header)
+        for values in arrays.values():
+            values.tofile(f)
+    os.replace(tmp_path, path)
+
+    return header
+
+
+class TaxonomySnapshot:
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:8] != MAGIC:
+            raise Exception(f"{path} is not a taxonomy snapshot")
+        header_length = int.from_bytes(self._mmap[8:16], "little")
+        self.header: dict = json.loads(self._mmap[16:16 + header_length].rstrip(b"\0"))
+        if self.header["byteorder"] != sys.byteorder:
+            raise Exception(f"Taxonomy snapshot {path} was built on a {self.header['byteorder']}-endian machine")
+
+        data_start = 16 + header_length
+        view = memoryview(self._mmap)
+        self._sections: dict[str, memoryview] = {}
+        for name, (offset, length) in self.header["sections"].items():
+            self._sections[name] = view[data_start + offset:data_start + offset + 8 * length].cast('q')
+
+        self.ids = self._sections["ids"]
+        self.version: str = self.header["version"]
+
+    def index_of(self, _id: str) -> int | None:
+        if not is_valid_babelnet_id(_id):
+            return None
+        packed = pack_babelnet_id(_id)
+        i = bisect.bisect_left(self.ids, packed)
+        if i < len(self.ids) and self.ids[i] == packed:
+            return i
+        return None
+
+    def successors(self, node: int, relation: str) -> memoryview:
+        offsets = self._sections[f"{relation}.offsets"]
+        return self._sections[f"{relation}.targets"][offsets[node]:offsets[node + 1]]
+
+    def reachable(self, _entities: list[str], relation: str) -> set[int]:
+        # node indexes reachable from the given entities (included) following "relation" edges
+        reached: set[int] = set()
+        stack: list[int] = []
+        for _id in _entities:
+            i = self.index_of(_id)
+            if i is not None and i not in reached:
+                reached.add(i)
+                stack.append(i)
+        while stack:
+            for successor in self.successors(stack.pop(), relation):
+                if successor not in reached:
+                    reached.add(successor)
+                    stack.append(successor)
+        return reached
+
+    def ancestors(self, _entity: str, relation: str) -> set[str]:
+        start = self.index_of(_entity)
+        return {unpack_babelnet_id(self.ids[i]) for i in self.reachable([_entity], relation) if i != start}
+
+    def subgraph(self, _entities: list[str], relation: str, _name: str | None = None) -> list[dict]:
+        # same rows as the apoc.path.subgraphAll extraction of the neo4j manager
+        if _name is None:
+            _name = relation
+        rows = []
+        for node in self.reachable(_entities, relation):
+            source = unpack_babelnet_id(self.ids[node])
+            for successor in self.successors(node, relation):
+                rows.append({"source": source,
+                             "relation": _name,
+                             "target": unpack_babelnet_id(self.ids[successor])})
+        return rows
+
+
+def load_snapshot(path: str | None) -> TaxonomySnapshot | None:
+    if path is None or path == "":
+        return None
+    try:
+        return TaxonomySnapshot(path)
+    except Exception as e:
+        print(f"Taxonomy snapshot {path} could not be loaded: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    # python -m neXSim.taxonomy <output path> [version]
+    if len(sys.argv) < 2:
+        print("Usage: python -m neXSim.taxonomy <output path> [version]")
+        sys.exit(1)
+
+    from neXSim import neo4j_instance
+
+    _start = time.perf_counter()
+    written = build_snapshot(sys.argv[1],
+                             {relation: neo4j_instance.get_edges(relation) for relation in SNAPSHOT_RELATIONS},
+                             version=sys.argv[2] if len(sys.argv) > 2 else "")
+    print(f"Snapshot with {written['nodes']} nodes and {written['edges']} edges "
+          f"({written['skipped']} skipped) written in {round(time.perf_counter() - _start, 2)} s")
@@ -0,0 +1,364 @@
+import bisect
+import contextvars
+import fcntl
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from neXSim.utils import SingletonMeta
+
+# Instrumentation of the stages (summary, characterization, lca steps, kernel), of the dataset queries
+# and of the clingo solves. Each span is observed in process-wide histograms (latency, rows), exposed at /metrics
+# in the Prometheus text format with the request latencies and response sizes; the computation_times of a response
+# are the durations of its spans (Span.elapsed), so that both are the same measurements.
+# With TRACE_LOG=True, every span is also logged as a JSON line on the "neXSim.trace" logger.
+# Spans of worker processes (e.g. the clingo solves on the solve pool) are collected and replayed in the parent.
+# With METRICS_DIR, the gunicorn workers write a snapshot of their metrics in the directory every
+# METRICS_EXPORT_INTERVAL seconds (and at each scrape), and /metrics sums the snapshots of all the workers:
+# a scrape answered by any worker covers the whole server. An exiting worker folds its snapshot into the
+# archive of the directory, so that the counters never go back.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000, 10000000)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+TRACE_LOG = os.environ.get('TRACE_LOG', 'False').lower() == 'true'
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_EXPORT_INTERVAL = float(os.environ.get('METRICS_EXPORT_INTERVAL', 10))
+
+trace_logger = logging.getLogger("neXSim.trace")
+
+
+class Histogram:
+
+    def __init__(self, buckets: tuple) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: tuple[tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{escape_label(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def format_value(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # name -> (help, labels -> Histogram)
+        self.histograms: dict[str, tuple[str, dict[tuple, Histogram]]] = {}
+        self.counters: dict[str, tuple[str, dict[tuple, float]]] = {}
+
+    def observe(self, name: str, documentation: str, buckets: tuple, labels: dict[str, str], value: float):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, (documentation, {}))[1]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, documentation: str, labels: dict[str, str], value: float = 1):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, (documentation, {}))[1]
+            series[key] = series.get(key, 0) + value
+
+    def clear(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def snapshot(self) -> dict:
+        # JSON-serializable copy of the series
+        with self._lock:
+            return {"histograms": {name: [documentation, [[labels, h.buckets, list(h.counts), h.sum, h.count]
+                                                          for labels, h in series.items()]]
+                                   for name, (documentation, series) in self.histograms.items()},
+                    "counters": {name: [documentation, [[labels, value] for labels, value in series.items()]]
+                                 for name, (documentation, series) in self.counters.items()}}
+
+    def merge(self, snapshot: dict):
+        # adds the series of a snapshot (e.g. of another process) to these ones
+        with self._lock:
+            for name, (documentation, series) in snapshot["histograms"].items():
+                target = self.histograms.setdefault(name, (documentation, {}))[1]
+                for labels, buckets, counts, _sum, count in series:
+                    key = tuple(map(tuple, labels))
+                    histogram = target.get(key)
+                    if histogram is None:
+                        histogram = target[key] = Histogram(tuple(buckets))
+                    histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                    histogram.sum += _sum
+                    histogram.count += count
+            for name, (documentation, series) in snapshot["counters"].items():
+                target = self.counters.setdefault(name, (documentation, {}))[1]
+                for labels, value in series:
+                    key = tuple(map(tuple, labels))
+                    target[key] = target.get(key, 0) + value
+
+    def render(self, gauges: dict[str, float] | None = None) -> str:
+        lines: list[str] = []
+        with self._lock:
+            for name, (documentation, series) in sorted(self.histograms.items()):
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(h.buckets + (math.inf,), h.counts):
+                        cumulative += count
+                        le = 'le="' + format_value(float(bound)) + '"'
+                        lines.append(f"{name}_bucket{format_labels(labels, le)} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {format_value(h.sum)}")
+                    lines.append(f"{name}_count{format_labels(labels)} {h.count}")
+            for name, (documentation, series) in sorted(self.counters.items()):
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsRegistry(Metrics, metaclass=SingletonMeta):
+    # the metrics observed by this process
+    pass
+
+
+METRICS = MetricsRegistry()
+
+# spans recorded in the current context, when collected (see collect)
+_collected: contextvars.ContextVar[list | None] = contextvars.ContextVar("neXSim_spans", default=None)
+
+
+class Span:
+    __slots__ = ("name", "kind", "start", "duration", "rows", "error")
+
+    def __init__(self, name: str, kind: str) -> None:
+        self.name = name
+        self.kind = kind
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.rows: int | None = None
+        self.error = False
+
+    @property
+    def elapsed(self) -> float:
+        # the value reported in computation_times
+        return round(self.duration, 5)
+
+    def record(self) -> tuple:
+        return self.name, self.kind, self.duration, self.rows, self.error
+
+
+def observe_span(name: str, kind: str, duration: float, rows: int | None = None, error: bool = False):
+    labels = {"kind": kind, "name": name}
+    METRICS.observe("nexsim_span_seconds", "Duration of the spans", LATENCY_BUCKETS, labels, duration)
+    if rows is not None:
+        METRICS.observe("nexsim_span_rows", "Rows (atoms, records) produced by the spans", COUNT_BUCKETS,
+                        labels, rows)
+    if error:
+        METRICS.inc("nexsim_span_errors_total", "Spans ended by an exception", labels)
+    if TRACE_LOG:
+        trace_logger.info(json.dumps({"kind": kind, "name": name, "seconds": round(duration, 6),
+                                      "rows": rows, "error": error}))
+
+
+@contextmanager
+def span(name: str, kind: str = "stage", times: dict[str, float] | None = None) -> Iterator[Span]:
+    # times: the computation_times the duration is written into, under the name of the span
+    s = Span(name, kind)
+    try:
+        yield s
+    except BaseException:
+        s.error = True
+        raise
+    finally:
+        s.duration = time.perf_counter() - s.start
+        observe_span(*s.record())
+        collected = _collected.get()
+        if collected is not None:
+            collected.append(s.record())
+        if times is not None:
+            times[name] = s.elapsed
+
+
+def stage_times(_input) -> dict[str, float]:
+    # the computation_times of a response, created when missing
+    if _input.computation_times is None:
+        _input.computation_times = {}
+    return _input.computation_times
+
+
+@contextmanager
+def collect() -> Iterator[list]:
+    # the spans recorded inside the block are also appended to the yielded list (e.g. to be sent to the parent)
+    records: list = []
+    token = _collected.set(records)
+    try:
+        yield records
+    finally:
+        _collected.reset(token)
+
+
+def replay(records: list):
+    # observes the spans collected in another process
+    for record in records:
+        observe_span(*record)
+
+
+def postgres_metrics() -> tuple[dict, dict[str, float]]:
+    # the snapshot of the cumulative Postgres metrics of this process (counters), and its gauges
+    from neXSim import postgres_instance
+    from neXSim.postgresQL_manager import CUMULATIVE_METRICS
+    counters: dict[str, list] = {}
+    gauges: dict[str, float] = {}
+    for k, v in postgres_instance.get_metrics().items():
+        if not isinstance(v, (int, float)):
+            continue
+        if k in CUMULATIVE_METRICS:
+            counters[f"nexsim_postgres_{k}_total"] = [f"Postgres client metric {k}", [[[], v]]]
+        else:
+            gauges[f"nexsim_postgres_{k}"] = v
+    return {"histograms": {}, "counters": counters}, gauges
+
+
+def process_snapshot() -> dict:
+    snapshot = METRICS.snapshot()
+    cumulative, gauges = postgres_metrics()
+    snapshot["counters"].update(cumulative["counters"])
+    snapshot["gauges"] = gauges
+    return snapshot
+
+
+def merge_gauges(gauges: dict[str, float], other: dict[str, float]):
+    # the maxima are the maxima of the workers, the others (the pool states) their sums
+    for name, value in other.items():
+        if name not in gauges:
+            gauges[name] = value
+        elif name.startswith("nexsim_postgres_max_"):
+            gauges[name] = max(gauges[name], value)
+        else:
+            gauges[name] += value
+
+
+_export_lock = threading.Lock()
+_retired = threading.Event()
+
+
+def _write_json(path: str, data: dict):
+    # atomically, so that a scrape never reads a partial snapshot
+    fd, tmp = tempfile.mkstemp(dir=METRICS_DIR, prefix=".snapshot")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _snapshot_path() -> str:
+    return os.path.join(METRICS_DIR, f"worker-{os.getpid()}.json")
+
+
+def _archive_path() -> str:
+    return os.path.join(METRICS_DIR, "archive.json")
+
+
+def export_metrics():
+    # writes the snapshot of this process in METRICS_DIR
+    with _export_lock:
+        if not _retired.is_set():
+            _write_json(_snapshot_path(), process_snapshot())
+
+
+def start_metrics_export():
+    # in each worker: the snapshot is refreshed every METRICS_EXPORT_INTERVAL seconds until retire_metrics
+    if METRICS_DIR is None:
+        return
+    # the series inherited from the master (e.g. the spans of the preload) would be counted by every worker
+    METRICS.clear()
+
+    def loop():
+        while not _retired.wait(METRICS_EXPORT_INTERVAL):
+            export_metrics()
+
+    export_metrics()
+    threading.Thread(target=loop, name="neXSim-metrics", daemon=True).start()
+
+
+def retire_metrics():
+    # at the exit of a worker: its counters and histograms are folded into the archive (its gauges are dropped)
+    if METRICS_DIR is None:
+        return
+    with _export_lock:
+        _retired.set()
+        with open(os.path.join(METRICS_DIR, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive = Metrics()
+            if os.path.exists(_archive_path()):
+                with open(_archive_path()) as f:
+                    archive.merge(json.load(f))
+            archive.merge(process_snapshot())
+            _write_json(_archive_path(), archive.snapshot())
+            if os.path.exists(_snapshot_path()):
+                os.unlink(_snapshot_path())
+
+
+def clear_metrics_dir():
+    # in the master, before the first fork: the snapshots of a previous run are discarded
+    if METRICS_DIR is None:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    for name in os.listdir(METRICS_DIR):
+        if name.endswith(".json"):
+            os.unlink(os.path.join(METRICS_DIR, name))
+
+
+def render_metrics() -> str:
+    if METRICS_DIR is None:
+        snapshots = [process_snapshot()]
+    else:
+        export_metrics()
+        # under the lock of retire_metrics, so that an exiting worker is never counted twice (or not at all)
+        with open(os.path.join(METRICS_DIR, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            snapshots = []
+            for name in sorted(os.listdir(METRICS_DIR)):
+                if name.endswith(".json"):
+                    with open(os.path.join(METRICS_DIR, name)) as f:
+                        snapshots.append(json.load(f))
+    merged = Metrics()
+    gauges: dict[str, float] = {}
+    for snapshot in snapshots:
+        merged.merge(snapshot)
+        merge_gauges(gauges, snapshot.get("gauges", {}))
+    return merged.render(gauges)
@@ -7,7 +7,16 @@ class SingletonMeta(type):
             cls._instances[cls] = instance
         return cls._instances[cls]
 
+import itertools
+import os
 import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Hashable, Iterator
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
 
 BABELNET_PATTERN = re.compile(r"^bn:\d{8}[nvar]$")
 
@@ -18,6 +27,18 @@ def is_valid_babelnet_id(candidate: str) -> bool:
     return bool(BABELNET_PATTERN.match(candidate))
 
 
+POS_TAGS = "nvar"
+
+
+def pack_babelnet_id(_id: str) -> int:
+    # bn:<8-digit number><pos> -> number * 4 + pos
+    return int(_id[3:11]) * 4 + POS_TAGS.index(_id[11])
+
+
+def unpack_babelnet_id(packed: int) -> str:
+    return f"bn:{packed // 4:08d}{POS_TAGS[packed % 4]}"
+
+
 
 def pred_identifier_to_displayed_name(pred_identifier: str) -> str:
     return pred_identifier.replace("_", " ").title()
@@ -28,3 +49,114 @@ def pred_identifier_to_ontological_name(pred_identifier: str) -> str:
 
 def pred_identifier_to_clingo_relation(pred_identifier: str) -> str:
     return pred_identifier.replace(" ", "_").lower()
+
+
+def chunked(items: list, size: int):
+    if size <= 0:
+        size = len(items) or 1
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def dataset_version() -> str:
+    # part of the cache keys: a new dataset does not hit the entries of the previous one
+    return os.environ.get('DATASET_VERSION', '')
+
+
+NDJSON = 'application/x-ndjson'
+
+
+def wants_ndjson(accept: str | None) -> bool:
+    # the content negotiation of the streamed responses, the same in the Flask and ASGI apps:
+    # NDJSON only when the Accept header prefers it to JSON
+    return parse_accept_header(accept, MIMEAccept).best_match(['application/json', NDJSON]) == NDJSON
+
+
+def ndjson_lines(models):
+    # one JSON document per line
+    for model in models:
+        yield model.model_dump_json() + "\n"
+
+
+# A streamed response is sent once its first item is computed: the errors raised before (e.g. DatasetUnavailable)
+# still get their status code, instead of breaking a response already started.
+
+def primed(items: Iterator) -> Iterator:
+    items = iter(items)
+    try:
+        first = next(items)
+    except StopIteration:
+        return iter(())
+    return itertools.chain([first], items)
+
+
+async def primed_async(items: AsyncIterator) -> AsyncIterator:
+    done = object()
+    first = await anext(items, done)
+
+    async def chained():
+        if first is done:
+            return
+        yield first
+        async for item in items:
+            yield item
+
+    return chained()
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe LRU cache whose entries expire ttl seconds after insertion.
+    A max_size of 0 disables the cache. With a weigher, the total weight of the entries
+    (e.g. their estimated size in bytes) is also kept under max_weight.
+    """
+
+    def __init__(self, max_size: int, ttl: float, max_weight: int = 0,
+                 weigher: Callable[[Any], int] | None = None) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl > 0 and time.monotonic() - entry[0] > self.ttl):
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        weight = self.weigher(value) if self.weigher is not None else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic(), value, weight)
+            self.weight += weight
+            while len(self._entries) > self.max_size or (0 < self.max_weight < self.weight):
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Hashable) -> None:
+        self.weight -= self._entries.pop(key)[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._entries), "weight": self.weight, "hits": self.hits, "misses": self.misses}
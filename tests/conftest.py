@@ -0,0 +1,27 @@
+import pytest
+
+from benchmarks.synthetic import SyntheticGraph, TaxonomyParams
+from neXSim.async_neo4j_manager import AsyncDatasetManager
+from neXSim.memory_graph import MemoryGraph
+from neXSim.neo4j_manager import DatasetManager
+
+# The behavior tests run on the in-memory backend, loaded with a seeded synthetic taxonomy.
+
+
+@pytest.fixture(scope="session")
+def synthetic() -> SyntheticGraph:
+    return SyntheticGraph(TaxonomyParams(seed=7, depth=4, branching=3, multi_inheritance=0.2, n_entities=40))
+
+
+@pytest.fixture
+def memory_graph(synthetic) -> MemoryGraph:
+    # installed in both dataset managers, with empty caches
+    from neXSim.search import ENTITY_CACHE, SEARCH_CACHE
+    from neXSim.summary import SUMMARY_CACHE
+    dump = synthetic.dump()
+    graph = MemoryGraph(dump["synsets"], (tuple(edge) for edge in dump["edges"]))
+    DatasetManager().use(graph)
+    AsyncDatasetManager().use(graph)
+    for cache in [ENTITY_CACHE, SEARCH_CACHE, SUMMARY_CACHE]:
+        cache.clear()
+    return graph
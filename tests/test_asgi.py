@@ -0,0 +1,33 @@
+from starlette.testclient import TestClient
+
+from neXSim.asgi import app
+from neXSim.search import ENTITY_CACHE, SEARCH_CACHE, SEARCH_CACHE_DEPTH, SEARCH_PAGE_SIZE, search_by_lemma
+
+# The async endpoints, on the in-memory backend (the lifespan is not run: the fixture installs the backend).
+
+
+def test_entities_go_through_the_entity_cache(memory_graph, synthetic, monkeypatch):
+    unit = synthetic.unit(3, seed=4)
+    client = TestClient(app)
+    first = client.get(f"/api/entities/{','.join(unit)}")
+    assert first.status_code == 200
+    assert len(ENTITY_CACHE) == len(set(unit))
+
+    def unreachable(_ids):
+        raise AssertionError("the cached entities are fetched again")
+
+    monkeypatch.setattr(memory_graph, "get_entities", unreachable)
+    second = client.get(f"/api/entities/{','.join(unit)}")
+    assert second.status_code == 200
+    assert sorted(e["id"] for e in second.json()["entities"]) == sorted(e["id"] for e in first.json()["entities"])
+
+
+def test_search_goes_through_the_search_cache(memory_graph):
+    client = TestClient(app)
+    for page in [0, 1, SEARCH_CACHE_DEPTH // SEARCH_PAGE_SIZE + 2]:
+        response = client.get(f"/api/search/sense/{page}")
+        assert response.status_code == 200
+        assert [e["id"] for e in response.json()["entities"]] == \
+               [e.id for e in search_by_lemma("sense", page, SEARCH_PAGE_SIZE * page)]
+    # the pages within the cached hits, and past them, all share one cached query
+    assert len(SEARCH_CACHE) == 1
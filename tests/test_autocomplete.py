@@ -0,0 +1,58 @@
+from neXSim import app, router
+from neXSim.autocomplete import PRECOMPUTED_TOP, PrefixIndex, normalize_term, read_snapshot, write_snapshot
+
+# The prefix index returns the entities by rank (undirected_edges, then id) among the ones with a main sense
+# or a synonym starting with the prefix, whether the prefix is precomputed or looked up.
+
+ENTRIES = [("bn:00000001n", 5, "Apple", ["apple tree"]),
+           ("bn:00000002n", 9, "Application", []),
+           ("bn:00000003n", 9, "apricot", ["Apple_Apricot"]),
+           ("bn:00000004n", 1, "Banana", ["apple banana", "app"]),
+           ("bn:00000005n", 7, "Cherry", []),
+           ("not an id", 100, "Apple", [])]
+
+
+def expected(entries, prefix: str, limit: int) -> list[str]:
+    key = normalize_term(prefix)
+    if key == "":
+        return []
+    matches = [(-edges, _id) for _id, edges, main_sense, synonyms in entries
+               if _id.startswith("bn:") and any(normalize_term(t).startswith(key) for t in [main_sense, *synonyms])]
+    return [_id for _, _id in sorted(matches)[:limit]]
+
+
+def test_prefix_index_ranks_the_matches():
+    index = PrefixIndex(ENTRIES)
+    assert len(index) == 5
+    for prefix in ["a", "ap", "app", "apple", "Apple  t", "apple_b", "apr", "b", "ch", "z", ""]:
+        for limit in [1, 2, 10]:
+            assert index.complete_ids(prefix, limit) == expected(ENTRIES, prefix, limit), (prefix, limit)
+
+
+def test_precomputed_prefixes_match_the_lookup(memory_graph):
+    entries = list(memory_graph.get_lexicon())
+    index = PrefixIndex(entries)
+    for prefix in ["s", "se", "sen", "sense_1", "sense_12"]:
+        assert index.complete_ids(prefix, PRECOMPUTED_TOP) == expected(entries, prefix, PRECOMPUTED_TOP), prefix
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "lexicon.tsv")
+    assert write_snapshot(path, ENTRIES) == len(ENTRIES)
+    assert list(read_snapshot(path)) == ENTRIES
+
+
+def test_autocomplete_endpoint(memory_graph, monkeypatch):
+    index = PrefixIndex([*memory_graph.get_lexicon(), ("bn:99999999n", 10 ** 6, "sense_stale", [])])
+    monkeypatch.setattr(router, "autocomplete_index", lambda: index)
+    client = app.test_client()
+
+    response = client.get("/api/autocomplete/sense_1?limit=5")
+    assert response.status_code == 200
+    # in rank order, without the ids that are not in the dataset
+    ids = index.complete_ids("sense_1", 5)
+    assert [e["id"] for e in response.json["entities"]] == ids
+    stale = client.get("/api/autocomplete/sense?limit=5").json["entities"]
+    assert index.complete_ids("sense", 1) == ["bn:99999999n"]
+    assert [e["id"] for e in stale] == index.complete_ids("sense", 5)[1:]
+    assert client.get("/api/autocomplete/sense?limit=51").status_code == 400
@@ -0,0 +1,44 @@
+from neXSim import app
+from neXSim.batch import batch_oneshot
+from neXSim.models import NeXSimResponse
+from neXSim.pipeline import nexsim_stages, run_pipeline
+
+# The units of a batch share one fetch of the summaries and of the direct rows of their distinct entities,
+# and get the same results of a oneshot request each.
+
+
+def counting(monkeypatch, backend, name: str) -> list[list[str]]:
+    calls: list[list[str]] = []
+    fetch = getattr(backend, name)
+
+    def counted(_entities, *args, **kwargs):
+        calls.append(list(_entities))
+        return fetch(_entities, *args, **kwargs)
+
+    monkeypatch.setattr(backend, name, counted)
+    return calls
+
+
+def test_batch_fetches_the_distinct_entities_once(memory_graph, synthetic, monkeypatch):
+    first, second = synthetic.unit(3, seed=8), synthetic.unit(3, seed=9)
+    units = [first, second, first[:2] + second[:1]]
+    summaries = counting(monkeypatch, memory_graph, "get_full_summary")
+    instances = counting(monkeypatch, memory_graph, "get_direct_instances")
+
+    batch = batch_oneshot(units, engine="native")
+    distinct = list(dict.fromkeys(first + second))
+    assert summaries == [distinct] and instances == [distinct]
+    assert batch.computation_times["entities"] == len(distinct)
+
+    for index, unit in enumerate(units):
+        oneshot = NeXSimResponse(unit=unit)
+        run_pipeline(oneshot, nexsim_stages(engine="native"))
+        result = batch.results[index]
+        assert result.unit == unit and not result.incomplete
+        for field in ["characterization", "lca", "kernel_explanation"]:
+            assert sorted(map(str, getattr(result, field))) == sorted(map(str, getattr(oneshot, field))), field
+
+
+def test_batch_rejects_empty_units(memory_graph, synthetic):
+    response = app.test_client().post("/api/batch/oneshot", json={"units": [synthetic.unit(2, seed=1), []]})
+    assert response.status_code == 400
@@ -0,0 +1,74 @@
+import random
+from collections import Counter
+
+import pytest
+
+from benchmarks.atoms_bench import pydantic_characterization, random_unit
+from neXSim import characterization
+from neXSim.characterization import compute_characterization, to_relation_map, to_relation_masks, PredicateInterner
+from neXSim.models import Atom, Variable
+
+# The characterization on the compact atoms against the pairwise fold on pydantic Atoms
+# (compute_pairwise_characterization), on seeded synthetic units.
+
+
+def canonical(atoms: list[Atom]) -> Counter:
+    # the bound variables are renamed after the set of their predicates (distinct for distinct variables)
+    predicates: dict[Variable, frozenset[str]] = {}
+    for atom in atoms:
+        if isinstance(atom.target_id, Variable) and not atom.target_id.is_free:
+            predicates[atom.target_id] = predicates.get(atom.target_id, frozenset()) | {atom.predicate}
+
+    def term(t):
+        if isinstance(t, Variable):
+            return ("X",) if t.is_free else ("Y", predicates[t])
+        return t
+
+    return Counter((term(a.source_id), a.predicate, term(a.target_id)) for a in atoms)
+
+
+@pytest.mark.parametrize("seed, unit_size, n_atoms, n_predicates",
+                         [(1, 1, 50, 4), (2, 2, 200, 6), (3, 5, 300, 8), (4, 9, 100, 3)])
+def test_compact_characterization_matches_the_pairwise_fold(seed, unit_size, n_atoms, n_predicates):
+    unit = random_unit(random.Random(seed), unit_size, n_atoms, n_predicates)
+    assert canonical(compute_characterization(unit)) == canonical(pydantic_characterization(unit))
+
+
+def test_characterization_of_a_synthetic_taxonomy(synthetic):
+    for seed in range(5):
+        unit = synthetic.summaries(synthetic.unit(4, seed=seed))
+        assert canonical(compute_characterization(unit)) == canonical(pydantic_characterization(unit))
+
+
+def test_relation_map_keeps_every_predicate_of_a_variable():
+    x = Variable(is_free=True)
+    y = Variable(is_free=False, nominal=3)
+    atoms = [Atom(source_id=x, target_id=y, predicate="is_a"),
+             Atom(source_id=x, target_id=y, predicate="part_of"),
+             Atom(source_id=x, target_id=y, predicate="color"),
+             Atom(source_id=x, target_id="bn:00000001n", predicate="is_a")]
+    relations = to_relation_map(atoms, {"is_a", "part_of"})
+    assert relations == {"Y_3": {"is_a", "part_of"}, "bn:00000001n": {"is_a"}}
+
+    interner = PredicateInterner()
+    masks = to_relation_masks(atoms, {"is_a", "part_of"}, interner)
+    assert {key: interner.to_set(mask) for key, mask in masks.items()} == relations
+
+
+@pytest.fixture
+def characterization_processes(monkeypatch):
+    # the tree reduction on a pool of 2 processes, from 2 summaries on
+    monkeypatch.setattr(characterization, "CHARACTERIZATION_PROCESSES", 2)
+    monkeypatch.setattr(characterization, "CHARACTERIZATION_TREE_MIN", 2)
+    monkeypatch.setattr(characterization, "_characterization_pool", None)
+    yield
+    if characterization._characterization_pool is not None:
+        characterization._characterization_pool.shutdown()
+
+
+@pytest.mark.parametrize("seed, unit_size, n_atoms, n_predicates", [(5, 2, 200, 6), (6, 7, 300, 8), (7, 12, 80, 3)])
+def test_tree_characterization_matches_the_fold(characterization_processes, seed, unit_size, n_atoms, n_predicates):
+    unit = random_unit(random.Random(seed), unit_size, n_atoms, n_predicates)
+    tree = compute_characterization(unit)
+    assert characterization._characterization_pool is not None
+    assert canonical(tree) == canonical(pydantic_characterization(unit))
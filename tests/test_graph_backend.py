@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from neXSim.async_neo4j_manager import AsyncDatasetManager, AsyncNeo4jBackend
+from neXSim.graph_backend import GraphBackend, DatasetUnavailable
+from neXSim.neo4j_manager import DatasetManager
+
+# The async manager serves the rows of the synchronous backend; an unreachable Neo4j is DatasetUnavailable.
+
+
+def test_incomplete_backend_cannot_be_built():
+    class Partial(GraphBackend):
+        def get_entities(self, _ids):
+            return []
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_async_manager_serves_the_synchronous_backend(memory_graph, synthetic):
+    unit = synthetic.unit(3, seed=1)
+    sync, manager = DatasetManager(), AsyncDatasetManager()
+
+    async def fetch():
+        streamed = [summary async for summary in manager.stream_full_summary(unit)]
+        return (await manager.get_entities(unit), await manager.get_full_summary(unit),
+                await manager.get_direct_instances(unit), streamed)
+
+    entities, summary, direct_instances, streamed = asyncio.run(fetch())
+    assert entities == sync.get_entities(unit)
+    assert summary == sync.get_full_summary(unit)
+    assert direct_instances == sync.get_direct_instances(unit)
+    assert streamed == list(sync.stream_full_summary(unit))
+
+
+def test_unconfigured_neo4j_is_unavailable(monkeypatch):
+    monkeypatch.delenv("NEO4J_DB_URI", raising=False)
+    backend = AsyncNeo4jBackend(upper=False)
+
+    async def query():
+        await backend.open()
+        return await backend.get_entities(["bn:00000001n"])
+
+    with pytest.raises(DatasetUnavailable):
+        asyncio.run(query())
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from benchmarks.clingo_text import execute_clingo_lca, inject_facts
+from benchmarks.synthetic import SyntheticGraph, TaxonomyParams
+from neXSim.lca import (execute_clingo_session, execute_native_lca, hypernym_successors, meronym_successors,
+                        to_adjacency, HYPERNYM_TRANSITIVE_CLOSURE, MERONYM_TRANSITIVE_CLOSURE, LCA_PROGRAM)
+
+# The native engine must return the "leastCommon" atoms of LCA_PROGRAM: it is compared with both clingo engines
+# on seeded synthetic taxonomies (with multiple inheritance and part_of edges), on units of 1 to 5 entities.
+
+GRAPHS = [TaxonomyParams(seed=seed, depth=5, branching=3, multi_inheritance=multi, n_entities=60, other_atoms=0)
+          for seed, multi in [(0, 0.0), (1, 0.2), (2, 0.5)]]
+
+
+def targets(atoms) -> set[tuple[str, str]]:
+    return {(str(atom.target_id), atom.predicate) for atom in atoms}
+
+
+def units(graph: SyntheticGraph, seed: int) -> list[list[str]]:
+    rnd = random.Random(seed)
+    return [sorted(rnd.sample(graph.entities, size)) for size in [1, 2, 2, 3, 3, 4, 5] for _ in range(3)]
+
+
+@pytest.mark.parametrize("params", GRAPHS, ids=lambda p: f"seed{p.seed}")
+def test_native_lca_matches_clingo(params):
+    graph = SyntheticGraph(params)
+    for unit in units(graph, params.seed):
+        hypernyms, meronyms = graph.hypernym_atoms(unit), graph.meronym_atoms(unit)
+        branches = [(hypernyms, "is_a", hypernym_successors, HYPERNYM_TRANSITIVE_CLOSURE),
+                    (meronyms, "part_of", meronym_successors, MERONYM_TRANSITIVE_CLOSURE)]
+        for relations, relation, successors, closure in branches:
+            native = execute_native_lca(unit, successors(to_adjacency(relations)), relation)
+            program = inject_facts(unit, relations) + closure + LCA_PROGRAM.format(r=relation)
+            text = execute_clingo_lca(program, unit, relation)
+            session, _ = execute_clingo_session(unit, relations, relation, relation)
+            assert targets(native) == targets(text), (unit, relation)
+            assert targets(native) == targets(session), (unit, relation)
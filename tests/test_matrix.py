@@ -0,0 +1,46 @@
+from itertools import combinations
+
+from neXSim import app, matrix
+from neXSim.characterization import compute_characterization
+from neXSim.lca import execute_native_lca, hypernym_successors, meronym_successors, to_adjacency
+
+# Every pair of the matrix gets the characterization and the LCAs of the unit of its two entities,
+# from one fetch of the summaries of all the entities.
+
+
+def targets(atoms) -> set[tuple[str, str]]:
+    return {(str(atom.target_id), atom.predicate) for atom in atoms}
+
+
+def test_matrix_pairs(memory_graph, synthetic, monkeypatch):
+    entities = synthetic.unit(4, seed=11)
+    fetched = []
+    fetch = memory_graph.get_full_summary
+    monkeypatch.setattr(memory_graph, "get_full_summary",
+                        lambda _entities: fetched.append(_entities) or fetch(_entities))
+
+    response = app.test_client().post("/api/matrix", json={"entities": entities + entities[:1]})
+    assert response.status_code == 200
+    body = response.json
+    assert body["entities"] == entities and len(fetched) == 1
+    assert [(p["left"], p["right"]) for p in body["pairs"]] == list(combinations(range(len(entities)), 2))
+
+    for pair in body["pairs"]:
+        unit = [entities[pair["left"]], entities[pair["right"]]]
+        summaries = synthetic.summaries(unit)
+        characterization = compute_characterization(summaries)
+        assert len(pair["characterization"]) == len(characterization)
+        sizes = sum(len(s.summary) for s in summaries)
+        assert pair["score"] == round(2 * len(characterization) / sizes, 5)
+        lca = (execute_native_lca(unit, hypernym_successors(to_adjacency(synthetic.hypernym_atoms(unit))), "is_a")
+               + execute_native_lca(unit, meronym_successors(to_adjacency(synthetic.meronym_atoms(unit))), "part_of"))
+        assert {(a["target_id"], a["predicate"]) for a in pair["lca"]} == targets(lca)
+
+
+def test_matrix_is_bounded(memory_graph, synthetic, monkeypatch):
+    monkeypatch.setattr(matrix, "MATRIX_MAX_ENTITIES", 3)
+    client = app.test_client()
+    assert client.post("/api/matrix", json={"entities": synthetic.unit(3, seed=1)}).status_code == 200
+    response = client.post("/api/matrix", json={"entities": synthetic.unit(4, seed=1)})
+    assert response.status_code == 400
+    assert response.text == "At most 3 entities are supported"
@@ -0,0 +1,34 @@
+from neXSim.models import Atom, Entity, EntityType, Summary, Variable, trusted_atom, trusted_entity
+
+# The trusted builders skip the validation: their models must behave as the validated ones.
+
+
+def test_trusted_atom_round_trip():
+    x = Variable(is_free=True, origin=["bn:00000001n", "bn:00000002n"])
+    for source in ["bn:00000001n", x]:
+        trusted = trusted_atom(source, "bn:00000003n", "is_a")
+        validated = Atom(source_id=source, target_id="bn:00000003n", predicate="is_a")
+        assert trusted == validated
+        assert hash(trusted) == hash(validated)
+        assert trusted.model_fields_set == validated.model_fields_set
+        assert trusted.model_dump_json() == validated.model_dump_json()
+        assert Atom.model_validate_json(trusted.model_dump_json()) == validated
+
+        updated = trusted.model_copy(update={"predicate": "part_of"})
+        assert updated.predicate == "part_of" and trusted.predicate == "is_a"
+        assert trusted_atom(source, "bn:00000004n", "is_a").model_fields_set == validated.model_fields_set
+
+    summary = Summary(entity="bn:00000001n", summary=[trusted_atom("bn:00000001n", "bn:00000003n", "is_a")],
+                      tops=["bn:00000001n", "bn:00000003n"])
+    assert Summary.model_validate_json(summary.model_dump_json()) == summary
+
+
+def test_trusted_entity_round_trip():
+    trusted = trusted_entity("bn:00000001n", "Dog", "a dog", ["hound"], "CONCEPT", "")
+    validated = Entity(id="bn:00000001n", main_sense="Dog", description="a dog", synonyms=["hound"],
+                       entity_type=EntityType.CONCEPT, image_url="")
+    assert trusted.entity_type is EntityType.CONCEPT
+    assert trusted.model_fields_set == validated.model_fields_set
+    assert trusted.model_dump_json() == validated.model_dump_json()
+    assert Entity.model_validate_json(trusted.model_dump_json()).model_dump() == validated.model_dump()
+    assert trusted.model_copy(update={"description": ""}).description == "" and trusted.description == "a dog"
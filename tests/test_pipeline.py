@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import pytest
+
+from neXSim.deadline import check, deadline, remaining
+from neXSim.models import NeXSimResponse
+from neXSim.pipeline import Stage, run_pipeline, run_pipeline_async
+
+# Under a deadline, each stage may use its share of the time remaining when it starts; a stage that runs out of
+# time is reported as incomplete with the stages depending on it, and the independent ones still complete.
+
+
+def stages(budgets: dict[str, float]) -> list[Stage]:
+    def record(name: str):
+        def run(_input):
+            budgets[name] = remaining()
+        return run
+
+    def slow(_input):
+        budgets["slow"] = remaining()
+        while True:
+            time.sleep(0.01)
+            check("slow")
+
+    return [Stage("first", record("first"), share=0.5),
+            Stage("second", record("second"), ["first"]),
+            Stage("slow", slow, share=0.2),
+            Stage("after_slow", record("after_slow"), ["slow"]),
+            Stage("after_both", record("after_both"), ["second", "slow"])]
+
+
+def run_sync(_input, _stages):
+    run_pipeline(_input, _stages)
+
+
+def run_async(_input, _stages):
+    asyncio.run(run_pipeline_async(_input, _stages))
+
+
+@pytest.mark.parametrize("run", [run_sync, run_async], ids=["sync", "async"])
+def test_stage_budgets_and_incomplete_stages(run):
+    budgets: dict[str, float] = {}
+    _input = NeXSimResponse(unit=["bn:00000001n"])
+    with deadline(1.0):
+        run(_input, stages(budgets))
+
+    # first and slow start with the whole budget, second with what is left of it
+    assert 0.4 < budgets["first"] <= 0.5
+    assert 0.1 < budgets["slow"] <= 0.2
+    assert 0.5 < budgets["second"] <= 1.0
+    assert sorted(_input.incomplete) == ["after_both", "after_slow", "slow"]
+    assert sorted(t.stage for t in _input.timeline) == ["first", "second"]
+    assert "after_slow" not in budgets and "after_both" not in budgets
+
+
+def test_unbounded_stages_have_no_budget():
+    budgets: dict[str, float] = {}
+    _input = NeXSimResponse(unit=["bn:00000001n"])
+    run_pipeline(_input, stages(budgets)[:2])
+    assert budgets == {"first": None, "second": None}
+    assert _input.incomplete is None
@@ -0,0 +1,22 @@
+from benchmarks.suite import native_lca
+from neXSim.characterization import characterize, kernel_explanation
+from neXSim.models import NeXSimResponse
+from neXSim.report import REPORT_CHUNK_SIZE, stream_report
+
+
+def test_report_of_a_precomputed_input(memory_graph, synthetic):
+    # every stage is given: none is computed, and none has a computation time but the characterizations
+    unit = synthetic.unit(3, seed=5)
+    _input = NeXSimResponse(unit=unit, summaries=synthetic.summaries(unit))
+    _input.lca = native_lca(unit, synthetic.hypernym_atoms(unit), synthetic.meronym_atoms(unit))
+    characterize(_input)
+    kernel_explanation(_input)
+    assert "summary" not in _input.computation_times
+
+    chunks = list(stream_report(_input))
+    assert all(len(chunk) >= REPORT_CHUNK_SIZE for chunk in chunks[:-1])
+    report = "".join(chunks)
+    for entity in unit:
+        assert f'Summary for "{synthetic.entity(entity).main_sense}[{entity}]"' in report
+    core = round(_input.computation_times["characterization"], 5)
+    assert f"Total Core Time: {core} s\n" in report
@@ -0,0 +1,44 @@
+import pytest
+
+from neXSim import app, search
+from neXSim.search import SEARCH_CACHE, encode_cursor, decode_cursor, search_by_lemma, search_page
+
+# The lemma search pages, from the cached ranked hits and past them with the keyset cursor,
+# cover every hit once, in rank order.
+
+
+def test_cursor_round_trip():
+    hit = {"rank": 12.0, "id": "bn:00000001n"}
+    assert decode_cursor(encode_cursor(hit)) == (12.0, "bn:00000001n")
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+
+def test_cursor_pages_cover_the_hits(memory_graph, monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_CACHE_DEPTH", 25)
+    ranked = [hit["id"] for hit in memory_graph.get_entities_by_lemma("sense", 0, 0, 10 ** 6)]
+    assert len(ranked) > 100
+
+    pages, cursor = [], None
+    while True:
+        entities, cursor = search_page("sense", cursor, 40)
+        pages.append([e.id for e in entities])
+        if cursor is None:
+            break
+    assert [_id for page in pages for _id in page] == ranked
+    assert all(len(page) == 40 for page in pages[:-1])
+    # the cached hits are the first 25, whatever the page
+    assert len(SEARCH_CACHE) == 1
+
+    # the numbered pages agree, within the cached hits and past them
+    for page in [0, 2, 3, 7]:
+        assert [e.id for e in search_by_lemma("sense", page, 10 * page)] == ranked[10 * page:10 * page + 10]
+
+
+def test_cursor_endpoint(memory_graph):
+    client = app.test_client()
+    first = client.get("/api/search/sense").json
+    second = client.get("/api/search/sense", query_string={"cursor": first["next"]}).json
+    assert [e["id"] for e in first["entities"] + second["entities"]] == \
+           [e.id for e in search_by_lemma("sense", 0) + search_by_lemma("sense", 1, 10)]
+    assert client.get("/api/search/sense", query_string={"cursor": "not a cursor"}).status_code == 400
@@ -0,0 +1,102 @@
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+from neXSim import app
+from neXSim.asgi import app as asgi_app
+from neXSim.deadline import check, remaining
+from neXSim.models import NeXSimResponse
+from neXSim.neo4j_manager import SummaryGroups
+from neXSim.summary import SUMMARY_CACHE, stream_summary
+from neXSim.utils import wants_ndjson
+
+# The rows of the streamed summary query are split into the summaries of the entities, in the order of the unit;
+# the streamed summaries are cached only once the stream is complete.
+
+
+def row(entity: str, target: str) -> dict:
+    return {"for": entity, "source": entity, "relation": "is_a", "target": target}
+
+
+def test_summary_groups_split_the_rows():
+    entities = ["a", "b", "c", "b", "d", "e"]
+    rows = [row("a", "x"), row("a", "y"), row("c", "x"), row("d", "z")]
+    groups = SummaryGroups(entities)
+    completed = []
+    for r in rows:
+        completed.extend(groups.add(r))
+    # d may still have rows: only a, b (no rows) and c are complete
+    assert [entity for entity, _ in completed] == ["a", "b", "c"]
+    completed.extend(groups.finish())
+    assert completed == [("a", rows[:2]), ("b", []), ("c", rows[2:3]), ("d", rows[3:]), ("e", [])]
+    assert groups.rows == len(rows)
+
+
+def test_summary_groups_without_rows():
+    groups = SummaryGroups(["a", "b"])
+    assert groups.finish() == [("a", []), ("b", [])]
+
+
+def test_wants_ndjson():
+    assert wants_ndjson("application/x-ndjson")
+    assert wants_ndjson("text/html, application/x-ndjson;q=0.9")
+    assert not wants_ndjson("application/json, application/x-ndjson;q=0.5")
+    assert not wants_ndjson("*/*")
+    assert not wants_ndjson(None)
+
+
+def test_summary_groups_reject_interleaved_rows():
+    groups = SummaryGroups(["a", "b", "c"])
+    completed = groups.add(row("a", "x")) + groups.add(row("c", "x"))
+    assert completed == [("a", [row("a", "x")]), ("b", [])]
+    # a row of an entity already handed over, or of an unknown entity
+    with pytest.raises(ValueError):
+        groups.add(row("a", "y"))
+    with pytest.raises(ValueError):
+        SummaryGroups(["a"]).add(row("z", "x"))
+
+
+def test_broken_stream_caches_nothing(memory_graph, synthetic, monkeypatch):
+    unit = synthetic.unit(3, seed=2)
+    request = NeXSimResponse(unit=unit)
+
+    def broken(_entities):
+        yield _entities[0], memory_graph.get_full_summary(_entities[:1])
+        raise ValueError("rows out of order")
+
+    monkeypatch.setattr(memory_graph, "stream_full_summary", broken)
+    with pytest.raises(ValueError):
+        list(stream_summary(request))
+    assert len(SUMMARY_CACHE) == 0
+
+    monkeypatch.undo()
+    streamed = {summary.entity: summary for summary in stream_summary(request)}
+    assert len(SUMMARY_CACHE) == len(set(unit))
+    assert {s.entity: sorted(map(str, s.summary)) for s in streamed.values()} == \
+           {s.entity: sorted(map(str, s.summary)) for s in synthetic.summaries(unit)}
+
+
+@pytest.mark.parametrize("client", [app.test_client, lambda: TestClient(asgi_app)], ids=["flask", "asgi"])
+def test_streamed_summaries_keep_the_budget(memory_graph, synthetic, monkeypatch, client):
+    unit = list(dict.fromkeys(synthetic.unit(6, seed=3)))
+    budgets = []
+
+    def slow(_entities):
+        # one summary every 40 ms, checking the deadline of the request
+        for entity in _entities:
+            time.sleep(0.04)
+            check("summary")
+            budgets.append(remaining())
+            yield entity, memory_graph.get_full_summary([entity])
+
+    monkeypatch.setattr(memory_graph, "stream_full_summary", slow)
+    headers = {"Accept": "application/x-ndjson"}
+    assert client().post("/api/summary?budget_ms=0", json={"unit": unit}, headers=headers).status_code == 400
+
+    response = client().post("/api/summary?budget_ms=100", json={"unit": unit}, headers=headers)
+    assert response.status_code == 200
+    # the stream ends with the last summary computed in time
+    lines = response.text.splitlines()
+    assert 0 < len(lines) < len(unit)
+    assert len(budgets) == len(lines) and all(b is not None and b < 0.1 for b in budgets)
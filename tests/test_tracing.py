@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from neXSim import tracing
+from neXSim.tracing import LATENCY_BUCKETS, METRICS, Metrics, render_metrics, retire_metrics, clear_metrics_dir
+
+# The Prometheus text exposition of the metrics, and the sum of the snapshots of several workers in METRICS_DIR
+# (the live workers, this process, and the archive of the exited ones).
+
+
+def samples(text: str) -> dict[str, str]:
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if line and not line.startswith("#"))
+
+
+def test_exposition_format():
+    metrics = Metrics()
+    for value in [0.5, 2, 2, 7]:
+        metrics.observe("t_seconds", "A latency", (1, 5), {"kind": "stage", "name": 'say "hi"\n'}, value)
+    metrics.inc("t_total", "A counter", {"kind": "neo4j"}, 3)
+    metrics.inc("t_total", "A counter", {}, 0.5)
+
+    labels = 'kind="stage",name="say \\"hi\\"\\n"'
+    assert metrics.render({"t_gauge": 4.0}).splitlines() == [
+        "# HELP t_seconds A latency",
+        "# TYPE t_seconds histogram",
+        f't_seconds_bucket{{{labels},le="1.0"}} 1',
+        f't_seconds_bucket{{{labels},le="5.0"}} 3',
+        f't_seconds_bucket{{{labels},le="+Inf"}} 4',
+        f"t_seconds_sum{{{labels}}} 11.5",
+        f"t_seconds_count{{{labels}}} 4",
+        "# HELP t_total A counter",
+        "# TYPE t_total counter",
+        "t_total 0.5",
+        't_total{kind="neo4j"} 3',
+        "# TYPE t_gauge gauge",
+        "t_gauge 4.0",
+    ]
+
+
+def worker_snapshot(spans: int, errors: int, gauges: dict[str, float]) -> dict:
+    metrics = Metrics()
+    labels = {"kind": "stage", "name": "lca"}
+    for _ in range(spans):
+        metrics.observe("nexsim_span_seconds", "Duration of the spans", LATENCY_BUCKETS, labels, 0.5)
+    metrics.inc("nexsim_span_errors_total", "Spans ended by an exception", labels, errors)
+    snapshot = metrics.snapshot()
+    snapshot["gauges"] = gauges
+    return snapshot
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "METRICS_DIR", str(tmp_path))
+    # the gauges of this process
+    monkeypatch.setattr(tracing, "postgres_metrics", lambda: ({"histograms": {}, "counters": {}},
+                                                              {"nexsim_postgres_max_query_time": 0.2,
+                                                               "nexsim_postgres_pool_size": 1}))
+    METRICS.clear()
+    yield tmp_path
+    METRICS.clear()
+    tracing._retired.clear()
+
+
+def test_snapshots_of_the_workers_are_summed(metrics_dir):
+    (metrics_dir / "worker-1.json").write_text("{}")
+    clear_metrics_dir()
+    assert os.listdir(metrics_dir) == []
+
+    # two other workers, then this one
+    tracing._write_json(str(metrics_dir / "worker-1.json"),
+                        worker_snapshot(2, 1, {"nexsim_postgres_max_query_time": 0.5, "nexsim_postgres_pool_size": 2}))
+    tracing._write_json(str(metrics_dir / "worker-2.json"),
+                        worker_snapshot(3, 0, {"nexsim_postgres_max_query_time": 0.1, "nexsim_postgres_pool_size": 3}))
+    tracing.observe_span("lca", "stage", 2.0, error=True)
+
+    series = 'kind="stage",name="lca"'
+    merged = samples(render_metrics())
+    assert merged[f'nexsim_span_seconds_bucket{{{series},le="1.0"}}'] == "5"
+    assert merged[f'nexsim_span_seconds_count{{{series}}}'] == "6"
+    assert merged[f'nexsim_span_seconds_sum{{{series}}}'] == "4.5"
+    assert merged[f'nexsim_span_errors_total{{{series}}}'] == "2"
+    # the maxima are the maxima of the workers, the other gauges their sums
+    assert merged["nexsim_postgres_max_query_time"] == "0.5"
+    assert merged["nexsim_postgres_pool_size"] == "6"
+
+    # this worker exits: its counters move to the archive, its gauges are dropped
+    retire_metrics()
+    assert sorted(os.listdir(metrics_dir)) == [".lock", "archive.json", "worker-1.json", "worker-2.json"]
+    retired = samples(render_metrics())
+    for name in [f'nexsim_span_seconds_count{{{series}}}', f'nexsim_span_errors_total{{{series}}}']:
+        assert retired[name] == merged[name]
+    assert retired["nexsim_postgres_pool_size"] == "5"
+
+    # a new worker starts from zero, on top of the archive
+    METRICS.clear()
+    tracing._retired.clear()
+    tracing.observe_span("lca", "stage", 0.1)
+    assert samples(render_metrics())[f'nexsim_span_seconds_count{{{series}}}'] == "7"